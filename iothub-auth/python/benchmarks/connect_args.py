@@ -0,0 +1,124 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import time
+from typing import Any, Callable, List, Tuple
+from symmetric_key_auth import SymmetricKeyAuth, encode_dict
+
+# BENCHMARK
+#
+# Measures how long it takes to build the MQTT CONNECT arguments (client_id, username, and
+# password) for many identities, the way a gateway does when it connects all of its devices.
+# Paho and the reconnect logic read these values several times for each connection, so each
+# identity's values are read `--reads` times.
+#
+#   uncached   - computing the values on every read, which is what `SymmetricKeyAuth` did
+#                before it cached them
+#   cold       - first read after `update_expiry`, which computes and caches the values
+#   cached     - later reads, which return the cached values
+#
+# Run from the `iothub-auth/python` directory:
+#   python -m benchmarks.connect_args
+
+ConnectArgs = Tuple[str, str, bytes]
+
+
+def uncached_connect_args(auth: SymmetricKeyAuth) -> ConnectArgs:
+    """
+    Build the CONNECT arguments from scratch, without using the cached values.
+    """
+    props = {
+        "h": auth.hub_host_name,
+        "did": auth.device_id,
+        "av": "2021-06-30-preview",
+        "am": "SAS",
+        "se": str(auth.password_expiry_time * 1000),
+        "sa": str(auth.password_creation_time * 1000),
+    }
+    if auth.module_id:
+        props["mid"] = auth.module_id
+    ss = "{}\n{}\n{}\n{}\n{}\n".format(
+        auth.hub_host_name,
+        auth.client_id,
+        auth.shared_access_key_name or "",
+        auth.password_creation_time * 1000,
+        auth.password_expiry_time * 1000,
+    )
+    return (
+        auth.client_id,
+        encode_dict(props),
+        hmac.HMAC(
+            key=base64.b64decode(auth.shared_access_key),
+            msg=ss.encode("utf-8"),
+            digestmod=hashlib.sha256,
+        ).digest(),
+    )
+
+
+def connect_args(auth: SymmetricKeyAuth) -> ConnectArgs:
+    return (auth.client_id, auth.username, auth.password)
+
+
+def time_reads(
+    name: str,
+    auths: List[SymmetricKeyAuth],
+    reads: int,
+    function: Callable[[SymmetricKeyAuth], ConnectArgs],
+) -> None:
+    start = time.perf_counter()
+    for auth in auths:
+        for _ in range(reads):
+            function(auth)
+    elapsed = time.perf_counter() - start
+    count = len(auths) * reads
+    print(
+        "  {:<10} {:>8.0f} reads/sec  {:>7.2f}us per read  {:>8.1f}ms total".format(
+            name, count / elapsed, 1e6 * elapsed / count, 1000 * elapsed
+        )
+    )
+
+
+def main(args: Any) -> None:
+    auths = [
+        SymmetricKeyAuth.create_from_connection_string(
+            "HostName=hub.azure-devices.net;DeviceId=device-{};SharedAccessKey={}".format(
+                i, base64.b64encode(os.urandom(32)).decode("utf-8")
+            )
+        )
+        for i in range(args.identities)
+    ]
+    print(
+        "{} identities, {} reads per identity".format(
+            args.identities, args.reads
+        )
+    )
+
+    time_reads("uncached", auths, args.reads, uncached_connect_args)
+    time_reads("cold", auths, 1, connect_args)
+    time_reads("cached", auths, args.reads, connect_args)
+
+    # Make sure the cached values are the same as the uncached ones.
+    for auth in auths:
+        assert connect_args(auth) == uncached_connect_args(auth)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="connect_args")
+    parser.add_argument(
+        "--identities",
+        type=int,
+        default=10000,
+        help="Number of identities",
+    )
+    parser.add_argument(
+        "--reads",
+        type=int,
+        default=4,
+        help="Number of times each identity's values are read",
+    )
+    main(parser.parse_args())
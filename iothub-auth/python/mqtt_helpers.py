@@ -1,12 +1,17 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License. See License.txt in the project root for
 # license information.
+import itertools
 import threading
+import time
 import logging
-from typing import Dict, List, Callable, Any
+from typing import Dict, List, Callable, Any, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Number of seconds that an unclaimed ack is kept in an `IncomingAckList` before it is discarded.
+DEFAULT_ACK_TTL = 300
+
 
 class IncomingAckList(object):
     """
@@ -17,21 +22,52 @@ class IncomingAckList(object):
     These "wait" operations are done in a thread-safe manner using the `Condition` class
     provided by the `threading` module.
 
+    Acks which nobody waits for are discarded after `ttl` seconds.  The number of discarded
+    acks is kept in `expired_count`, so leaks can be detected in long-running processes.
+
     Callers using `async3yyio` instead of `threading` should consider writing an awaitable version
     of this class using the `asyncio.Condition` class for synchronization.  Submitting a pull
     request with this functionality is encouraged.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, ttl: float = DEFAULT_ACK_TTL) -> None:
         self.cv = threading.Condition()
-        self.lookup: Dict[int, Any] = {}
+        # values are stored with their arrival times.  Because dicts preserve insertion order,
+        # the oldest acks are always at the front.
+        self.lookup: Dict[int, Tuple[Any, float]] = {}
+        self.ttl = ttl
+        self.expired_count = 0
+
+    def _expire(self, now: float) -> None:
+        """
+        Remove expired acks.  Only looks at the acks which have expired (plus one), so this
+        is cheap enough to call on every `add_ack`.  Must be called while holding `self.cv`.
+        """
+        if self.ttl is None:
+            return
+
+        expired = 0
+        for (_, arrival_time) in self.lookup.values():
+            if now - arrival_time <= self.ttl:
+                break
+            expired += 1
+
+        if expired:
+            for key in list(itertools.islice(self.lookup, expired)):
+                del self.lookup[key]
+            self.expired_count += expired
+            logger.warning("Discarded {} unclaimed acks".format(expired))
 
     def add_ack(self, key: int, value: Any) -> None:
         """
         Add the ack to the dict and notify any waiting listeners
         """
+        now = time.monotonic()
         with self.cv:
-            self.lookup[key] = value
+            # mids get reused, so pop first to move a re-added key to the end of the expiry order.
+            self.lookup.pop(key, None)
+            self.lookup[key] = (value, now)
+            self._expire(now)
             self.cv.notify_all()
 
     def wait_for_ack(self, key: int, timeout: float) -> Any:
@@ -47,7 +83,7 @@ class IncomingAckList(object):
                 return None
             else:
                 try:
-                    return self.lookup.pop(key)
+                    return self.lookup.pop(key)[0]
                 except KeyError:
                     # possible multiple readers.  Not really a big deal.
                     logger.warning(
@@ -0,0 +1,197 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List
+
+logger = logging.getLogger(__name__)
+
+renewal_callback = Callable[[], None]
+
+
+class _ScheduledRenewal(object):
+    """
+    Internal object representing one entry in the scheduler's heap.  Entries are never removed
+    from the middle of the heap.  Cancelled entries are marked and skipped when they reach the top.
+    """
+
+    __slots__ = ["deadline", "sequence", "key", "callback", "cancelled"]
+
+    def __init__(
+        self,
+        deadline: float,
+        sequence: int,
+        key: Hashable,
+        callback: renewal_callback,
+    ) -> None:
+        self.deadline = deadline
+        self.sequence = sequence
+        self.key = key
+        self.callback = callback
+        self.cancelled = False
+
+    def __lt__(self, other: "_ScheduledRenewal") -> bool:
+        return (self.deadline, self.sequence) < (other.deadline, other.sequence)
+
+
+class RenewalScheduler(object):
+    """
+    Object which runs renewal callbacks for many auth objects using a single timer thread and a
+    small pool of worker threads, instead of one `threading.Timer` thread per auth object.
+
+    Deadlines are kept in a min-heap.  `schedule` and `cancel` are O(log n).  Cancelled
+    entries are marked and left in the heap until they reach the top, and the heap is
+    rebuilt if cancelled entries ever make up more than half of it.
+
+    To use this object, pass it to the `PasswordRenewalTimer` constructor.  One scheduler can
+    be shared by any number of `PasswordRenewalTimer` objects.
+    """
+
+    def __init__(self, max_workers: int = 4) -> None:
+        """
+        :param int max_workers: Number of threads used to run renewal callbacks.
+        """
+        self.cv = threading.Condition()
+        self.heap: List[_ScheduledRenewal] = []
+        self.entries: Dict[Hashable, _ScheduledRenewal] = {}
+        self.cancelled_count = 0
+        self.sequence = itertools.count()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="RenewalScheduler"
+        )
+        self.timer_thread: threading.Thread = None
+        self.running = True
+
+    @property
+    def scheduled_count(self) -> int:
+        """
+        Number of renewals which are currently scheduled.
+        """
+        return len(self.entries)
+
+    def schedule(
+        self, key: Hashable, delay: float, callback: renewal_callback
+    ) -> None:
+        """
+        Schedule `callback` to be called `delay` seconds from now.  If there is already a
+        renewal scheduled for `key`, it is replaced.
+
+        :param key: Object which identifies this renewal, typically the `PasswordRenewalTimer` object.
+        :param float delay: Number of seconds to wait before calling `callback`.
+        :param callable callback: Function to call.  This is called on a worker thread.
+        """
+        with self.cv:
+            if not self.running:
+                raise RuntimeError("RenewalScheduler has been shut down")
+
+            self._cancel(key)
+            entry = _ScheduledRenewal(
+                time.monotonic() + max(0, delay),
+                next(self.sequence),
+                key,
+                callback,
+            )
+            self.entries[key] = entry
+            heapq.heappush(self.heap, entry)
+
+            if not self.timer_thread:
+                self.timer_thread = threading.Thread(
+                    target=self._run, name="RenewalScheduler"
+                )
+                self.timer_thread.daemon = True
+                self.timer_thread.start()
+
+            # Only wake the timer thread if its next deadline just changed.
+            if self.heap[0] is entry:
+                self.cv.notify()
+
+    def reschedule(
+        self, key: Hashable, delay: float, callback: renewal_callback
+    ) -> None:
+        """
+        Replace the renewal scheduled for `key`.  This is the same as calling `schedule`.
+        """
+        self.schedule(key, delay, callback)
+
+    def cancel(self, key: Hashable) -> bool:
+        """
+        Cancel the renewal scheduled for `key`.
+
+        :param key: Object passed to `schedule`.
+
+        :returns: `True` if a renewal was cancelled, `False` if nothing was scheduled for `key`.
+        """
+        with self.cv:
+            return self._cancel(key)
+
+    def _cancel(self, key: Hashable) -> bool:
+        """
+        Internal function to cancel a renewal.  Must be called while holding `self.cv`.
+        """
+        entry = self.entries.pop(key, None)
+        if not entry:
+            return False
+
+        entry.cancelled = True
+        self.cancelled_count += 1
+        if self.cancelled_count > len(self.heap) // 2:
+            self.heap = [x for x in self.heap if not x.cancelled]
+            heapq.heapify(self.heap)
+            self.cancelled_count = 0
+        return True
+
+    def _run(self) -> None:
+        """
+        Internal function which runs on the timer thread.  It waits for the earliest deadline
+        and hands due callbacks to the worker pool.
+        """
+        with self.cv:
+            while self.running:
+                if not self.heap:
+                    self.cv.wait()
+                    continue
+
+                entry = self.heap[0]
+                if entry.cancelled:
+                    heapq.heappop(self.heap)
+                    self.cancelled_count -= 1
+                    continue
+
+                delay = entry.deadline - time.monotonic()
+                if delay > 0:
+                    self.cv.wait(delay)
+                    continue
+
+                heapq.heappop(self.heap)
+                del self.entries[entry.key]
+                self.executor.submit(self._call, entry)
+
+    def _call(self, entry: _ScheduledRenewal) -> None:
+        """
+        Internal function which runs a callback on a worker thread.
+        """
+        try:
+            entry.callback()
+        except Exception:
+            logger.error(
+                "Exception in renewal callback for {}".format(entry.key),
+                exc_info=True,
+            )
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Cancel all scheduled renewals and stop the timer thread and worker pool.
+
+        :param bool wait: If `True`, wait for running callbacks to complete before returning.
+        """
+        with self.cv:
+            self.running = False
+            self.heap = []
+            self.entries = {}
+            self.cv.notify()
+        self.executor.shutdown(wait=wait)
@@ -9,8 +9,14 @@ import ssl
 import hmac
 import hashlib
 import base64
-from typing import Any, Callable, Union, Dict
+from typing import Any, Callable, Dict, Tuple
 from six.moves import urllib
+from renewal_scheduler import RenewalScheduler
+from tls_context_cache import (
+    TlsContextCache,
+    default_tls_context_cache,
+    create_tls_context,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -25,23 +31,6 @@ DEFAULT_PASSWORD_RENEWAL_INTERVAL = 3600
 DEFAULT_PASSWORD_RENEWAL_MARGIN = 300
 
 
-def sign_password(base64_key: str, payload_to_sign: Union[str, bytes]) -> bytes:
-    # assumme base64_key is a string.
-    decoded_key = base64.b64decode(base64_key)
-
-    try:
-        payload_to_sign = payload_to_sign.encode("utf-8")  # type: ignore
-    except AttributeError:
-        # If byte string, no need to encode
-        pass
-
-    return hmac.HMAC(
-        key=decoded_key,
-        msg=payload_to_sign,  # type: ignore
-        digestmod=hashlib.sha256,
-    ).digest()
-
-
 def encode_dict(obj: Dict[str, str]) -> str:
     return "&".join(
         [
@@ -64,15 +53,52 @@ class SymmetricKeyAuth(abc.ABC):
         self.product_info = ""
 
         self.server_verification_cert: str = None
+        # Contexts returned by `create_tls_context` come from here, so connections that use
+        # the same server verification cert share a context and can resume TLS sessions.  If
+        # `None`, a new context is created for each call.
+        self.tls_context_cache: TlsContextCache = default_tls_context_cache
         self.password_creation_time = 0
         self.password_expiry_time = 0
         self.shared_access_key_name = None
+        self._shared_access_key: str = None
+        # HMAC object with the decoded key already loaded.  Signing copies it.
+        self._keyed_hmac: Any = None
+        # `password` and `username` are cached along with the values they were computed from,
+        # so they are only computed again after `update_expiry` or after one of those values
+        # changes.
+        self._password_cache: Tuple[Tuple[Any, ...], bytes] = None
+        self._username_cache: Tuple[Tuple[Any, ...], str] = None
+
+    @property
+    def shared_access_key(self) -> str:
+        """
+        The base64-encoded shared access key.  The key is decoded once, when it is set.
+        """
+        return self._shared_access_key
+
+    @shared_access_key.setter
+    def shared_access_key(self, shared_access_key: str) -> None:
+        self._shared_access_key = shared_access_key
+        self._keyed_hmac = hmac.HMAC(
+            key=base64.b64decode(shared_access_key), digestmod=hashlib.sha256
+        )
+        self._password_cache = None
 
     @property
     def password(self) -> bytes:
         """
         The password to pass in the body of MQTT CONNECT packet.
         """
+        inputs = (
+            self.hub_host_name,
+            self.client_id,
+            self.shared_access_key_name,
+            self.password_creation_time,
+            self.password_expiry_time,
+        )
+        if self._password_cache and self._password_cache[0] == inputs:
+            return self._password_cache[1]
+
         ss = "{host_name}\n{identity}\n{sas_policy}\n{sas_at}\n{sas_expiry}\n".format(
             host_name=self.hub_host_name,
             identity=self.client_id,
@@ -80,13 +106,30 @@ class SymmetricKeyAuth(abc.ABC):
             sas_at=self.password_creation_time * 1000,
             sas_expiry=self.password_expiry_time * 1000,
         )
-        return sign_password(self.shared_access_key, ss)
+        signer = self._keyed_hmac.copy()
+        signer.update(ss.encode("utf-8"))
+        password: bytes = signer.digest()
+        self._password_cache = (inputs, password)
+        return password
 
     @property
     def username(self) -> str:
         """
         Value to be sent in the MQTT `username` field.
         """
+        inputs = (
+            self.hub_host_name,
+            self.device_id,
+            self.module_id,
+            self.dtmi,
+            self.product_info,
+            self.shared_access_key_name,
+            self.password_creation_time,
+            self.password_expiry_time,
+        )
+        if self._username_cache and self._username_cache[0] == inputs:
+            return self._username_cache[1]
+
         props = {
             "h": self.hub_host_name,
             "did": self.device_id,
@@ -109,7 +152,9 @@ class SymmetricKeyAuth(abc.ABC):
             props["sp"] = self.shared_access_key_name
 
         # TOOD: when we test this, we want to verify the characters in the spec
-        return encode_dict(props)
+        username = encode_dict(props)
+        self._username_cache = (inputs, username)
+        return username
 
     @property
     def client_id(self) -> str:
@@ -124,12 +169,15 @@ class SymmetricKeyAuth(abc.ABC):
     def update_expiry(self) -> None:
         """
         Update the expiry of for the generated password.  This causes the values returned for
-        the `username` and `password` properties to be updated.
+        the `username` and `password` properties to be updated.  They are computed the next
+        time they are used, and cached until the next call to this function.
         """
         self.password_creation_time = int(time.time())
         self.password_expiry_time = int(
             self.password_creation_time + DEFAULT_PASSWORD_RENEWAL_INTERVAL
         )
+        self._password_cache = None
+        self._username_cache = None
 
     @property
     def hostname(self) -> str:
@@ -144,22 +192,17 @@ class SymmetricKeyAuth(abc.ABC):
 
     def create_tls_context(self) -> ssl.SSLContext:
         """
-        Create an SSLContext object based on this object.
+        Create an SSLContext object based on this object.  If `tls_context_cache` is set, the
+        returned context is shared with other connections and must not be changed.
 
         :returns: SSLContext object which can be used to secure the TLS connection.
         """
-        ssl_context = ssl.SSLContext(protocol=ssl.PROTOCOL_TLSv1_2)
-        if self.server_verification_cert:
-            ssl_context.load_verify_locations(
-                cadata=self.server_verification_cert
+        if self.tls_context_cache:
+            return self.tls_context_cache.get_context(
+                self.server_verification_cert
             )
         else:
-            ssl_context.load_default_certs()
-
-        ssl_context.verify_mode = ssl.CERT_REQUIRED
-        ssl_context.check_hostname = True
-
-        return ssl_context
+            return create_tls_context(self.server_verification_cert)
 
     @classmethod
     def create_from_connection_string(cls, connection_string: str) -> Any:
@@ -195,8 +238,16 @@ class PasswordRenewalTimer(object):
     Helper object used to set up automatic password renewal timers and events.
     """
 
-    def __init__(self, auth: SymmetricKeyAuth) -> None:
+    def __init__(
+        self, auth: SymmetricKeyAuth, scheduler: RenewalScheduler = None
+    ) -> None:
+        """
+        :param SymmetricKeyAuth auth: Auth object with the password to renew.
+        :param RenewalScheduler scheduler: (optional) Shared scheduler used to run renewals.  If
+            `None`, this object starts a `threading.Timer` for each renewal.
+        """
         self.auth = auth
+        self.scheduler = scheduler
         self.password_renewal_timer: threading.Timer = None
         self.on_new_password_available: new_password_available_handler = None
 
@@ -229,6 +280,8 @@ class PasswordRenewalTimer(object):
         Cancel the running timer which is set to fire when the current password
         needs to be renewed.
         """
+        if self.scheduler:
+            self.scheduler.cancel(self)
         if self.password_renewal_timer:
             self.password_renewal_timer.cancel()
             self.password_renewal_timer = None
@@ -253,11 +306,16 @@ class PasswordRenewalTimer(object):
 
         # Set a new timer.
         seconds_until_renewal = self.seconds_until_password_renewal
-        self.password_renewal_timer = threading.Timer(
-            seconds_until_renewal, self.renew_and_reconnect
-        )
-        self.password_renewal_timer.daemon = True
-        self.password_renewal_timer.start()
+        if self.scheduler:
+            self.scheduler.schedule(
+                self, seconds_until_renewal, self.renew_and_reconnect
+            )
+        else:
+            self.password_renewal_timer = threading.Timer(
+                seconds_until_renewal, self.renew_and_reconnect
+            )
+            self.password_renewal_timer.daemon = True
+            self.password_renewal_timer.start()
 
         logger.info(
             "Password renewal timer set for {} seconds in the future, at approximately {}".format(
@@ -0,0 +1,155 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import logging
+import socket
+import ssl
+import threading
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class _SessionResumingSSLSocket(ssl.SSLSocket):
+    """
+    SSLSocket which offers the last TLS session used with the same server when it starts a
+    handshake, and saves the new session when the handshake completes.  If the server accepts
+    the session, the connection uses an abbreviated handshake.  If not, a full handshake is
+    done, the same as it would be without this class.
+    """
+
+    context: "_SessionResumingSSLContext"
+
+    def do_handshake(self, block: bool = False) -> None:
+        # With non-blocking sockets, this can be called more than once for the same handshake,
+        # and the session can only be set before the handshake starts.
+        if not getattr(self, "_session_offered", False):
+            self._session_offered = True
+            if not self.server_side and self.server_hostname:
+                session = self.context.get_session(self.server_hostname)
+                if session:
+                    self.session = session
+                    # In an abbreviated handshake, the client sends the last handshake
+                    # message.  With Nagle's algorithm, the first application write (the
+                    # MQTT CONNECT packet) then waits for that message to be acknowledged,
+                    # which can take longer than the round trip that resumption saves.
+                    if self.family in (socket.AF_INET, socket.AF_INET6):
+                        self.setsockopt(
+                            socket.IPPROTO_TCP, socket.TCP_NODELAY, 1
+                        )
+
+        super(_SessionResumingSSLSocket, self).do_handshake(block)
+
+        if not self.server_side and self.server_hostname:
+            logger.debug(
+                "TLS handshake with {} complete.  session_reused={}".format(
+                    self.server_hostname, self.session_reused
+                )
+            )
+            if self.session:
+                self.context.set_session(self.server_hostname, self.session)
+
+
+class _SessionResumingSSLContext(ssl.SSLContext):
+    """
+    SSLContext which creates `_SessionResumingSSLSocket` objects and remembers the last TLS
+    session for each server hostname.  Sessions can only be resumed with the context that
+    created them, which is why contexts need to be shared between connections.
+    """
+
+    sslsocket_class = _SessionResumingSSLSocket
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super(_SessionResumingSSLContext, self).__init__()
+        self.session_lock = threading.Lock()
+        self.sessions: Dict[str, ssl.SSLSession] = {}
+
+    def get_session(self, server_hostname: str) -> ssl.SSLSession:
+        with self.session_lock:
+            return self.sessions.get(server_hostname, None)
+
+    def set_session(
+        self, server_hostname: str, session: ssl.SSLSession
+    ) -> None:
+        with self.session_lock:
+            self.sessions[server_hostname] = session
+
+
+class TlsContextCache(object):
+    """
+    Object which creates `SSLContext` objects and shares them between connections that use
+    the same server verification certificate.
+
+    Creating a context and loading CA material into it is expensive, especially when the
+    default certificates are loaded.  Sharing contexts also lets reconnects resume the last
+    TLS session with the same server, so reconnecting after a SAS token renewal takes an
+    abbreviated handshake instead of a full handshake.
+
+    Contexts returned by this object are shared, so callers must not change them.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.contexts: Dict[str, ssl.SSLContext] = {}
+
+    def get_context(
+        self, server_verification_cert: str = None
+    ) -> ssl.SSLContext:
+        """
+        Return an SSLContext which verifies servers using `server_verification_cert`.
+
+        :param str server_verification_cert: (optional) PEM certificate used to verify the
+            server.  If `None`, the default certificates are used.
+
+        :returns: SSLContext object which can be used to secure the TLS connection.
+        """
+        key = server_verification_cert or ""
+        with self.lock:
+            ssl_context = self.contexts.get(key, None)
+            if not ssl_context:
+                ssl_context = create_tls_context(
+                    server_verification_cert, resume_sessions=True
+                )
+                self.contexts[key] = ssl_context
+            return ssl_context
+
+    def clear(self) -> None:
+        """
+        Forget all cached contexts, along with the TLS sessions they remember.
+        """
+        with self.lock:
+            self.contexts.clear()
+
+
+def create_tls_context(
+    server_verification_cert: str = None, resume_sessions: bool = False
+) -> ssl.SSLContext:
+    """
+    Create a new SSLContext object.
+
+    :param str server_verification_cert: (optional) PEM certificate used to verify the server.
+        If `None`, the default certificates are used.
+    :param bool resume_sessions: If `True`, the context remembers TLS sessions and offers them
+        when reconnecting to the same server.
+
+    :returns: SSLContext object which can be used to secure the TLS connection.
+    """
+    if resume_sessions:
+        ssl_context: ssl.SSLContext = _SessionResumingSSLContext(
+            protocol=ssl.PROTOCOL_TLSv1_2
+        )
+    else:
+        ssl_context = ssl.SSLContext(protocol=ssl.PROTOCOL_TLSv1_2)
+    if server_verification_cert:
+        ssl_context.load_verify_locations(cadata=server_verification_cert)
+    else:
+        ssl_context.load_default_certs()
+
+    ssl_context.verify_mode = ssl.CERT_REQUIRED
+    ssl_context.check_hostname = True
+
+    return ssl_context
+
+
+# Cache shared by all auth objects which don't set their own `tls_context_cache`
+default_tls_context_cache = TlsContextCache()
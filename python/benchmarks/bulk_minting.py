@@ -0,0 +1,94 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import argparse
+import base64
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, List
+from helpers import SymmetricKeyAuth
+from helpers.bulk_minting import create_symmetric_key_auths
+
+# BENCHMARK
+#
+# Measures gateway startup time: how long it takes to create a `SymmetricKeyAuth` object
+# (with a signed SAS token) for each of N leaf devices.
+#
+# `serial` calls `SymmetricKeyAuth.create_from_connection_string` in a loop.  `bulk` uses
+# `create_symmetric_key_auths`, first on the calling thread and then with a process pool.
+# The process pool only helps on machines with more than one core.
+#
+# Run from the `python` directory:
+#   python -m benchmarks.bulk_minting
+
+
+def make_connection_strings(count: int) -> List[str]:
+    return [
+        "HostName=hub.azure-devices.net;DeviceId=leaf{};SharedAccessKey={}".format(
+            i, base64.b64encode(os.urandom(32)).decode("utf-8")
+        )
+        for i in range(count)
+    ]
+
+
+def run(
+    name: str, connection_strings: List[str], create: Callable[[], Any]
+) -> None:
+    start = time.perf_counter()
+    count = sum(1 for _ in create())
+    elapsed = time.perf_counter() - start
+    assert count == len(connection_strings)
+    print(
+        "{:<24} {:>7} identities: {:>7.3f}s ({:>9.0f} identities/sec)".format(
+            name, count, elapsed, count / elapsed
+        )
+    )
+
+
+def main(args: Any) -> None:
+    print("{} cpus, {} workers".format(os.cpu_count(), args.workers))
+    executor: Executor = ProcessPoolExecutor(max_workers=args.workers)
+    # Start the worker processes before timing anything.
+    list(executor.map(abs, range(args.workers)))
+
+    for count in args.counts:
+        connection_strings = make_connection_strings(count)
+        run(
+            "serial",
+            connection_strings,
+            lambda: (
+                SymmetricKeyAuth.create_from_connection_string(x)
+                for x in connection_strings
+            ),
+        )
+        run(
+            "bulk (calling thread)",
+            connection_strings,
+            lambda: create_symmetric_key_auths(connection_strings),
+        )
+        run(
+            "bulk (process pool)",
+            connection_strings,
+            lambda: create_symmetric_key_auths(connection_strings, executor),
+        )
+
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="bulk_minting")
+    parser.add_argument(
+        "--counts",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Numbers of identities to create",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes",
+    )
+    main(parser.parse_args())
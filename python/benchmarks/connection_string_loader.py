@@ -0,0 +1,124 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import argparse
+import base64
+import csv
+import logging
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable
+from helpers.connection_string import ConnectionString
+from helpers.connection_string_loader import load_connection_strings
+
+# BENCHMARK
+#
+# Measures the time and peak memory needed to load N connection strings from a file.  One in
+# every 100 connection strings is a duplicate of an earlier identity.
+#
+#   read all          - read the whole file, parse every line into a list, and dedupe with a
+#                       dict, which is what a simple loader does
+#   streaming lines   - `load_connection_strings` with a file that has one connection string
+#                       on each line
+#   streaming csv     - `load_connection_strings` with a CSV file
+#
+# Each loader's results are consumed one at a time and thrown away, the way a gateway does
+# when it hands them to `create_symmetric_key_auths`.  Peak memory is measured with
+# `tracemalloc` in a separate run, since tracing slows everything down.  Most of the
+# streaming loaders' memory is the set of identities used to find duplicates.
+#
+# Run from the `python` directory:
+#   python -m benchmarks.connection_string_loader
+
+DUPLICATE_INTERVAL = 100
+
+
+def write_files(directory: str, count: int) -> Dict[str, str]:
+    """
+    Write the same connection strings to a line file and a CSV file.
+
+    :returns: dict with the paths of the files, keyed by format.
+    """
+    lines_path = os.path.join(directory, "identities.txt")
+    csv_path = os.path.join(directory, "identities.csv")
+    with open(lines_path, "w") as lines_file, open(
+        csv_path, "w", newline=""
+    ) as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["DeviceId", "ConnectionString"])
+        for i in range(count):
+            device_id = "leaf{}".format(
+                i - 1 if i % DUPLICATE_INTERVAL == 1 else i
+            )
+            connection_string = "HostName=hub.azure-devices.net;DeviceId={};SharedAccessKey={}".format(
+                device_id, base64.b64encode(os.urandom(32)).decode("utf-8")
+            )
+            lines_file.write(connection_string + "\n")
+            writer.writerow([device_id, connection_string])
+    return {"lines": lines_path, "csv": csv_path}
+
+
+def read_all(path: str) -> Iterable[ConnectionString]:
+    with open(path, "r") as f:
+        conn_strs = [ConnectionString(line) for line in f.read().splitlines()]
+    unique: Dict[Any, ConnectionString] = {}
+    for conn_str in conn_strs:
+        key = (conn_str["HostName"], conn_str["DeviceId"])
+        unique.setdefault(key, conn_str)
+    return unique.values()
+
+
+def run(name: str, load: Callable[[], Iterable[ConnectionString]]) -> None:
+    start = time.perf_counter()
+    count = sum(1 for _ in load())
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    sum(1 for _ in load())
+    (_, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        "  {:<18} {:>7} identities: {:>7.3f}s ({:>9.0f} identities/sec)  peak={:>9.1f}KB".format(
+            name, count, elapsed, count / elapsed, peak / 1024
+        )
+    )
+
+
+def main(args: Any) -> None:
+    # Don't log a warning for every duplicate.
+    logging.getLogger("helpers.connection_string_loader").setLevel(
+        logging.ERROR
+    )
+    directory = tempfile.mkdtemp()
+    try:
+        for count in args.counts:
+            paths = write_files(directory, count)
+            print(
+                "{} connection strings ({} bytes)".format(
+                    count, os.path.getsize(paths["lines"])
+                )
+            )
+            run("read all", lambda: read_all(paths["lines"]))
+            run(
+                "streaming lines",
+                lambda: load_connection_strings(paths["lines"]),
+            )
+            run("streaming csv", lambda: load_connection_strings(paths["csv"]))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="connection_string_loader")
+    parser.add_argument(
+        "--counts",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Numbers of connection strings to load",
+    )
+    main(parser.parse_args())
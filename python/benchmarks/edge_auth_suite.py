@@ -0,0 +1,256 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+from typing import Any, Callable, List
+from helpers import EdgeAuth
+from helpers.hmac_signing_mechanism import HmacSigningMechanism
+from helpers.sign_coalescer import SignRequestCoalescer
+from .fake_workload_server import FakeWorkloadServer
+
+# BENCHMARK
+#
+# Benchmarks for `EdgeAuth` and the workload API clients, run against a local fake workload
+# server, so no iotedged is needed.
+#
+#   startup  - time to create an `EdgeAuth` object (trust bundle + first SAS token), sync
+#              and async, with and without a cached trust bundle and SAS token
+#   minting  - SAS token signatures per second through the workload API, using one thread,
+#              many threads with `SignRequestCoalescer`, and many coroutines with
+#              `AsyncEdgeWorkloadApi`
+#   renewal  - time spent inside `renew_sas_token`, with and without a precomputed token
+#   errors   - how many calls fail when the server injects errors
+#
+# Use `--latency` to simulate a slow workload API.
+#
+# Run from the `python` directory:
+#   python -m benchmarks.edge_auth_suite
+
+
+def report(name: str, latencies: List[float]) -> None:
+    latencies = sorted(latencies)
+    print(
+        "  {:<50} mean={:>8.3f}ms p50={:>8.3f}ms max={:>8.3f}ms".format(
+            name,
+            1000 * statistics.mean(latencies),
+            1000 * latencies[len(latencies) // 2],
+            1000 * latencies[-1],
+        )
+    )
+
+
+def time_calls(count: int, function: Callable[[], Any]) -> List[float]:
+    latencies: List[float] = []
+    for _ in range(count):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def benchmark_startup(server: FakeWorkloadServer, args: Any) -> None:
+    print("startup")
+    report(
+        "EdgeAuth.create_from_environment",
+        time_calls(args.iterations, EdgeAuth.create_from_environment),
+    )
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache_path = os.path.join(temp_dir, "trust_bundle.json")
+        token_cache_directory = os.path.join(temp_dir, "tokens")
+        auths: List[EdgeAuth] = []
+
+        def create_cached(sas_token_cache_directory: str = None) -> None:
+            auths.append(
+                EdgeAuth.create_from_environment(
+                    cache_path, sas_token_cache_directory
+                )
+            )
+
+        create_cached(token_cache_directory)
+        report(
+            "EdgeAuth.create_from_environment (cached)",
+            time_calls(args.iterations, create_cached),
+        )
+        report(
+            "EdgeAuth.create_from_environment (cached + token)",
+            time_calls(
+                args.iterations, lambda: create_cached(token_cache_directory)
+            ),
+        )
+
+        # Let the background trust bundle refreshes finish before the cache is removed.
+        for auth in auths:
+            if auth.trust_bundle_refresh_thread:
+                auth.trust_bundle_refresh_thread.join()
+
+    async def create_async() -> List[float]:
+        latencies: List[float] = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            auth = await EdgeAuth.create_from_environment_async()
+            latencies.append(time.perf_counter() - start)
+            await auth.async_workload_api.close()
+        return latencies
+
+    report(
+        "EdgeAuth.create_from_environment_async",
+        asyncio.run(create_async()),
+    )
+
+
+def benchmark_minting(server: FakeWorkloadServer, args: Any) -> None:
+    print("minting ({} signatures)".format(args.signatures))
+    auth = EdgeAuth.create_from_environment()
+    messages = ["data-{}".format(i) for i in range(args.signatures)]
+
+    def rate(name: str, elapsed: float) -> None:
+        print(
+            "  {:<50} {:>9.0f} signatures/sec".format(
+                name, args.signatures / elapsed
+            )
+        )
+
+    start = time.perf_counter()
+    for message in messages:
+        auth.workload_api.sign(message)
+    rate("EdgeWorkloadApi, 1 thread", time.perf_counter() - start)
+
+    coalescer = SignRequestCoalescer(
+        auth.workload_api.sign, max_concurrent_requests=args.concurrency
+    )
+    remaining = iter(messages)
+    lock = threading.Lock()
+
+    def worker() -> None:
+        while True:
+            with lock:
+                message = next(remaining, None)
+            if message is None:
+                return
+            coalescer.sign(message)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    rate(
+        "SignRequestCoalescer, {} threads".format(args.concurrency),
+        time.perf_counter() - start,
+    )
+    coalescer.shutdown()
+
+    async def sign_async() -> float:
+        async_auth = await EdgeAuth.create_from_environment_async()
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[async_auth.async_workload_api.sign(m) for m in messages]
+        )
+        elapsed = time.perf_counter() - start
+        await async_auth.async_workload_api.close()
+        return elapsed
+
+    rate("AsyncEdgeWorkloadApi, gather", asyncio.run(sign_async()))
+
+
+def benchmark_renewal(server: FakeWorkloadServer, args: Any) -> None:
+    print("renewal")
+    auth = EdgeAuth.create_from_environment()
+    report(
+        "renew_sas_token",
+        time_calls(args.iterations, auth.renew_sas_token),
+    )
+
+    def precompute_then_renew() -> List[float]:
+        latencies: List[float] = []
+        for _ in range(args.iterations):
+            auth.precompute_sas_token()
+            latencies += time_calls(1, auth.renew_sas_token)
+        return latencies
+
+    report("renew_sas_token (precomputed)", precompute_then_renew())
+
+    # Make sure the tokens are signed with the module's key.
+    module_key = server.get_module_key_base64(auth.module_id)
+    expected = HmacSigningMechanism(module_key).sign(
+        auth.sas_token._get_message_to_sign(auth.sas_token_expiry_time)
+    )
+    assert auth.sas_token._format_token(
+        expected, auth.sas_token_expiry_time
+    ) == str(auth.sas_token)
+
+
+def benchmark_errors(server: FakeWorkloadServer, args: Any) -> None:
+    print("errors (error rate {})".format(args.error_rate))
+    auth = EdgeAuth.create_from_environment()
+    server.error_rate = args.error_rate
+    failures = 0
+    for i in range(args.iterations):
+        try:
+            auth.workload_api.sign("data-{}".format(i))
+        except OSError:
+            failures += 1
+    server.error_rate = 0
+    print("  {} of {} sign calls failed".format(failures, args.iterations))
+
+
+def main(args: Any) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        server = FakeWorkloadServer(
+            os.path.join(temp_dir, "workload.sock"),
+            latency=args.latency,
+            seed=1,
+        )
+        server.start()
+        os.environ.update(server.get_environment())
+
+        benchmark_startup(server, args)
+        benchmark_minting(server, args)
+        benchmark_renewal(server, args)
+        benchmark_errors(server, args)
+
+        print("server handled {} requests".format(server.request_count))
+        server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="edge_auth_suite")
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.002,
+        help="Seconds the fake workload API waits before answering",
+    )
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=100,
+        help="Number of iterations for latency measurements",
+    )
+    parser.add_argument(
+        "--signatures",
+        type=int,
+        default=2000,
+        help="Number of signatures for throughput measurements",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Number of threads or connections for concurrent signing",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.1,
+        help="Fraction of requests which fail in the errors benchmark",
+    )
+    main(parser.parse_args())
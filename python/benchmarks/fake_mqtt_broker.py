@@ -0,0 +1,197 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import argparse
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Any, Tuple
+
+# Fake MQTT broker, used by the benchmarks so they can run without a real broker.
+#
+# Implements just enough of MQTT 3.1.1 for a client to connect and publish:
+#   CONNECT     -> CONNACK (always accepted)
+#   PUBLISH     -> PUBACK for QoS 1.  Messages are not delivered to anyone.
+#   SUBSCRIBE   -> SUBACK, granting the requested QoS
+#   PINGREQ     -> PINGRESP
+#   DISCONNECT  -> close
+#
+# PUBACKs can be delayed by `ack_latency` seconds to simulate the round trip to a remote hub.
+# Delayed PUBACKs are still pipelined: a PUBACK is sent `ack_latency` seconds after its
+# PUBLISH arrives, no matter how many other messages are waiting.  There is no TLS.
+#
+# To run the broker by itself, from the `python` directory:
+#   python -m benchmarks.fake_mqtt_broker --port 1883
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+SUBSCRIBE = 8
+SUBACK = 9
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+
+def _encode_packet(packet_type: int, body: bytes) -> bytes:
+    header = bytearray([packet_type << 4])
+    length = len(body)
+    while True:
+        (length, digit) = divmod(length, 128)
+        header.append(digit | (0x80 if length else 0))
+        if not length:
+            break
+    return bytes(header) + body
+
+
+class _MqttRequestHandler(socketserver.StreamRequestHandler):
+    server: "FakeMqttBroker"
+
+    def _read_packet(self) -> Tuple[int, int, bytes]:
+        """
+        :returns: tuple of `(packet_type, flags, body)`, or `(None, None, None)` if the client
+            closed the connection.
+        """
+        first = self.rfile.read(1)
+        if not first:
+            return (None, None, None)
+        length = 0
+        multiplier = 1
+        while True:
+            digit = self.rfile.read(1)[0]
+            length += (digit & 0x7F) * multiplier
+            multiplier *= 128
+            if not digit & 0x80:
+                break
+        return (first[0] >> 4, first[0] & 0x0F, self.rfile.read(length))
+
+    def _write_packets(self) -> None:
+        """
+        Send packets from `outgoing`, each one at its due time.  Packets are queued in the
+        order they are due, since every PUBACK has the same latency.
+        """
+        while True:
+            item = self.outgoing.get()
+            if item is None:
+                return
+            (due, packet) = item
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.connection.sendall(packet)
+            except OSError:
+                return
+
+    def _send(self, packet_type: int, body: bytes, delay: float = 0) -> None:
+        self.outgoing.put(
+            (time.perf_counter() + delay, _encode_packet(packet_type, body))
+        )
+
+    def handle(self) -> None:
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.outgoing: queue.Queue[Any] = queue.Queue()
+        writer = threading.Thread(target=self._write_packets)
+        writer.daemon = True
+        writer.start()
+        try:
+            while True:
+                (packet_type, flags, body) = self._read_packet()
+                if packet_type is None or packet_type == DISCONNECT:
+                    return
+                elif packet_type == CONNECT:
+                    self._send(CONNACK, b"\x00\x00")
+                elif packet_type == PUBLISH:
+                    self.server.count_publish()
+                    qos = (flags >> 1) & 0x03
+                    if qos:
+                        topic_length = struct.unpack("!H", body[:2])[0]
+                        packet_id = body[2 + topic_length : 4 + topic_length]
+                        self._send(PUBACK, packet_id, self.server.ack_latency)
+                elif packet_type == SUBSCRIBE:
+                    granted = bytearray()
+                    offset = 2
+                    while offset < len(body):
+                        topic_length = struct.unpack(
+                            "!H", body[offset : offset + 2]
+                        )[0]
+                        offset += 2 + topic_length
+                        granted.append(body[offset])
+                        offset += 1
+                    self._send(SUBACK, body[:2] + bytes(granted))
+                elif packet_type == PINGREQ:
+                    self._send(PINGRESP, b"")
+        finally:
+            self.outgoing.put(None)
+            writer.join()
+
+
+class FakeMqttBroker(socketserver.ThreadingTCPServer):
+    """
+    Fake MQTT broker.  Each connection is handled on its own thread.
+
+    Data Attributes:
+    host (str): Address the broker listens on
+    port (int): Port the broker listens on
+    ack_latency (float): Number of seconds to wait before sending each PUBACK
+    publish_count (int): Number of PUBLISH packets the broker has received
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 0, ack_latency: float = 0
+    ) -> None:
+        super(FakeMqttBroker, self).__init__((host, port), _MqttRequestHandler)
+        self.host = host
+        self.port: int = self.server_address[1]
+        self.ack_latency = ack_latency
+        self.lock = threading.Lock()
+        self.publish_count = 0
+
+    def count_publish(self) -> None:
+        with self.lock:
+            self.publish_count += 1
+
+    def start(self) -> None:
+        """
+        Start serving on a background thread.
+        """
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="fake_mqtt_broker")
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="Address to listen on"
+    )
+    parser.add_argument(
+        "--port", type=int, default=1883, help="Port to listen on"
+    )
+    parser.add_argument(
+        "--ack-latency",
+        type=float,
+        default=0,
+        help="Seconds to wait before sending each PUBACK",
+    )
+    args = parser.parse_args()
+
+    broker = FakeMqttBroker(args.host, args.port, args.ack_latency)
+    print("Listening on {}:{}".format(broker.host, broker.port))
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.server_close()
@@ -0,0 +1,280 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import argparse
+import base64
+import hashlib
+import hmac
+import http.server
+import json
+import os
+import random
+import re
+import socketserver
+import threading
+import time
+from typing import Any, Dict
+
+# Fake Edge workload API server, used by the benchmarks so they can run without iotedged.
+#
+# Listens on a unix socket and implements the two calls that `EdgeWorkloadApi` makes:
+#   GET  /trust-bundle
+#   POST /modules/{module_id}/genid/{generation_id}/sign
+#
+# Signatures are real HMAC-SHA256 signatures.  Each module gets its own key, derived from the
+# server's key and the module id, so signatures can be verified with `get_module_key`.
+#
+# Responses use HTTP/1.1 with keep-alive, like the real workload API.  Latency and errors can
+# be injected to see how callers behave when the workload API is slow or failing.
+#
+# To run the server by itself, from the `python` directory:
+#   python -m benchmarks.fake_workload_server --socket /tmp/workload.sock
+# and set IOTEDGE_WORKLOADURI=unix:///tmp/workload.sock
+
+FAKE_CERTIFICATE = (
+    "-----BEGIN CERTIFICATE-----\nFAKE\n-----END CERTIFICATE-----\n"
+)
+
+_sign_path = re.compile(r"^/modules/([^/]+)/genid/([^/]+)/sign$")
+
+
+class _WorkloadRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeWorkloadServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # The base class logs every request to stderr, and it doesn't understand the empty
+        # client address that unix sockets have.
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _inject_latency_and_errors(self) -> bool:
+        """
+        Sleep for the configured latency and decide if this request should fail.
+
+        :returns: True if an error response was sent and the request should not be handled.
+        """
+        self.server.count_request()
+        latency = self.server.get_latency()
+        if latency:
+            time.sleep(latency)
+        if self.server.should_fail():
+            self.server.count_error()
+            self._send_json(
+                self.server.error_status, {"message": "injected error"}
+            )
+            return True
+        return False
+
+    def do_GET(self) -> None:
+        if self._inject_latency_and_errors():
+            return
+        if self.path.split("?")[0] == "/trust-bundle":
+            self._send_json(200, {"certificate": self.server.certificate})
+        else:
+            self._send_json(404, {"message": "not found"})
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self._inject_latency_and_errors():
+            return
+
+        match = _sign_path.match(self.path.split("?")[0])
+        if not match:
+            self._send_json(404, {"message": "not found"})
+            return
+
+        try:
+            sign_request = json.loads(body)
+            data = base64.b64decode(sign_request["data"])
+        except (ValueError, KeyError):
+            self._send_json(400, {"message": "bad sign request"})
+            return
+
+        key = self.server.get_module_key(match.group(1))
+        digest = hmac.HMAC(key, data, hashlib.sha256).digest()
+        self._send_json(
+            200, {"digest": base64.b64encode(digest).decode("utf-8")}
+        )
+
+
+class FakeWorkloadServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Fake workload API server.  Each connection is handled on its own thread.
+
+    Data Attributes:
+    socket_path (str): Path of the unix socket the server listens on
+    workload_uri (str): Value to use for `IOTEDGE_WORKLOADURI` to connect to this server
+    key (bytes): Key used to derive the per-module signing keys
+    certificate (str): Certificate returned in the trust bundle
+    latency (float): Number of seconds to wait before answering each request
+    latency_jitter (float): Up to this many seconds are added to `latency`, at random
+    error_rate (float): Fraction of requests, from 0 to 1, which fail with `error_status`
+    error_status (int): HTTP status code returned for injected errors
+    request_count (int): Number of requests the server has received
+    error_count (int): Number of injected errors the server has returned
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        socket_path: str,
+        key: bytes = None,
+        certificate: str = FAKE_CERTIFICATE,
+        latency: float = 0,
+        latency_jitter: float = 0,
+        error_rate: float = 0,
+        error_status: int = 500,
+        seed: int = None,
+    ) -> None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super(FakeWorkloadServer, self).__init__(
+            socket_path, _WorkloadRequestHandler
+        )
+        self.socket_path = socket_path
+        self.workload_uri = "unix://" + socket_path
+        self.key = key or os.urandom(32)
+        self.certificate = certificate
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.error_count = 0
+        self.forced_errors = 0
+
+    def get_module_key(self, module_id: str) -> bytes:
+        """
+        Return the key used to sign data for the given module.
+        """
+        return hmac.HMAC(
+            self.key, module_id.encode("utf-8"), hashlib.sha256
+        ).digest()
+
+    def get_module_key_base64(self, module_id: str) -> str:
+        """
+        Return the key used to sign data for the given module, base64-encoded, in the form that
+        `HmacSigningMechanism` accepts.
+        """
+        return base64.b64encode(self.get_module_key(module_id)).decode("utf-8")
+
+    def fail_next_requests(self, count: int) -> None:
+        """
+        Make the next `count` requests fail with `error_status`, regardless of `error_rate`.
+        """
+        with self.lock:
+            self.forced_errors += count
+
+    def get_latency(self) -> float:
+        with self.lock:
+            return self.latency + self.latency_jitter * self.random.random()
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            if self.forced_errors:
+                self.forced_errors -= 1
+                return True
+            return self.random.random() < self.error_rate
+
+    def count_request(self) -> None:
+        with self.lock:
+            self.request_count += 1
+
+    def count_error(self) -> None:
+        with self.lock:
+            self.error_count += 1
+
+    def start(self) -> None:
+        """
+        Start serving on a background thread.
+        """
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop serving and remove the socket.
+        """
+        self.shutdown()
+        self.server_close()
+        os.unlink(self.socket_path)
+
+    def get_environment(
+        self,
+        device_id: str = "device",
+        module_id: str = "module",
+        hostname: str = "hub.azure-devices.net",
+    ) -> Dict[str, str]:
+        """
+        Return the environment variables that an Edge module running against this server
+        would have.  These can be added to `os.environ` before calling
+        `EdgeAuth.create_from_environment`.
+        """
+        return {
+            "IOTEDGE_IOTHUBHOSTNAME": hostname,
+            "IOTEDGE_DEVICEID": device_id,
+            "IOTEDGE_MODULEID": module_id,
+            "IOTEDGE_MODULEGENERATIONID": "1",
+            "IOTEDGE_WORKLOADURI": self.workload_uri,
+            "IOTEDGE_APIVERSION": "2019-01-30",
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="fake_workload_server")
+    parser.add_argument(
+        "--socket", required=True, help="Path of the unix socket to listen on"
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0,
+        help="Seconds to wait before answering each request",
+    )
+    parser.add_argument(
+        "--latency-jitter",
+        type=float,
+        default=0,
+        help="Up to this many extra seconds of latency, at random",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0,
+        help="Fraction of requests which fail",
+    )
+    parser.add_argument(
+        "--error-status",
+        type=int,
+        default=500,
+        help="HTTP status returned for failed requests",
+    )
+    args = parser.parse_args()
+
+    server = FakeWorkloadServer(
+        args.socket,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+    )
+    print("Listening on {}".format(server.workload_uri))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
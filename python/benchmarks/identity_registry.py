@@ -0,0 +1,142 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import argparse
+import base64
+import os
+import random
+import time
+import tracemalloc
+from typing import Any, Callable, List
+from helpers import IdentityRegistry, SymmetricKeyAuth
+
+# BENCHMARK
+#
+# Measures the memory and time needed for a gateway which knows many leaf identities but
+# only uses a few thousand of them at a time.
+#
+#   eager      - create a `SymmetricKeyAuth` (and sign a SAS token) for every identity at
+#                startup, and look them up in a dict
+#   registry   - add every identity to an `IdentityRegistry`, which creates auth objects the
+#                first time they are used and evicts the least recently used ones
+#
+# After startup, both look up `--lookups` identities.  Lookups are spread randomly over a
+# window of `--working-set` identities, and the window slides across a `--drift` fraction of
+# the identities while the benchmark runs, so some identities go idle and others become
+# active.
+#
+# Run from the `python` directory:
+#   python -m benchmarks.identity_registry
+
+
+def make_connection_strings(count: int) -> List[str]:
+    return [
+        "HostName=hub.azure-devices.net;DeviceId=leaf{};SharedAccessKey={}".format(
+            i, base64.b64encode(os.urandom(32)).decode("utf-8")
+        )
+        for i in range(count)
+    ]
+
+
+def make_lookups(args: Any) -> List[str]:
+    lookups = []
+    distance = int(args.drift * (args.identities - args.working_set))
+    for i in range(args.lookups):
+        start = i * distance // args.lookups
+        index = start + random.randrange(args.working_set)
+        lookups.append("leaf{}".format(index))
+    return lookups
+
+
+def run(
+    name: str,
+    start: Callable[[], Callable[[str], Any]],
+    lookups: List[str],
+) -> None:
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    get = start()
+    startup = time.perf_counter() - start_time
+    for client_id in lookups:
+        get(client_id)
+    elapsed = time.perf_counter() - start_time
+    (current, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        "  {:<10} startup={:>7.3f}s total={:>7.3f}s current={:>8.1f}MB peak={:>8.1f}MB".format(
+            name, startup, elapsed, current / 2**20, peak / 2**20
+        )
+    )
+
+
+def main(args: Any) -> None:
+    connection_strings = make_connection_strings(args.identities)
+    lookups = make_lookups(args)
+    print(
+        "{} identities, {} lookups, working set of {}, drift={}, max_active={}".format(
+            args.identities,
+            args.lookups,
+            args.working_set,
+            args.drift,
+            args.max_active,
+        )
+    )
+
+    def start_eager() -> Callable[[str], Any]:
+        auths = {}
+        for connection_string in connection_strings:
+            auth = SymmetricKeyAuth.create_from_connection_string(
+                connection_string
+            )
+            auths[auth.client_id] = auth
+        return auths.__getitem__
+
+    registry = IdentityRegistry(max_active=args.max_active)
+
+    def start_registry() -> Callable[[str], Any]:
+        registry.add_many(connection_strings)
+        return registry.get
+
+    run("eager", start_eager, lookups)
+    run("registry", start_registry, lookups)
+    print(
+        "  registry created {} auth objects and evicted {}".format(
+            registry.created.value, registry.evicted.value
+        )
+    )
+    registry.evict_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="identity_registry")
+    parser.add_argument(
+        "--identities",
+        type=int,
+        default=100000,
+        help="Number of known identities",
+    )
+    parser.add_argument(
+        "--working-set",
+        type=int,
+        default=2000,
+        help="Number of identities being used at any one time",
+    )
+    parser.add_argument(
+        "--drift",
+        type=float,
+        default=0.1,
+        help="Fraction of the identities that the working set moves across",
+    )
+    parser.add_argument(
+        "--max-active",
+        type=int,
+        default=5000,
+        help="max_active for the registry",
+    )
+    parser.add_argument(
+        "--lookups",
+        type=int,
+        default=200000,
+        help="Number of identities to look up after startup",
+    )
+    main(parser.parse_args())
@@ -0,0 +1,114 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, List, Set, Tuple
+
+# BENCHMARK
+#
+# Measures how long it takes to import the helpers that a module needs at startup, using
+# `python -X importtime` in a fresh interpreter for each run, and checks the results against
+# a budget.
+#
+#   import helpers                          - the package itself
+#   from helpers import SymmetricKeyAuth    - what a symmetric key module imports
+#   from helpers import EdgeAuth            - what an Edge module imports
+#
+# Each statement also has a list of modules it must not import.  In particular,
+# `SymmetricKeyAuth` must not import `requests`, which only `EdgeAuth` needs.  Budgets depend
+# on the machine, so they can be scaled with `--budget-scale`.  Imports that aren't caused by
+# the statement (like the interpreter's own startup) aren't counted.
+#
+# Exits with status 1 if any statement goes over budget or imports a forbidden module.
+#
+# Run from the `python` directory:
+#   python -m benchmarks.import_time
+
+# (statement, budget in milliseconds, modules which must not be imported)
+CASES: List[Tuple[str, float, List[str]]] = [
+    ("import helpers", 10, ["requests", "asyncio", "ssl"]),
+    ("from helpers import SymmetricKeyAuth", 100, ["requests", "asyncio"]),
+    ("from helpers import EdgeAuth", 300, []),
+]
+
+
+def measure(statement: str) -> Tuple[float, Set[str]]:
+    """
+    Import `statement` in a new interpreter.
+
+    :returns: tuple of `(milliseconds, modules)`, where `milliseconds` is the total
+        cumulative import time of the top-level imports done by `statement` and `modules` is
+        the set of modules that were imported.
+    """
+    # Import everything the interpreter imports on its own first, so it isn't counted.
+    marker = "import sys; sys.stderr.write('MARKER\\n'); "
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", marker + statement],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        stderr=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    )
+    lines = result.stderr.split("MARKER\n", 1)[1].splitlines()
+
+    total_us = 0
+    modules: Set[str] = set()
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        (_, cumulative, name) = line.split("|")
+        if not cumulative.strip().isdigit():
+            # header line
+            continue
+        modules.add(name.strip())
+        # Top-level imports have no indentation beyond the single separator space.
+        if not name.startswith("  "):
+            total_us += int(cumulative)
+    return (total_us / 1000, modules)
+
+
+def main(args: Any) -> int:
+    failed = False
+    for (statement, budget, forbidden) in CASES:
+        budget *= args.budget_scale
+        runs = [measure(statement) for _ in range(args.runs)]
+        median = statistics.median(ms for (ms, modules) in runs)
+        imported = set.union(*(modules for (ms, modules) in runs))
+        bad_imports = sorted(
+            set(name.split(".")[0] for name in imported) & set(forbidden)
+        )
+
+        status = "ok"
+        if median > budget:
+            status = "OVER BUDGET"
+            failed = True
+        if bad_imports:
+            status = "FORBIDDEN IMPORTS: {}".format(", ".join(bad_imports))
+            failed = True
+        print(
+            "  {:<40} median={:>7.1f}ms budget={:>6.1f}ms modules={:>4}  {}".format(
+                statement, median, budget, len(imported), status
+            )
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="import_time")
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=5,
+        help="Number of times to measure each statement",
+    )
+    parser.add_argument(
+        "--budget-scale",
+        type=float,
+        default=1.0,
+        help="Multiply all budgets by this value, for slower or faster machines",
+    )
+    sys.exit(main(parser.parse_args()))
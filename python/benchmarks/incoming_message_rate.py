@@ -0,0 +1,99 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import argparse
+import threading
+import time
+from typing import Any, Type, Union
+from helpers import IncomingMessageList, HandoffIncomingMessageList
+
+# BENCHMARK
+#
+# Measures the sustained rate that a producer (standing in for the Paho network thread) can
+# add messages to an incoming message list, with and without a consumer thread contending
+# for the list.
+#
+# In the contention case, the list is pre-filled with c2d messages that nobody pops, so the
+# consumer holds the list's lock while it scans past them looking for method requests.
+#
+# Run from the `python` directory:
+#   python -m benchmarks.incoming_message_rate
+
+
+class FakeMessage(object):
+    def __init__(self, topic: str) -> None:
+        self.topic = topic
+        self.payload: Union[str, bytes] = b""
+
+
+def run(
+    list_class: Type[IncomingMessageList],
+    message_count: int,
+    backlog: int,
+    contention: bool,
+) -> None:
+    # ttls={} so expiry sweeps don't affect the measurement
+    incoming = list_class(ttls={})
+
+    if contention:
+        for i in range(backlog):
+            incoming.add_item(
+                FakeMessage("devices/d/messages/devicebound/{}".format(i))
+            )
+        # Make sure the backlog is in the list (and not in a handoff queue) before we start.
+        incoming.get_depths()
+
+    messages = [
+        FakeMessage("$iothub/methods/POST/work/?$rid={}".format(i))
+        for i in range(message_count)
+    ]
+    consumed = 0
+
+    def consume() -> None:
+        nonlocal consumed
+        while consumed < message_count:
+            if incoming.pop_next_method_request(method_name="work", timeout=1):
+                consumed += 1
+
+    consumer = threading.Thread(target=consume)
+    if contention:
+        consumer.start()
+
+    start = time.perf_counter()
+    for message in messages:
+        incoming.add_item(message)
+    produce_time = time.perf_counter() - start
+
+    if not contention:
+        consumer.start()
+    consumer.join()
+    total_time = time.perf_counter() - start
+
+    print(
+        "{:<28} contention={:<5}  add_item: {:>10,.0f} msg/s   end-to-end: {:>10,.0f} msg/s".format(
+            list_class.__name__,
+            str(contention),
+            message_count / produce_time,
+            message_count / total_time,
+        )
+    )
+
+
+def main(args: Any) -> None:
+    for contention in (False, True):
+        for list_class in (IncomingMessageList, HandoffIncomingMessageList):
+            run(list_class, args.messages, args.backlog, contention)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="incoming_message_rate")
+    parser.add_argument(
+        "--messages", type=int, default=20000, help="Number of messages to add"
+    )
+    parser.add_argument(
+        "--backlog",
+        type=int,
+        default=1000,
+        help="Number of unclaimed messages in the list for the contention case",
+    )
+    main(parser.parse_args())
@@ -0,0 +1,168 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import argparse
+import threading
+import time
+from typing import Any, Callable, List
+from paho.mqtt import client as mqtt
+from helpers import PublishWindow
+from .fake_mqtt_broker import FakeMqttBroker
+
+# BENCHMARK
+#
+# Measures QoS 1 publish throughput against an MQTT broker, comparing:
+#
+#   list            - what `uber_sample.send_telemetry` used to do: keep every
+#                     `MQTTMessageInfo` in a list, rebuild the list after each publish to drop
+#                     the acknowledged ones, and wait for the rest one at a time at the end
+#   window N        - `PublishWindow` with `window_size=N`, which tracks PUBACKs in a dict by
+#                     message id and never has more than N messages in flight
+#
+# `publisher cpu` is the CPU time used by the thread which publishes, which includes the time
+# spent keeping track of messages, but not Paho's network thread.
+#
+# Paho's own in-flight limit is set to `--paho-inflight` for every client.  Messages over
+# that limit are queued inside Paho.
+#
+# By default, a fake broker is started in this process, with `--ack-latency` seconds of
+# delay before each PUBACK to simulate the round trip to a remote hub.  Use `--host` and
+# `--port` to run against a real broker (without TLS) instead.
+#
+# Run from the `python` directory:
+#   python -m benchmarks.publish_window
+#   python -m benchmarks.publish_window --host localhost --port 1883
+
+
+def connect(args: Any, host: str, port: int) -> mqtt.Client:
+    connected = threading.Event()
+    client = mqtt.Client("publish_window_benchmark")
+    client.max_inflight_messages_set(args.paho_inflight)
+    client.on_connect = lambda client, userdata, flags, rc: connected.set()
+    client.loop_start()
+    client.connect(host, port)
+    if not connected.wait(timeout=10):
+        raise Exception("Failed to connect to {}:{}".format(host, port))
+    return client
+
+
+def disconnect(client: mqtt.Client) -> None:
+    client.disconnect()
+    client.loop_stop()
+
+
+def send_with_list(client: mqtt.Client, args: Any, payload: bytes) -> None:
+    outstanding_messages: List[mqtt.MQTTMessageInfo] = []
+    for _ in range(args.messages):
+        mi = client.publish(args.topic, payload, qos=1)
+        outstanding_messages.append(mi)
+        outstanding_messages = [
+            x for x in outstanding_messages if not x.is_published()
+        ]
+    while len(outstanding_messages):
+        outstanding_messages[0].wait_for_publish()
+        outstanding_messages = [
+            x for x in outstanding_messages if not x.is_published()
+        ]
+
+
+def send_with_window(window_size: int) -> Callable[..., None]:
+    def send(client: mqtt.Client, args: Any, payload: bytes) -> None:
+        window = PublishWindow(
+            lambda topic, payload: client.publish(topic, payload, qos=1).mid,
+            window_size=window_size,
+        )
+        client.on_publish = lambda client, userdata, mid: (
+            window.handle_puback(mid)
+        )
+        for _ in range(args.messages):
+            window.publish(args.topic, payload)
+        window.wait_for_all()
+
+    return send
+
+
+def run(
+    name: str,
+    args: Any,
+    host: str,
+    port: int,
+    send: Callable[[mqtt.Client, Any, bytes], None],
+) -> None:
+    client = connect(args, host, port)
+    payload = b"x" * args.payload_size
+    start = time.perf_counter()
+    start_cpu = time.thread_time()
+    send(client, args, payload)
+    cpu = time.thread_time() - start_cpu
+    elapsed = time.perf_counter() - start
+    disconnect(client)
+    print(
+        "  {:<12} {:>7} messages: {:>7.3f}s ({:>8.0f} messages/sec)  publisher cpu={:>7.3f}s".format(
+            name, args.messages, elapsed, args.messages / elapsed, cpu
+        )
+    )
+
+
+def main(args: Any) -> None:
+    broker: FakeMqttBroker = None
+    if args.host:
+        (host, port) = (args.host, args.port)
+        print("broker {}:{}".format(host, port))
+    else:
+        broker = FakeMqttBroker(ack_latency=args.ack_latency)
+        broker.start()
+        (host, port) = (broker.host, broker.port)
+        print("fake broker, ack_latency={}s".format(args.ack_latency))
+
+    try:
+        run("list", args, host, port, send_with_list)
+        for window_size in args.windows:
+            run(
+                "window {}".format(window_size),
+                args,
+                host,
+                port,
+                send_with_window(window_size),
+            )
+    finally:
+        if broker:
+            broker.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="publish_window")
+    parser.add_argument(
+        "--host",
+        help="Address of the MQTT broker.  If not set, a fake broker is used",
+    )
+    parser.add_argument(
+        "--port", type=int, default=1883, help="Port of the MQTT broker"
+    )
+    parser.add_argument(
+        "--ack-latency",
+        type=float,
+        default=0.01,
+        help="Seconds the fake broker waits before each PUBACK",
+    )
+    parser.add_argument(
+        "--messages", type=int, default=10000, help="Number of messages to send"
+    )
+    parser.add_argument(
+        "--payload-size", type=int, default=256, help="Size of each payload"
+    )
+    parser.add_argument("--topic", default="devices/benchmark/messages/events/")
+    parser.add_argument(
+        "--windows",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="Window sizes to test",
+    )
+    parser.add_argument(
+        "--paho-inflight",
+        type=int,
+        default=1000,
+        help="Paho's in-flight message limit",
+    )
+    main(parser.parse_args())
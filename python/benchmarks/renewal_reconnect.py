@@ -0,0 +1,260 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import argparse
+import functools
+import queue
+import statistics
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+from helpers.connection_switcher import ConnectionSwitcher
+
+# BENCHMARK
+#
+# Measures how long QoS 1 telemetry is delayed when the SAS token is renewed, comparing:
+#
+#   reconnect  - the samples' approach: set the new password and reconnect the same client.
+#                Messages published while it reconnects wait for the new CONNACK.
+#   switcher   - `ConnectionSwitcher`: connect a second client with the new password and
+#                move traffic to it once it is connected.
+#
+# The hub is simulated in memory, with a configurable connect latency and PUBACK latency.
+# Like IoT Hub, it drops the old connection when a new one connects with the same client id.
+# A publisher thread sends a message every `--interval` seconds, and the renewal happens
+# halfway through.  A message counts as stalled if its PUBACK takes more than twice the
+# PUBACK latency.
+#
+# Run from the `python` directory:
+#   python -m benchmarks.renewal_reconnect
+
+
+class FakeHub(object):
+    """
+    In-memory hub which acknowledges messages after `ack_latency` seconds, on one thread.
+    """
+
+    def __init__(self, connect_latency: float, ack_latency: float) -> None:
+        self.connect_latency = connect_latency
+        self.ack_latency = ack_latency
+        self.lock = threading.Lock()
+        self.active_client: "FakeClient" = None
+        self.acks: "queue.Queue[Tuple[float, FakeClient, int]]" = queue.Queue()
+        thread = threading.Thread(target=self._send_acks)
+        thread.daemon = True
+        thread.start()
+
+    def connect(self, client: "FakeClient") -> None:
+        time.sleep(self.connect_latency)
+        with self.lock:
+            (old_client, self.active_client) = (self.active_client, client)
+        if old_client and old_client is not client:
+            old_client.drop()
+
+    def receive(self, client: "FakeClient", mid: int) -> None:
+        self.acks.put((time.perf_counter() + self.ack_latency, client, mid))
+
+    def _send_acks(self) -> None:
+        while True:
+            (due, client, mid) = self.acks.get()
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            client.receive_ack(mid)
+
+
+class FakeClient(object):
+    """
+    Client which behaves like Paho for QoS 1: messages published while disconnected are
+    kept, and sent when the client connects again.
+    """
+
+    def __init__(self, hub: FakeHub) -> None:
+        self.hub = hub
+        self.lock = threading.Lock()
+        self.connected = False
+        self.closed = False
+        self.next_mid = 0
+        self.unacked: Dict[int, bool] = {}
+        self.on_publish: Callable[["FakeClient", int], None] = None
+        self.on_disconnect: Callable[["FakeClient"], None] = None
+
+    def connect(self) -> None:
+        self.hub.connect(self)
+        with self.lock:
+            self.connected = True
+            resend = list(self.unacked.keys())
+        for mid in resend:
+            self.hub.receive(self, mid)
+
+    def reconnect(self) -> None:
+        with self.lock:
+            self.connected = False
+        self.connect()
+
+    def drop(self) -> None:
+        with self.lock:
+            self.connected = False
+        if self.on_disconnect:
+            self.on_disconnect(self)
+
+    def close(self) -> None:
+        with self.lock:
+            self.connected = False
+            self.closed = True
+
+    def publish(self) -> int:
+        with self.lock:
+            self.next_mid += 1
+            mid = self.next_mid
+            self.unacked[mid] = True
+            connected = self.connected
+        if connected:
+            self.hub.receive(self, mid)
+        return mid
+
+    def receive_ack(self, mid: int) -> None:
+        with self.lock:
+            if not self.connected or not self.unacked.pop(mid, None):
+                return
+        self.on_publish(self, mid)
+
+
+def run(
+    name: str,
+    args: Any,
+    publish: Callable[[Callable[[], None]], None],
+    renew: Callable[[], None],
+) -> None:
+    """
+    Publish for `args.duration` seconds, renewing halfway through, and report PUBACK latency.
+    `publish` is called with a function to call when the message is acknowledged.
+    """
+    lock = threading.Lock()
+    ack_latencies: List[float] = []
+    publish_latencies: List[float] = []
+
+    def on_ack(start: float) -> None:
+        with lock:
+            ack_latencies.append(time.perf_counter() - start)
+
+    renewal = threading.Timer(args.duration / 2, renew)
+    renewal.start()
+    count = 0
+    end = time.perf_counter() + args.duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        publish(functools.partial(on_ack, start))
+        publish_latencies.append(time.perf_counter() - start)
+        count += 1
+        time.sleep(args.interval)
+    renewal.join()
+
+    deadline = time.perf_counter() + args.connect_latency * 4 + 1
+    while len(ack_latencies) < count and time.perf_counter() < deadline:
+        time.sleep(0.01)
+
+    ack_latencies.sort()
+    stalled = sum(1 for x in ack_latencies if x > args.ack_latency * 2)
+    print(
+        "  {:<10} acked={}/{} stalled={} publish max={:.3f}ms "
+        "PUBACK p50={:.1f}ms p99={:.1f}ms max={:.1f}ms".format(
+            name,
+            len(ack_latencies),
+            count,
+            stalled,
+            1000 * max(publish_latencies),
+            1000 * statistics.median(ack_latencies),
+            1000 * ack_latencies[int(len(ack_latencies) * 0.99)],
+            1000 * ack_latencies[-1],
+        )
+    )
+
+
+def benchmark_reconnect(args: Any) -> None:
+    hub = FakeHub(args.connect_latency, args.ack_latency)
+    client = FakeClient(hub)
+    callbacks: Dict[int, Callable[[], None]] = {}
+    callbacks_lock = threading.Lock()
+
+    def on_publish(client: FakeClient, mid: int) -> None:
+        with callbacks_lock:
+            callback = callbacks.pop(mid)
+        callback()
+
+    def publish(callback: Callable[[], None]) -> None:
+        # Hold the lock so the PUBACK can't arrive before the callback is saved.
+        with callbacks_lock:
+            callbacks[client.publish()] = callback
+
+    client.on_publish = on_publish
+    client.connect()
+    run("reconnect", args, publish, client.reconnect)
+
+
+def benchmark_switcher(args: Any) -> None:
+    hub = FakeHub(args.connect_latency, args.ack_latency)
+
+    def connect() -> FakeClient:
+        client = FakeClient(hub)
+        client.on_publish = switcher.handle_puback
+        client.on_disconnect = switcher.handle_connection_lost
+        client.connect()
+        return client
+
+    switcher = ConnectionSwitcher(
+        connect_function=connect,
+        publish_function=lambda client, topic, payload: client.publish(),
+        close_function=lambda client: client.close(),
+    )
+    switcher.connect()
+
+    def publish(callback: Callable[[], None]) -> None:
+        switcher.publish("telemetry", b"").add_done_callback(
+            lambda future: callback()
+        )
+
+    run("switcher", args, publish, switcher.renew)
+    print(
+        "  switcher   republished={}".format(
+            switcher.metrics.counter("messages_republished").value
+        )
+    )
+    switcher.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="renewal_reconnect")
+    parser.add_argument(
+        "--connect-latency",
+        type=float,
+        default=0.3,
+        help="Seconds from CONNECT to CONNACK",
+    )
+    parser.add_argument(
+        "--ack-latency",
+        type=float,
+        default=0.02,
+        help="Seconds from PUBLISH to PUBACK",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.002,
+        help="Seconds between published messages",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=2,
+        help="Seconds to publish for",
+    )
+    args = parser.parse_args()
+
+    print(
+        "connect latency {}s, PUBACK latency {}s".format(
+            args.connect_latency, args.ack_latency
+        )
+    )
+    benchmark_reconnect(args)
+    benchmark_switcher(args)
@@ -0,0 +1,140 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import argparse
+import collections
+import heapq
+import random
+from typing import Any, Dict, List, Tuple
+from helpers import constants
+from helpers.base_auth import get_sas_token_renewal_time
+
+# BENCHMARK
+#
+# Simulates SAS token renewal for a fleet of identities, in virtual time, and reports the
+# peak number of renewals (and therefore reconnects) in any one second.
+#
+# All identities start within `--startup-spread` seconds of each other, as they would after a
+# gateway restart.  Renewal times are calculated with `get_sas_token_renewal_time`, the same
+# function that auth objects use.  When `--max-per-second` is set, renewals which would go over
+# the limit are pushed to the next second with capacity, which is how a `RateLimiter` with that
+# `max_per_second` value behaves.
+#
+# Run from the `python` directory:
+#   python -m benchmarks.renewal_storm
+
+
+def simulate(
+    identities: int,
+    hours: float,
+    jitter: float,
+    max_per_second: int,
+    startup_spread: float,
+    seed: int,
+) -> None:
+    rng = random.Random(seed)
+    ttl = constants.DEFAULT_TOKEN_RENEWAL_INTERVAL
+    end_time = hours * 3600
+
+    # heap of (renewal_time, scheduled_renewal_time, expiry_time, identity)
+    heap: List[Tuple[int, int, int, int]] = []
+    for identity in range(identities):
+        expiry_time = int(rng.uniform(0, startup_spread) + ttl)
+        renewal_time = get_sas_token_renewal_time(
+            expiry_time, jitter=jitter, random_value=rng.random()
+        )
+        heap.append((renewal_time, renewal_time, expiry_time, identity))
+    heapq.heapify(heap)
+
+    per_second: Dict[int, int] = collections.defaultdict(int)
+    first_free_second = 0
+    max_delay = 0.0
+    expired = 0
+
+    while heap and heap[0][0] < end_time:
+        (renewal_time, scheduled_time, expiry_time, identity) = heapq.heappop(
+            heap
+        )
+
+        second = max(int(renewal_time), first_free_second)
+        per_second[second] += 1
+        if max_per_second and per_second[second] >= max_per_second:
+            first_free_second = second + 1
+
+        max_delay = max(max_delay, second - scheduled_time)
+        if second >= expiry_time:
+            expired += 1
+
+        expiry_time = second + ttl
+        renewal_time = get_sas_token_renewal_time(
+            expiry_time, jitter=jitter, random_value=rng.random()
+        )
+        heapq.heappush(
+            heap, (renewal_time, renewal_time, expiry_time, identity)
+        )
+
+    total = sum(per_second.values())
+    print(
+        "jitter={:<4} max_per_second={:<6} renewals={:<8} peak/sec={:<6} busy seconds={:<6} max delay={:.0f}s expired={}".format(
+            jitter,
+            str(max_per_second),
+            total,
+            max(per_second.values()) if per_second else 0,
+            len(per_second),
+            max_delay,
+            expired,
+        )
+    )
+
+
+def main(args: Any) -> None:
+    print(
+        "{} identities, {} hours, startup spread {}s".format(
+            args.identities, args.hours, args.startup_spread
+        )
+    )
+    for jitter in (0.0, args.jitter):
+        for max_per_second in (None, args.max_per_second):
+            simulate(
+                args.identities,
+                args.hours,
+                jitter,
+                max_per_second,
+                args.startup_spread,
+                args.seed,
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="renewal_storm")
+    parser.add_argument(
+        "--identities",
+        type=int,
+        default=10000,
+        help="Number of identities in the fleet",
+    )
+    parser.add_argument(
+        "--hours", type=float, default=24, help="Number of hours to simulate"
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=constants.DEFAULT_TOKEN_RENEWAL_JITTER,
+        help="Renewal jitter to compare against no jitter",
+    )
+    parser.add_argument(
+        "--max-per-second",
+        type=int,
+        default=50,
+        help="Rate limit to compare against no rate limit",
+    )
+    parser.add_argument(
+        "--startup-spread",
+        type=float,
+        default=5,
+        help="Number of seconds over which the identities start",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=1, help="Random seed for the simulation"
+    )
+    main(parser.parse_args())
@@ -0,0 +1,206 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import argparse
+import os
+import socket
+import socketserver
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Any, Callable, List, Tuple
+from helpers.tls_context_cache import TlsContextCache, create_tls_context
+
+# BENCHMARK
+#
+# Measures the cost of securing a connection, the way a client does on every reconnect after
+# a SAS token renewal, against a local TLS echo server:
+#
+#   context  - time to create an SSLContext, with and without `TlsContextCache`
+#   connect  - time to connect, handshake, and echo one message, using a new SSLContext for
+#              each connection (full handshake) and using a shared context from
+#              `TlsContextCache` (TLS session resumption)
+#
+# A self-signed certificate for `localhost` is created with the `openssl` command line tool.
+#
+# Run from the `python` directory:
+#   python -m benchmarks.tls_handshake
+
+
+class _EchoHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        while True:
+            data = self.request.recv(1024)
+            if not data:
+                return
+            self.request.sendall(data)
+
+
+class _TlsEchoServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, ssl_context: ssl.SSLContext) -> None:
+        super(_TlsEchoServer, self).__init__(("localhost", 0), _EchoHandler)
+        self.ssl_context = ssl_context
+
+    def get_request(self) -> Tuple[Any, Any]:
+        (sock, address) = self.socket.accept()
+        return (self.ssl_context.wrap_socket(sock, server_side=True), address)
+
+
+def create_certificate(openssl: str, directory: str) -> Tuple[str, str]:
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            openssl,
+            "req",
+            "-x509",
+            "-newkey",
+            "ec",
+            "-pkeyopt",
+            "ec_paramgen_curve:prime256v1",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=localhost",
+            "-addext",
+            "subjectAltName=DNS:localhost",
+            "-keyout",
+            key_path,
+            "-out",
+            cert_path,
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return (cert_path, key_path)
+
+
+def report(name: str, latencies: List[float], extra: str = "") -> None:
+    latencies = sorted(latencies)
+    print(
+        "  {:<40} mean={:>8.3f}ms p50={:>8.3f}ms {}".format(
+            name,
+            1000 * statistics.mean(latencies),
+            1000 * latencies[len(latencies) // 2],
+            extra,
+        )
+    )
+
+
+def time_calls(count: int, function: Callable[[], Any]) -> List[float]:
+    latencies: List[float] = []
+    for _ in range(count):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def connect(port: int, get_context: Callable[[], ssl.SSLContext]) -> List[bool]:
+    """
+    Connect and echo one message.  Returns `[session_reused]`, so results can be collected
+    with `time_calls`.
+    """
+    sock = socket.create_connection(("localhost", port))
+    # Same flow as paho: wrap without a handshake, then handshake explicitly.
+    tls_sock = get_context().wrap_socket(
+        sock, server_hostname="localhost", do_handshake_on_connect=False
+    )
+    tls_sock.do_handshake()
+    tls_sock.sendall(b"ping")
+    tls_sock.recv(1024)
+    reused = tls_sock.session_reused
+    tls_sock.close()
+    return [reused]
+
+
+def main(args: Any) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        (cert_path, key_path) = create_certificate(args.openssl, temp_dir)
+        with open(cert_path, "r") as f:
+            server_verification_cert = f.read()
+
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(cert_path, key_path)
+        server = _TlsEchoServer(server_context)
+        port = server.server_address[1]
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        cache = TlsContextCache()
+
+        print("context ({} iterations)".format(args.iterations))
+        report(
+            "create_tls_context (trust bundle)",
+            time_calls(
+                args.iterations,
+                lambda: create_tls_context(server_verification_cert),
+            ),
+        )
+        report(
+            "create_tls_context (default certs)",
+            time_calls(args.iterations, lambda: create_tls_context(None)),
+        )
+        report(
+            "TlsContextCache.get_context",
+            time_calls(
+                args.iterations,
+                lambda: cache.get_context(server_verification_cert),
+            ),
+        )
+
+        print("connect ({} connections)".format(args.connections))
+        for (name, get_context) in [
+            (
+                "new context per connection",
+                lambda: create_tls_context(server_verification_cert),
+            ),
+            (
+                "TlsContextCache",
+                lambda: cache.get_context(server_verification_cert),
+            ),
+        ]:
+            reused: List[bool] = []
+            latencies = time_calls(
+                args.connections,
+                lambda: reused.extend(connect(port, get_context)),
+            )
+            report(
+                name,
+                latencies,
+                "resumed={}/{}".format(sum(reused), len(reused)),
+            )
+
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="tls_handshake")
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=200,
+        help="Number of connections for each handshake measurement",
+    )
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=50,
+        help="Number of iterations for context creation measurements",
+    )
+    parser.add_argument(
+        "--openssl",
+        default="openssl",
+        help="openssl command used to create the test certificate",
+    )
+    main(parser.parse_args())
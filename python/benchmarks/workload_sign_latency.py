@@ -0,0 +1,92 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import argparse
+import base64
+import json
+import os
+import tempfile
+import time
+from typing import Any, Callable, List
+import requests_unixsocket
+from helpers.edge_workload_api import EdgeWorkloadApi
+from .fake_workload_server import FakeWorkloadServer
+
+# BENCHMARK
+#
+# Measures the latency of `EdgeWorkloadApi.sign` against a local fake workload server.
+#
+# `new connection per call` is how `EdgeWorkloadApi` used to work: every call went through
+# the module-level `requests.post`, which creates a new session, and therefore a new
+# connection, each time.  `pooled session` is the current `EdgeWorkloadApi`, which keeps its
+# connection alive between calls.
+#
+# Run from the `python` directory:
+#   python -m benchmarks.workload_sign_latency
+
+
+def measure(name: str, calls: int, sign: Callable[[str], str]) -> None:
+    latencies: List[float] = []
+    for i in range(calls):
+        start = time.perf_counter()
+        sign("hub.azure-devices.net%2Fdevices%2Fd%2Fmodules%2Fm\n{}".format(i))
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    print(
+        "{:<24} mean={:.3f}ms p50={:.3f}ms p99={:.3f}ms".format(
+            name,
+            1000 * sum(latencies) / calls,
+            1000 * latencies[calls // 2],
+            1000 * latencies[int(calls * 0.99)],
+        )
+    )
+
+
+def main(args: Any) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        server = FakeWorkloadServer(os.path.join(temp_dir, "workload.sock"))
+        server.start()
+
+        api = EdgeWorkloadApi(
+            module_id="m",
+            generation_id="1",
+            workload_uri=server.workload_uri,
+            api_version="2019-01-30",
+        )
+
+        def sign_with_new_connection(data_str: str) -> str:
+            with requests_unixsocket.Session() as session:
+                r = session.post(
+                    url=api.workload_uri + "modules/m/genid/1/sign",
+                    params={"api-version": api.api_version},
+                    data=json.dumps(
+                        {
+                            "keyId": "primary",
+                            "algo": "HMACSHA256",
+                            "data": base64.b64encode(
+                                data_str.encode("utf-8")
+                            ).decode(),
+                        }
+                    ),
+                )
+                r.raise_for_status()
+                return r.json()["digest"]  # type: ignore
+
+        # warm up both paths before measuring
+        sign_with_new_connection("warmup")
+        api.sign("warmup")
+
+        measure("new connection per call", args.calls, sign_with_new_connection)
+        measure("pooled session", args.calls, api.sign)
+
+        api.close()
+        server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="workload_sign_latency")
+    parser.add_argument(
+        "--calls", type=int, default=2000, help="Number of sign calls to make"
+    )
+    main(parser.parse_args())
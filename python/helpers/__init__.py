@@ -2,13 +2,55 @@
 # Licensed under the MIT License. See License.txt in the project root for
 # license information.
 
-from .edge_auth import EdgeAuth
-from .symmetric_key_auth import SymmetricKeyAuth
-from .message import Message
-from . import constants
-from .waitable import WaitableDict
-from .incoming_message_list import IncomingMessageList
-from . import topic_matcher, topic_builder
+import importlib
+from typing import Any, Dict, List, TYPE_CHECKING
+
+# Names exported by this package, and the submodule each one comes from.  Submodules are
+# imported the first time one of their names is used (PEP 562), so an application only pays
+# for the code it uses.  For example, `SymmetricKeyAuth` doesn't need `requests`, which
+# `EdgeAuth` uses to talk to the workload API.
+_exports: Dict[str, str] = {
+    "EdgeAuth": "edge_auth",
+    "SymmetricKeyAuth": "symmetric_key_auth",
+    "Message": "message",
+    "WaitableDict": "waitable",
+    "IncomingMessageList": "incoming_message_list",
+    "HandoffIncomingMessageList": "incoming_message_list",
+    "MessageDispatcher": "message_dispatcher",
+    "MethodRouter": "method_router",
+    "MethodRequest": "method_router",
+    "MetricsRegistry": "metrics",
+    "RenewalScheduler": "renewal_scheduler",
+    "RateLimiter": "rate_limiter",
+    "ConnectionSwitcher": "connection_switcher",
+    "Identity": "identity",
+    "IdentityRegistry": "identity_registry",
+    "PublishWindow": "publish_window",
+}
+
+# Submodules exported by this package.
+_exported_modules = ["constants", "topic_matcher", "topic_builder"]
+
+if TYPE_CHECKING:
+    from .edge_auth import EdgeAuth
+    from .symmetric_key_auth import SymmetricKeyAuth
+    from .message import Message
+    from . import constants
+    from .waitable import WaitableDict
+    from .incoming_message_list import (
+        IncomingMessageList,
+        HandoffIncomingMessageList,
+    )
+    from .message_dispatcher import MessageDispatcher
+    from .method_router import MethodRouter, MethodRequest
+    from .metrics import MetricsRegistry
+    from .renewal_scheduler import RenewalScheduler
+    from .rate_limiter import RateLimiter
+    from .connection_switcher import ConnectionSwitcher
+    from .identity import Identity
+    from .identity_registry import IdentityRegistry
+    from .publish_window import PublishWindow
+    from . import topic_matcher, topic_builder
 
 __all__ = [
     "EdgeAuth",
@@ -19,4 +61,34 @@ __all__ = [
     "topic_builder",
     "WaitableDict",
     "IncomingMessageList",
+    "HandoffIncomingMessageList",
+    "MessageDispatcher",
+    "MethodRouter",
+    "MethodRequest",
+    "MetricsRegistry",
+    "RenewalScheduler",
+    "RateLimiter",
+    "ConnectionSwitcher",
+    "Identity",
+    "IdentityRegistry",
+    "PublishWindow",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _exports:
+        module = importlib.import_module("." + _exports[name], __name__)
+        value = getattr(module, name)
+    elif name in _exported_modules:
+        value = importlib.import_module("." + name, __name__)
+    else:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name)
+        )
+    # Save the value so this function isn't called again for the same name.
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
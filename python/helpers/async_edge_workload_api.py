@@ -0,0 +1,295 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import asyncio
+import base64
+import json
+import logging
+import urllib.parse
+from typing import Dict, List, Tuple
+from . import constants
+
+logger = logging.getLogger(__name__)
+
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class AsyncEdgeWorkloadApi(object):
+    """
+    asyncio version of `EdgeWorkloadApi`.  This object communicates with the Azure IoT Edge
+    workload API over its unix socket using a minimal HTTP/1.1 client, so it can be used from
+    an asyncio-based module without blocking the event loop or using threads.
+
+    Connections are kept alive and reused.  Up to `max_connections` requests can be in flight
+    at the same time, each on its own connection.
+
+    Errors are reported the same way that `EdgeWorkloadApi` reports them: `OSError` if the
+    request fails, or if the response can't be decoded.
+    """
+
+    def __init__(
+        self,
+        module_id: str,
+        generation_id: str,
+        workload_uri: str,
+        api_version: str,
+        connect_timeout: float = constants.DEFAULT_WORKLOAD_API_CONNECT_TIMEOUT,
+        read_timeout: float = constants.DEFAULT_WORKLOAD_API_READ_TIMEOUT,
+        max_connections: int = constants.DEFAULT_WORKLOAD_API_MAX_CONNECTIONS,
+    ) -> None:
+        """
+        :param str module_id: The module id
+        :param str generation_id: The module generation id
+        :param str workload_uri: The workload uri, in `unix:///path/to/socket` or
+            `http://host:port` form
+        :param str api_version: The API version
+        :param float connect_timeout: Number of seconds to wait when connecting to the workload
+            socket
+        :param float read_timeout: Number of seconds to wait for a response
+        :param int max_connections: Number of requests which can be in flight at the same time
+        """
+        self.module_id = urllib.parse.quote(module_id, safe="")
+        self.generation_id = generation_id
+        self.api_version = api_version
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        (self.socket_path, self.host, self.port) = _parse_workload_uri(
+            workload_uri
+        )
+        self.max_connections = max_connections
+        self.idle_connections: List[Connection] = []
+        # Created on first use, so this object can be created outside of a running loop.
+        self.connection_semaphore: asyncio.Semaphore = None
+
+        self.sign_path = "/modules/{}/genid/{}/sign?api-version={}".format(
+            self.module_id,
+            self.generation_id,
+            urllib.parse.quote(api_version, safe=""),
+        )
+        self.trust_bundle_path = "/trust-bundle?api-version={}".format(
+            urllib.parse.quote(api_version, safe="")
+        )
+
+    async def _connect(self) -> Connection:
+        """
+        Internal function to open a new connection to the workload API.
+        """
+        if self.socket_path:
+            connection = asyncio.open_unix_connection(self.socket_path)
+        else:
+            connection = asyncio.open_connection(self.host, self.port)
+        return await asyncio.wait_for(connection, self.connect_timeout)
+
+    async def _send_request(
+        self, connection: Connection, method: str, path: str, body: bytes
+    ) -> Tuple[int, bytes, bool]:
+        """
+        Internal function to send one request on a connection and read the response.
+
+        :returns: tuple of `(status_code, body, keep_alive)`
+
+        :raises: `ValueError` if the response is malformed.  `_request` turns this into
+            `OSError`.
+        """
+        (reader, writer) = connection
+        request = [
+            "{} {} HTTP/1.1".format(method, path),
+            "Host: localhost",
+            "Content-Length: {}".format(len(body)),
+        ]
+        if body:
+            request.append("Content-Type: application/json")
+        writer.write(("\r\n".join(request) + "\r\n\r\n").encode("ascii") + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by workload API")
+        (version, status_code) = status_line.decode("latin-1").split(" ", 2)[:2]
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            (name, value) = line.decode("latin-1").split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks: List[bytes] = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    # skip trailers
+                    while (await reader.readline()) not in (
+                        b"\r\n",
+                        b"\n",
+                        b"",
+                    ):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            response_body = b"".join(chunks)
+            keep_alive = True
+        elif "content-length" in headers:
+            response_body = await reader.readexactly(
+                int(headers["content-length"])
+            )
+            keep_alive = True
+        else:
+            response_body = await reader.read()
+            keep_alive = False
+
+        connection_header = headers.get("connection", "").lower()
+        if connection_header == "close" or (
+            version == "HTTP/1.0" and connection_header != "keep-alive"
+        ):
+            keep_alive = False
+
+        return (int(status_code), response_body, keep_alive)
+
+    async def _request(
+        self, method: str, path: str, body: bytes = b""
+    ) -> Tuple[int, bytes]:
+        """
+        Internal function to make a request, reusing an idle connection if one is available.
+
+        :returns: tuple of `(status_code, body)`
+        """
+        if not self.connection_semaphore:
+            self.connection_semaphore = asyncio.Semaphore(self.max_connections)
+
+        async with self.connection_semaphore:
+            # If an idle connection was closed by the server, we only find out when we use it,
+            # so try one more time on a new connection.
+            while True:
+                reused = bool(self.idle_connections)
+                if reused:
+                    connection = self.idle_connections.pop()
+                else:
+                    connection = await self._connect()
+
+                try:
+                    (
+                        status_code,
+                        response_body,
+                        keep_alive,
+                    ) = await asyncio.wait_for(
+                        self._send_request(connection, method, path, body),
+                        self.read_timeout,
+                    )
+                except (
+                    ConnectionError,
+                    asyncio.IncompleteReadError,
+                ) as e:
+                    connection[1].close()
+                    if reused:
+                        continue
+                    raise ConnectionError(
+                        "Connection to workload API failed"
+                    ) from e
+                except ValueError as e:
+                    # A status line, header, or length which can't be parsed.
+                    connection[1].close()
+                    raise OSError("Malformed response from workload API") from e
+                except BaseException:
+                    connection[1].close()
+                    raise
+
+                if keep_alive:
+                    self.idle_connections.append(connection)
+                else:
+                    connection[1].close()
+                return (status_code, response_body)
+
+    async def get_certificate(self) -> str:
+        """
+        Return the server verification certificate from the trust bundle that can be used to
+        validate the server-side SSL TLS connection that we use to talk to Edge
+
+        :return: The server verification certificate to use for connections to the Azure IoT Edge
+        instance, as a PEM certificate in string form.
+
+        :raises: OSError if unable to retrieve the certificate.
+        """
+        (status_code, body) = await self._request("GET", self.trust_bundle_path)
+        if status_code >= 400:
+            raise OSError(
+                "Unable to get trust bundle from Edge (status {})".format(
+                    status_code
+                )
+            )
+        try:
+            bundle = json.loads(body)
+        except ValueError as e:
+            raise OSError("Unable to decode trust bundle") from e
+        try:
+            cert: str = bundle["certificate"]
+        except KeyError as e:
+            raise OSError("No certificate in trust bundle") from e
+        return cert
+
+    async def sign(self, data_str: str) -> str:
+        """
+        Use the IoTEdge HSM to sign a piece of string data.  Any number of calls can be
+        awaited at the same time.
+
+        :param str data_str: The data string to sign
+
+        :return: The signature, as a base64-encoded value.
+
+        :raises: OSError if unable to sign the data.
+        """
+        sign_request = {
+            "keyId": "primary",
+            "algo": "HMACSHA256",
+            "data": base64.b64encode(data_str.encode("utf-8")).decode(),
+        }
+        (status_code, body) = await self._request(
+            "POST", self.sign_path, json.dumps(sign_request).encode("utf-8")
+        )
+        if status_code >= 400:
+            raise OSError("Unable to sign data (status {})".format(status_code))
+        try:
+            sign_response = json.loads(body)
+        except ValueError as e:
+            raise OSError("Unable to decode signed data") from e
+        try:
+            signed_data_str: str = sign_response["digest"]
+        except KeyError as e:
+            raise OSError("No signed data received") from e
+        return signed_data_str
+
+    async def close(self) -> None:
+        """
+        Close any connections to the workload API which are being kept alive.
+        """
+        (connections, self.idle_connections) = (self.idle_connections, [])
+        for (reader, writer) in connections:
+            writer.close()
+        for (reader, writer) in connections:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+
+def _parse_workload_uri(workload_uri: str) -> Tuple[str, str, int]:
+    """
+    Split a workload uri, as found in `IOTEDGE_WORKLOADURI`, into the pieces needed to
+    connect to it.
+
+    :param str workload_uri: uri in `unix:///path/to/socket` or `http://host:port` form
+
+    :returns: tuple of `(socket_path, host, port)`.  `socket_path` is `None` for http uris.
+        `host` and `port` are `None` for unix uris.
+    """
+    unix_prefix = "unix://"
+    if workload_uri.startswith(unix_prefix):
+        return (workload_uri[len(unix_prefix) :].rstrip("/"), None, None)
+
+    parsed = urllib.parse.urlparse(workload_uri)
+    if parsed.scheme != "http" or not parsed.hostname:
+        raise ValueError("Unsupported workload uri: {}".format(workload_uri))
+    return (None, parsed.hostname, parsed.port or 80)
@@ -6,9 +6,26 @@ import abc
 import threading
 import time
 import logging
-from typing import Callable
+import random
+from typing import Callable, Hashable, Tuple, TYPE_CHECKING
 from . import sas_token, constants
 
+# `format_sas_uri` used to live here.  It is re-exported so existing imports keep working.
+from .identity import Identity, format_sas_uri as format_sas_uri  # noqa: F401
+from .tls_context_cache import (
+    TlsContextCache,
+    default_tls_context_cache,
+    create_tls_context,
+)
+
+if TYPE_CHECKING:
+    # These are only used in annotations here, or are only imported when they're used, so
+    # applications which don't use them don't pay for importing them.
+    import asyncio
+    from .rate_limiter import RateLimiter
+    from .renewal_scheduler import RenewalScheduler
+    from .sas_token_cache import SasTokenCache
+
 logger = logging.getLogger(__name__)
 
 sas_token_renewed_handler = Callable[[], None]
@@ -16,24 +33,30 @@ sas_token_renewed_handler = Callable[[], None]
 # TODO: what about websockets?  Does port belong here?  Transport?  if not here, where?
 
 
-def format_sas_uri(hostname: str, device_id: str, module_id: str) -> str:
+def get_sas_token_renewal_time(
+    expiry_time: int,
+    margin: int = constants.DEFAULT_TOKEN_RENEWAL_MARGIN,
+    jitter: float = constants.DEFAULT_TOKEN_RENEWAL_JITTER,
+    random_value: float = None,
+) -> int:
     """
-    Return the sas uri used to make a sas token for the given device or module.
+    Return the time when a SAS token should be renewed.  This is somewhere between `margin`
+    seconds and `margin * (1 - jitter)` seconds before the token expires.
 
-    :param str hostname: name of the host that is being authorized with.  In the case of
-        a transparent gateway, this is the name of the destination host, and NOT the name
-        of the gateway.
-    :param str device_id: device_id for the device or module which is being authorized.
-    :param str module_id: module_id for the module being authorized.  `None` if a device is being
-        authorized.
+    :param int expiry_time: The Unix epoch time when the token expires.
+    :param int margin: Number of seconds before expiry that renewal can start.
+    :param float jitter: Fraction of `margin` used to randomize the renewal time.  Must be at
+        least 0 and less than 1.
+    :param float random_value: (optional) Value between 0 and 1 used to pick the renewal time
+        inside the jitter window.  If `None`, a random value is used.
 
-    :return: The URI which gets signed to create the SAS token.
+    :returns: The Unix epoch time when the token should be renewed.
     """
-
-    if module_id:
-        return "{}/devices/{}/modules/{}".format(hostname, device_id, module_id)
-    else:
-        return "{}/devices/{}".format(hostname, device_id)
+    if not 0 <= jitter < 1:
+        raise ValueError("jitter must be at least 0 and less than 1")
+    if random_value is None:
+        random_value = random.random()
+    return expiry_time - margin + int(margin * jitter * random_value)
 
 
 class AuthorizationBase(abc.ABC):
@@ -43,13 +66,68 @@ class AuthorizationBase(abc.ABC):
     """
 
     def __init__(self) -> None:
-        self.hostname: str = None
-        self.device_id: str = None
-        self.module_id: str = None
+        # `hostname`, `device_id`, `module_id`, and `api_version` are stored here, along with
+        # the strings built from them.  Setting one of those attributes replaces this object.
+        self.identity: Identity = Identity(None, None)
         self.port: int = 8883
-        self.api_version: str = constants.IOTHUB_API_VERSION
         self.gateway_host_name: str = None
 
+    @property
+    def hostname(self) -> str:
+        return self.identity.hostname
+
+    @hostname.setter
+    def hostname(self, hostname: str) -> None:
+        identity = self.identity
+        self.identity = Identity(
+            hostname,
+            identity.device_id,
+            identity.module_id,
+            identity.api_version,
+        )
+
+    @property
+    def device_id(self) -> str:
+        return self.identity.device_id
+
+    @device_id.setter
+    def device_id(self, device_id: str) -> None:
+        identity = self.identity
+        self.identity = Identity(
+            identity.hostname,
+            device_id,
+            identity.module_id,
+            identity.api_version,
+        )
+
+    @property
+    def module_id(self) -> str:
+        return self.identity.module_id
+
+    @module_id.setter
+    def module_id(self, module_id: str) -> None:
+        identity = self.identity
+        self.identity = Identity(
+            identity.hostname,
+            identity.device_id,
+            module_id,
+            identity.api_version,
+        )
+
+    @property
+    def api_version(self) -> str:
+        return self.identity.api_version
+
+    @api_version.setter
+    def api_version(self, api_version: str) -> None:
+        identity = self.identity
+        self.identity = Identity(
+            identity.hostname,
+            identity.device_id,
+            identity.module_id,
+            api_version,
+        )
+
     @property
     @abc.abstractmethod
     def password(self) -> str:
@@ -61,24 +139,14 @@ class AuthorizationBase(abc.ABC):
         Value to be sent in the MQTT `username` field.
         """
         # TODO: add product_info stuff
-        if self.module_id:
-            return "{}/{}/{}/?api-version={}".format(
-                self.hostname, self.device_id, self.module_id, self.api_version
-            )
-        else:
-            return "{}/{}/?api-version={}".format(
-                self.hostname, self.device_id, self.api_version
-            )
+        return self.identity.username
 
     @property
     def client_id(self) -> str:
         """
         Value to be sent in the MQTT `client_id` field.
         """
-        if self.module_id:
-            return "{}/{}".format(self.device_id, self.module_id)
-        else:
-            return self.device_id
+        return self.identity.client_id
 
 
 class RenewableTokenAuthorizationBase(AuthorizationBase):
@@ -96,6 +164,34 @@ class RenewableTokenAuthorizationBase(AuthorizationBase):
         self.sas_token: sas_token.RenewableSasToken = None
         self.sas_token_renewal_timer: threading.Timer = None
         self.on_sas_token_renewed: sas_token_renewed_handler = None
+        # If set, renewals are scheduled here instead of using a `threading.Timer` for each
+        # object.  Applications with many identities should share one `RenewalScheduler`.
+        self.renewal_scheduler: RenewalScheduler = None
+        # If set, renewals (including the `on_sas_token_renewed` handler, which usually
+        # reconnects) wait for this object.  Share one `RateLimiter` between all identities.
+        self.renewal_rate_limiter: RateLimiter = None
+        self.sas_token_renewal_jitter: float = (
+            constants.DEFAULT_TOKEN_RENEWAL_JITTER
+        )
+        self._jittered_expiry_time: int = None
+        self._jittered_renewal_time: int = None
+        # Number of seconds before renewal that the next SAS token is signed in the background.
+        # `None` or 0 signs the new token inside `renew_sas_token`.  This is off by default,
+        # since it costs a second timer, and is only worth it when signing is slow.
+        self.sas_token_precompute_lead_time: int = None
+        self.sas_token_precompute_timer: threading.Timer = None
+        self.sas_token_renewal_timer_handle: asyncio.TimerHandle = None
+        self.sas_token_renewal_task: asyncio.Task[None] = None
+        # Contexts returned by `create_tls_context` come from here, so connections that use
+        # the same server verification cert share a context and can resume TLS sessions.  If
+        # `None`, a new context is created for each call.
+        self.tls_context_cache: TlsContextCache = default_tls_context_cache
+        # If set, new SAS tokens are saved here, and a saved token is reused when the object
+        # is created, if it has enough time left.
+        self.sas_token_cache: SasTokenCache = None
+        # Identifies the credential which signs SAS tokens, without revealing it.  Saved with
+        # each cached token, so tokens signed with an old credential aren't reused.
+        self.sas_token_credential_fingerprint: str = None
 
     @property
     def password(self) -> str:
@@ -109,7 +205,7 @@ class RenewableTokenAuthorizationBase(AuthorizationBase):
         """
         The URI which is being signed to create the SAS token
         """
-        return format_sas_uri(self.hostname, self.device_id, self.module_id)
+        return self.identity.sas_uri
 
     @property
     def sas_token_expiry_time(self) -> int:
@@ -123,11 +219,16 @@ class RenewableTokenAuthorizationBase(AuthorizationBase):
         """
         The Unix epoch time when the SAS token should be renewed.  This is typically
         some amount of time before the token expires.  That amount of time is known
-        as the "token renewal margin"
+        as the "token renewal margin".  The renewal time is randomized inside the margin
+        based on `sas_token_renewal_jitter`, and it stays the same until the token changes.
         """
-        return (
-            self.sas_token.expiry_time - constants.DEFAULT_TOKEN_RENEWAL_MARGIN
-        )
+        expiry_time = self.sas_token.expiry_time
+        if expiry_time != self._jittered_expiry_time:
+            self._jittered_renewal_time = get_sas_token_renewal_time(
+                expiry_time, jitter=self.sas_token_renewal_jitter
+            )
+            self._jittered_expiry_time = expiry_time
+        return self._jittered_renewal_time
 
     @property
     def sas_token_ready_to_renew(self) -> bool:
@@ -149,9 +250,39 @@ class RenewableTokenAuthorizationBase(AuthorizationBase):
         Cancel the running timer which is set to fire when the current SAS token
         needs to be renewed.
         """
+        if self.renewal_scheduler:
+            self.renewal_scheduler.cancel(self)
+            self.renewal_scheduler.cancel((self, "precompute"))
         if self.sas_token_renewal_timer:
             self.sas_token_renewal_timer.cancel()
             self.sas_token_renewal_timer = None
+        if self.sas_token_precompute_timer:
+            self.sas_token_precompute_timer.cancel()
+            self.sas_token_precompute_timer = None
+        if self.sas_token_renewal_timer_handle:
+            self.sas_token_renewal_timer_handle.cancel()
+            self.sas_token_renewal_timer_handle = None
+        if self.sas_token_renewal_task:
+            self.sas_token_renewal_task.cancel()
+            self.sas_token_renewal_task = None
+
+    def _start_timer(
+        self, key: Hashable, delay: float, callback: Callable[[], None]
+    ) -> threading.Timer:
+        """
+        Internal function to call `callback` after `delay` seconds, using `renewal_scheduler`
+        if it is set.
+
+        :returns: The `threading.Timer` object, or `None` if `renewal_scheduler` is being used.
+        """
+        if self.renewal_scheduler:
+            self.renewal_scheduler.schedule(key, delay, callback)
+            return None
+        else:
+            timer = threading.Timer(delay, callback)
+            timer.daemon = True
+            timer.start()
+            return timer
 
     def set_sas_token_renewal_timer(
         self, on_sas_token_renewed: sas_token_renewed_handler = None
@@ -162,6 +293,11 @@ class RenewableTokenAuthorizationBase(AuthorizationBase):
         is responsible for re-authorizing using the new SAS token and setting up a new
         timer by calling `set_sas_token_renewal_timer` again.
 
+        If `sas_token_precompute_lead_time` is set, a second timer signs the next token that
+        many seconds before the renewal, so the renewal itself doesn't wait for signing.
+        If `renewal_scheduler` is set, both timers are scheduled with that object instead of
+        starting new threads.
+
         :param function on_sas_token_renewed: Handler function which gets called after
             the token is renewed.  This function is responsible for calling
             `set_sas_token_renewal_timer` in order to schedule subsequent renewals.
@@ -173,11 +309,17 @@ class RenewableTokenAuthorizationBase(AuthorizationBase):
 
         # Set a new timer.
         seconds_until_renewal = self.seconds_until_sas_token_renewal
-        self.sas_token_renewal_timer = threading.Timer(
-            seconds_until_renewal, self.renew_sas_token
+        self.sas_token_renewal_timer = self._start_timer(
+            self, seconds_until_renewal, self.renew_sas_token
         )
-        self.sas_token_renewal_timer.daemon = True
-        self.sas_token_renewal_timer.start()
+
+        lead_time = self.sas_token_precompute_lead_time
+        if lead_time and seconds_until_renewal > lead_time:
+            self.sas_token_precompute_timer = self._start_timer(
+                (self, "precompute"),
+                seconds_until_renewal - lead_time,
+                self.precompute_sas_token,
+            )
 
         logger.info(
             "SAS token renewal timer set for {} seconds in the future, at approximately {}".format(
@@ -185,38 +327,154 @@ class RenewableTokenAuthorizationBase(AuthorizationBase):
             )
         )
 
+    def set_sas_token_renewal_timer_async(
+        self, on_sas_token_renewed: sas_token_renewed_handler = None
+    ) -> None:
+        """
+        asyncio version of `set_sas_token_renewal_timer`, for auth objects whose SAS token
+        is signed by a coroutine.  This must be called from inside a running event loop.  The
+        renewal runs as a task on that loop, using `renew_sas_token_async`, so no threads are
+        used.
+
+        :param function on_sas_token_renewed: Handler function which gets called, on the
+            event loop, after the token is renewed.  This function is responsible for calling
+            `set_sas_token_renewal_timer_async` in order to schedule subsequent renewals.
+        """
+        self.cancel_sas_token_renewal_timer()
+        self.on_sas_token_renewed = on_sas_token_renewed
+
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        seconds_until_renewal = self.seconds_until_sas_token_renewal
+
+        def start_renewal() -> None:
+            self.sas_token_renewal_timer_handle = None
+            self.sas_token_renewal_task = loop.create_task(
+                self.renew_sas_token_async()
+            )
+
+        self.sas_token_renewal_timer_handle = loop.call_later(
+            seconds_until_renewal, start_renewal
+        )
+
+        logger.info(
+            "SAS token renewal timer set for {} seconds in the future, at approximately {}".format(
+                seconds_until_renewal, self.sas_token_expiry_time
+            )
+        )
+
+    def precompute_sas_token(self) -> None:
+        """
+        Sign the next SAS token so that it is ready when `renew_sas_token` is called.  The
+        next token expires `ttl` seconds after the current renewal time.  If signing fails,
+        the error is logged and `renew_sas_token` signs the token instead.
+        """
+        try:
+            self.sas_token.precompute(
+                self.sas_token_renewal_time + self.sas_token.ttl
+            )
+        except Exception:
+            logger.warning(
+                "Unable to precompute SAS token.  Token will be signed at renewal time",
+                exc_info=True,
+            )
+
     def renew_sas_token(self) -> None:
         """
         Renew authorization. This  causes a new password string to be generated and the
             `on_sas_token_renewed` function to be called.
+
+        If `renewal_rate_limiter` is set, this function waits for the rate limiter before
+        renewing, and holds it until `on_sas_token_renewed` returns.
+        """
+        rate_limiter = self.renewal_rate_limiter
+        if rate_limiter:
+            rate_limiter.acquire()
+
+        try:
+            logger.info("Renewing sas token and reconnecting")
+
+            # Cancel any timers that might be running.
+            self.cancel_sas_token_renewal_timer()
+
+            # Calculate the new token value
+            self.sas_token.refresh()
+            self._save_sas_token()
+
+            # notify
+            if self.on_sas_token_renewed:
+                self.on_sas_token_renewed()
+        finally:
+            if rate_limiter:
+                rate_limiter.release()
+
+    async def renew_sas_token_async(self) -> None:
+        """
+        asyncio version of `renew_sas_token`, for SAS tokens which were created using
+        `RenewableSasToken.create_async`.  `renewal_rate_limiter` is not used, because
+        it blocks the calling thread.
         """
         logger.info("Renewing sas token and reconnecting")
 
+        import asyncio
+
+        # If this is running as `sas_token_renewal_task`, forget it so it doesn't cancel itself.
+        if self.sas_token_renewal_task is asyncio.current_task():
+            self.sas_token_renewal_task = None
+
         # Cancel any timers that might be running.
         self.cancel_sas_token_renewal_timer()
 
         # Calculate the new token value
-        self.sas_token.refresh()
+        await self.sas_token.refresh_async()
+        self._save_sas_token()
 
         # notify
         if self.on_sas_token_renewed:
             self.on_sas_token_renewed()
 
+    def _load_cached_sas_token(self) -> Tuple[str, int]:
+        """
+        Helper function to get a SAS token from `sas_token_cache`.
+
+        :returns: tuple of `(token, expiry_time)`, or `None` if there is no usable cached token.
+        """
+        if not self.sas_token_cache:
+            return None
+        cached_token = self.sas_token_cache.load(
+            self.sas_uri, self.sas_token_credential_fingerprint
+        )
+        if cached_token:
+            logger.info(
+                "Using cached SAS token, which expires in {} seconds".format(
+                    int(cached_token[1] - time.time())
+                )
+            )
+        return cached_token
+
+    def _save_sas_token(self) -> None:
+        """
+        Helper function to save the current SAS token in `sas_token_cache`.
+        """
+        if self.sas_token_cache:
+            self.sas_token_cache.save(
+                self.sas_uri,
+                str(self.sas_token),
+                self.sas_token.expiry_time,
+                self.sas_token_credential_fingerprint,
+            )
+
     def create_tls_context(self) -> ssl.SSLContext:
         """
-        Create an SSLContext object based on this object.
+        Create an SSLContext object based on this object.  If `tls_context_cache` is set, the
+        returned context is shared with other connections and must not be changed.
 
         :returns: SSLContext object which can be used to secure the TLS connection.
         """
-        ssl_context = ssl.SSLContext(protocol=ssl.PROTOCOL_TLSv1_2)
-        if self.server_verification_cert:
-            ssl_context.load_verify_locations(
-                cadata=self.server_verification_cert
+        if self.tls_context_cache:
+            return self.tls_context_cache.get_context(
+                self.server_verification_cert
             )
         else:
-            ssl_context.load_default_certs()
-
-        ssl_context.verify_mode = ssl.CERT_REQUIRED
-        ssl_context.check_hostname = True
-
-        return ssl_context
+            return create_tls_context(self.server_verification_cert)
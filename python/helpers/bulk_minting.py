@@ -0,0 +1,216 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import collections
+import itertools
+import os
+import time
+import six.moves.urllib as urllib
+from concurrent.futures import Executor, Future
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
+    Union,
+)
+from . import (
+    connection_string as cs,
+    constants,
+    hmac_signing_mechanism,
+    identity,
+    sas_token,
+)
+from .symmetric_key_auth import SymmetricKeyAuth
+
+# Number of identities sent to a worker in one batch.  Larger batches amortize the cost of
+# sending work to a process pool.  Smaller batches return the first results sooner.
+DEFAULT_MINT_BATCH_SIZE = 256
+
+# (uri, base64 key)
+UriAndKey = Tuple[str, str]
+# (uri, token, expiry_time)
+MintedToken = Tuple[str, str, int]
+# (parsed connection string, token, expiry_time)
+MintedConnectionString = Tuple[cs.ConnectionString, str, int]
+
+
+def _mint(uri: str, key: str, expiry_time: int) -> str:
+    """
+    Internal function to sign a single SAS token.  This produces the same token as
+    `RenewableSasToken` does when it has no key name.
+    """
+    url_encoded_uri = urllib.parse.quote(uri, safe="")
+    signature = hmac_signing_mechanism.HmacSigningMechanism(key).sign(
+        url_encoded_uri + "\n" + str(expiry_time)
+    )
+    return sas_token.RenewableSasToken._simple_token_format.format(
+        resource=url_encoded_uri,
+        signature=urllib.parse.quote(signature, safe=""),
+        expiry=str(expiry_time),
+    )
+
+
+def _mint_batch(batch: List[UriAndKey], ttl: int) -> List[MintedToken]:
+    """
+    Internal function to sign a batch of SAS tokens.  This runs inside the executor.
+    """
+    expiry_time = int(time.time() + ttl)
+    return [
+        (uri, _mint(uri, key, expiry_time), expiry_time) for (uri, key) in batch
+    ]
+
+
+def _mint_connection_string_batch(
+    batch: List[Union[str, cs.ConnectionString]], ttl: int
+) -> List[MintedConnectionString]:
+    """
+    Internal function to parse and sign a batch of connection strings.  This runs inside
+    the executor.
+    """
+    expiry_time = int(time.time() + ttl)
+    results: List[MintedConnectionString] = []
+    for connection_string in batch:
+        if isinstance(connection_string, cs.ConnectionString):
+            conn_str = connection_string
+        else:
+            conn_str = cs.ConnectionString(connection_string)
+        uri = identity.format_sas_uri(
+            conn_str[cs.HOST_NAME],
+            conn_str[cs.DEVICE_ID],
+            conn_str.get(cs.MODULE_ID, None),
+        )
+        results.append(
+            (
+                conn_str,
+                _mint(uri, conn_str[cs.SHARED_ACCESS_KEY], expiry_time),
+                expiry_time,
+            )
+        )
+    return results
+
+
+def _run_batches(
+    items: Iterable[Any],
+    batch_function: Callable[[List[Any], int], List[Any]],
+    executor: Executor,
+    batch_size: int,
+    ttl: int,
+) -> Iterator[Any]:
+    """
+    Internal function to split `items` into batches, run `batch_function` on each batch, and
+    yield the results in the same order as `items`.  Only a few batches are in flight at any
+    time, so `items` can be a generator over more identities than fit in memory.
+    """
+    iterator = iter(items)
+
+    if not executor:
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                return
+            yield from batch_function(batch, ttl)
+
+    # Enough batches to keep every core busy while we yield results from the oldest one.
+    max_in_flight = 2 * (os.cpu_count() or 1)
+    in_flight: "Deque[Future[List[Any]]]" = collections.deque()
+    while True:
+        while len(in_flight) < max_in_flight:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                break
+            in_flight.append(executor.submit(batch_function, batch, ttl))
+        if not in_flight:
+            return
+        yield from in_flight.popleft().result()
+
+
+def mint_sas_tokens(
+    identities: Iterable[UriAndKey],
+    executor: Executor = None,
+    batch_size: int = DEFAULT_MINT_BATCH_SIZE,
+    ttl: int = constants.DEFAULT_TOKEN_RENEWAL_INTERVAL,
+) -> Iterator[MintedToken]:
+    """
+    Sign SAS tokens for many identities, in batches, and yield the results as each batch
+    completes.
+
+    Signing a SAS token is a short HMAC-SHA256 operation, and `hashlib` only releases the GIL
+    for large inputs, so a `ProcessPoolExecutor` is needed to sign on more than one core.
+    A `ThreadPoolExecutor` can still be useful to overlap signing with other work.
+
+    :param iterable identities: `(uri, key)` tuples, where `uri` is the SAS uri (see
+        `identity.format_sas_uri`) and `key` is the base64-encoded symmetric key.
+    :param Executor executor: (optional) Executor used to sign batches.  If `None`, tokens are
+        signed on the calling thread.
+    :param int batch_size: Number of identities to sign in each batch.
+    :param int ttl: Number of seconds each token is valid for.
+
+    :returns: iterator of `(uri, token, expiry_time)` tuples, in the same order as `identities`.
+
+    :raises: `ValueError` if a key is invalid.
+    """
+    return _run_batches(identities, _mint_batch, executor, batch_size, ttl)
+
+
+def mint_sas_tokens_from_connection_strings(
+    connection_strings: Iterable[Union[str, cs.ConnectionString]],
+    executor: Executor = None,
+    batch_size: int = DEFAULT_MINT_BATCH_SIZE,
+    ttl: int = constants.DEFAULT_TOKEN_RENEWAL_INTERVAL,
+) -> Iterator[MintedConnectionString]:
+    """
+    Parse many connection strings and sign a SAS token for each of them, in batches.  Both the
+    parsing and the signing happen inside the executor.
+
+    :param iterable connection_strings: Connection strings which contain a `SharedAccessKey`.
+        These can be `str` or `ConnectionString` objects that were already parsed, like the
+        ones returned by `connection_string_loader.load_connection_strings`.
+    :param Executor executor: (optional) Executor used to parse and sign batches.  If `None`,
+        tokens are signed on the calling thread.
+    :param int batch_size: Number of connection strings to handle in each batch.
+    :param int ttl: Number of seconds each token is valid for.
+
+    :returns: iterator of `(conn_str, token, expiry_time)` tuples, in the same order as
+        `connection_strings`.  `conn_str` is the parsed `ConnectionString` object, which
+        `SymmetricKeyAuth.create_from_connection_string` accepts without parsing it again.
+
+    :raises: `ValueError` if a connection string is invalid.
+    """
+    return _run_batches(
+        connection_strings,
+        _mint_connection_string_batch,
+        executor,
+        batch_size,
+        ttl,
+    )
+
+
+def create_symmetric_key_auths(
+    connection_strings: Iterable[Union[str, cs.ConnectionString]],
+    executor: Executor = None,
+    batch_size: int = DEFAULT_MINT_BATCH_SIZE,
+) -> Iterator[SymmetricKeyAuth]:
+    """
+    Create `SymmetricKeyAuth` objects for many connection strings.  The first SAS token for
+    each object is signed using `mint_sas_tokens_from_connection_strings`, so the objects are
+    created without signing anything on the calling thread.
+
+    :param iterable connection_strings: Connection strings which contain a `SharedAccessKey`.
+        These can be `str` or `ConnectionString` objects that were already parsed, like the
+        ones returned by `connection_string_loader.load_connection_strings`.
+    :param Executor executor: (optional) Executor used to sign the tokens.
+    :param int batch_size: Number of connection strings to handle in each batch.
+
+    :returns: iterator of `SymmetricKeyAuth` objects, in the same order as `connection_strings`.
+    """
+    minted_tokens = mint_sas_tokens_from_connection_strings(
+        connection_strings, executor, batch_size
+    )
+    for (conn_str, token, expiry_time) in minted_tokens:
+        yield SymmetricKeyAuth.create_from_connection_string(
+            conn_str, initial_sas_token=(token, expiry_time)
+        )
@@ -19,15 +19,17 @@ DEVICE_ID = "DeviceId"
 MODULE_ID = "ModuleId"
 GATEWAY_HOST_NAME = "GatewayHostName"
 
-_valid_keys = [
-    HOST_NAME,
-    SHARED_ACCESS_KEY_NAME,
-    SHARED_ACCESS_KEY,
-    SHARED_ACCESS_SIGNATURE,
-    DEVICE_ID,
-    MODULE_ID,
-    GATEWAY_HOST_NAME,
-]
+_valid_keys = frozenset(
+    [
+        HOST_NAME,
+        SHARED_ACCESS_KEY_NAME,
+        SHARED_ACCESS_KEY,
+        SHARED_ACCESS_SIGNATURE,
+        DEVICE_ID,
+        MODULE_ID,
+        GATEWAY_HOST_NAME,
+    ]
+)
 
 
 def _parse_connection_string(connection_string: str) -> Dict[str, str]:
@@ -49,7 +51,7 @@ def _parse_connection_string(connection_string: str) -> Dict[str, str]:
     if len(cs_args) != len(d):
         # various errors related to incorrect parsing - duplicate args, bad syntax, etc.
         raise ValueError("Invalid Connection String - Unable to parse")
-    if not all(key in _valid_keys for key in d.keys()):
+    if not _valid_keys.issuperset(d):
         raise ValueError("Invalid Connection String - Invalid Key")
     _validate_keys(d)
     return d
@@ -0,0 +1,167 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import csv
+import hashlib
+import logging
+import os
+from typing import Iterable, Iterator, Set, Tuple
+from . import connection_string as cs
+
+logger = logging.getLogger(__name__)
+
+FORMAT_LINES = "lines"
+FORMAT_CSV = "csv"
+
+# Name of the CSV column which holds the connection strings.
+DEFAULT_CSV_COLUMN = "ConnectionString"
+
+# (line number, connection string)
+NumberedConnectionString = Tuple[int, str]
+
+
+def _get_identity_key(conn_str: cs.ConnectionString) -> bytes:
+    """
+    Internal function to return the key used to find duplicate identities.  This is a hash
+    instead of the fields themselves, so the set of identities which have already been seen
+    uses a small, fixed amount of memory for each identity.
+    """
+    return hashlib.blake2b(
+        "{}\0{}\0{}".format(
+            conn_str.get(cs.HOST_NAME, ""),
+            conn_str.get(cs.DEVICE_ID, ""),
+            conn_str.get(cs.MODULE_ID, ""),
+        ).encode("utf-8"),
+        digest_size=16,
+    ).digest()
+
+
+def _read_lines(path: str) -> Iterator[NumberedConnectionString]:
+    """
+    Internal function to read a file with one connection string on each line.  Blank lines and
+    lines that start with `#` are skipped.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for (line_number, line) in enumerate(f, 1):
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield (line_number, line)
+
+
+def _read_csv(path: str, column: str) -> Iterator[NumberedConnectionString]:
+    """
+    Internal function to read connection strings from one column of a CSV file with a header
+    row.  Rows where the column is empty are skipped.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        try:
+            index = [name.strip() for name in header].index(column)
+        except ValueError:
+            raise ValueError("{} has no column named {}".format(path, column))
+        for row in reader:
+            if len(row) > index and row[index].strip():
+                yield (reader.line_num, row[index].strip())
+
+
+def parse_connection_strings(
+    connection_strings: Iterable[NumberedConnectionString],
+    source: str = "input",
+    skip_invalid: bool = False,
+    dedupe: bool = True,
+) -> Iterator[cs.ConnectionString]:
+    """
+    Parse and validate connection strings, one at a time.
+
+    :param iterable connection_strings: `(line_number, connection_string)` tuples.
+    :param str source: Name of the input, used in error messages.
+    :param bool skip_invalid: If `True`, invalid connection strings are logged and skipped.
+        If `False`, the first invalid connection string raises `ValueError`.
+    :param bool dedupe: If `True`, only the first connection string for each identity (each
+        combination of `HostName`, `DeviceId`, and `ModuleId`) is returned.  Later ones are
+        logged and skipped.
+
+    :returns: iterator of `ConnectionString` objects.
+
+    :raises: `ValueError` if a connection string is invalid and `skip_invalid` is `False`.
+    """
+    seen: Set[bytes] = set()
+    for (line_number, connection_string) in connection_strings:
+        try:
+            conn_str = cs.ConnectionString(connection_string)
+        except ValueError as e:
+            # The connection string has secrets in it, so it isn't included in the message.
+            message = "{} line {}: {}".format(source, line_number, e)
+            if not skip_invalid:
+                raise ValueError(message) from None
+            logger.warning("Skipping connection string.  {}".format(message))
+            continue
+
+        if dedupe:
+            key = _get_identity_key(conn_str)
+            if key in seen:
+                logger.warning(
+                    "{} line {}: Skipping duplicate identity DeviceId={} ModuleId={}".format(
+                        source,
+                        line_number,
+                        conn_str.get(cs.DEVICE_ID),
+                        conn_str.get(cs.MODULE_ID),
+                    )
+                )
+                continue
+            seen.add(key)
+
+        yield conn_str
+
+
+def load_connection_strings(
+    path: str,
+    file_format: str = None,
+    csv_column: str = DEFAULT_CSV_COLUMN,
+    skip_invalid: bool = False,
+    dedupe: bool = True,
+) -> Iterator[cs.ConnectionString]:
+    """
+    Read, parse, and validate the connection strings in a file.  The file is read one line
+    at a time and connection strings are returned as they are parsed, so the file is never
+    held in memory.  With `dedupe=False`, memory use doesn't depend on the size of the file.
+    With `dedupe=True`, a 16-byte hash of each identity is kept to find duplicates, which
+    is about 100 bytes per identity.
+
+    The results can be passed to `bulk_minting.create_symmetric_key_auths` or
+    `SymmetricKeyAuth.create_from_connection_string`, which use them without parsing them
+    again.
+
+    :param str path: Path of the file to read.
+    :param str file_format: (optional) `FORMAT_LINES` for a file with one connection string on
+        each line, or `FORMAT_CSV` for a CSV file with a header row.  If `None`, files which
+        end with `.csv` are read as CSV files and all others are read as lines.  In line files,
+        blank lines and lines which start with `#` are skipped.
+    :param str csv_column: Name of the CSV column which holds the connection strings.
+    :param bool skip_invalid: If `True`, invalid connection strings are logged and skipped.
+        If `False`, the first invalid connection string raises `ValueError`.
+    :param bool dedupe: If `True`, only the first connection string for each identity is
+        returned.
+
+    :returns: iterator of `ConnectionString` objects, in the same order as the file.
+
+    :raises: `ValueError` if the file format is unknown, or if a connection string is invalid
+        and `skip_invalid` is `False`.
+    """
+    if file_format is None:
+        if os.path.splitext(path)[1].lower() == ".csv":
+            file_format = FORMAT_CSV
+        else:
+            file_format = FORMAT_LINES
+
+    if file_format == FORMAT_LINES:
+        lines = _read_lines(path)
+    elif file_format == FORMAT_CSV:
+        lines = _read_csv(path, csv_column)
+    else:
+        raise ValueError("Unknown file format: {}".format(file_format))
+
+    return parse_connection_strings(lines, path, skip_invalid, dedupe)
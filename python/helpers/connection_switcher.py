@@ -0,0 +1,399 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Set
+from . import constants
+from .metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+# Opens a new connection using the current credentials and returns it once it is connected.
+ConnectFunction = Callable[[], Any]
+# Publishes a QoS 1 message on a connection and returns the message id.
+PublishFunction = Callable[[Any, str, bytes], int]
+# Closes a connection and stops it from reconnecting.
+CloseFunction = Callable[[Any], None]
+
+
+class _InFlightMessage(object):
+    """
+    QoS 1 message which has been published but not acknowledged.
+    """
+
+    __slots__ = ["topic", "payload", "future"]
+
+    def __init__(
+        self, topic: str, payload: bytes, future: "Future[None]"
+    ) -> None:
+        self.topic = topic
+        self.payload = payload
+        self.future = future
+
+
+class ConnectionSwitcher(object):
+    """
+    Object which moves traffic to a new connection when a SAS token is renewed, without
+    making publishers wait for the reconnect.
+
+    Reconnecting the existing client with the new token leaves the module offline until the
+    new CONNACK arrives.  Instead, `renew` opens a second connection with the new token while
+    the old connection keeps carrying traffic.  Once the new connection is connected, new
+    messages are published on it, and the old connection is closed after its in-flight
+    messages are acknowledged.  Messages which are still unacknowledged when the old
+    connection closes are published again on the new connection, so they are delivered at
+    least once, the same as any other QoS 1 message.
+
+    This object doesn't know anything about the MQTT library being used.  The application
+    passes in functions to connect, publish, and close, and calls `handle_puback` and
+    `handle_connection_lost` from its library's callbacks.  `connect_function` must also
+    subscribe to any topics the application uses, since subscriptions belong to the
+    connection.
+
+    IoT Hub only allows one connection for each client id, so when the new connection is
+    made, the hub drops the old one.  Messages in flight on the old connection are published
+    again as soon as `handle_connection_lost` is called for it.  `close_function` must stop
+    the old client from reconnecting, or it would take the identity back from the new
+    connection.
+
+    These counters are recorded:
+    `connection_switches` - number of times traffic moved to a new connection
+    `messages_republished` - number of messages published again on a new connection
+    """
+
+    def __init__(
+        self,
+        connect_function: ConnectFunction,
+        publish_function: PublishFunction,
+        close_function: CloseFunction,
+        drain_timeout: float = constants.DEFAULT_CONNECTION_DRAIN_TIMEOUT,
+        metrics: MetricsRegistry = None,
+    ) -> None:
+        """
+        :param callable connect_function: Function which opens a new connection using the
+            current credentials and returns it once it is connected.  The returned object is
+            passed to the other functions.
+        :param callable publish_function: Function which publishes a QoS 1 message on a
+            connection and returns the message id.  If the connection is not connected, it
+            should still return a message id, or raise.
+        :param callable close_function: Function which closes a connection.
+        :param float drain_timeout: Number of seconds to wait for messages in flight on the
+            old connection to be acknowledged before closing it.
+        :param MetricsRegistry metrics: (optional) registry used to record counters.  If `None`,
+            this object creates its own registry.
+        """
+        self.connect_function = connect_function
+        self.publish_function = publish_function
+        self.close_function = close_function
+        self.drain_timeout = drain_timeout
+        self.lock = threading.Condition()
+        self.connection: Any = None
+        # For each open connection, the messages waiting for PUBACK, by message id.
+        self.in_flight: Dict[Any, Dict[int, _InFlightMessage]] = {}
+        # For each connection, the number of calls to `publish_function` in progress.
+        self.publishing: Dict[Any, int] = {}
+        # PUBACKs which arrived before `publish_function` returned the message id.  These are
+        # only kept while a publish is in progress on the connection, so PUBACKs for messages
+        # which weren't published through this object don't pile up.
+        self.early_acks: Dict[Any, Set[int]] = {}
+        # Connections which were dropped and closed, but may still have messages in flight.
+        self.lost_connections: Set[Any] = set()
+        # True while `renew` is opening a new connection.
+        self.switching = False
+        self.metrics = metrics or MetricsRegistry()
+        self.switches = self.metrics.counter("connection_switches")
+        self.republished = self.metrics.counter("messages_republished")
+
+    def connect(self) -> None:
+        """
+        Open the first connection, or open a new one after `renew` failed and left this object
+        disconnected.
+        """
+        connection = self.connect_function()
+        with self.lock:
+            self._add_connection(connection)
+            self.connection = connection
+
+    def _add_connection(self, connection: Any) -> None:
+        self.in_flight[connection] = {}
+        self.early_acks[connection] = set()
+
+    def renew(self) -> None:
+        """
+        Open a new connection with the current credentials and move traffic to it.  Call this
+        from the `on_sas_token_renewed` handler.  This returns after the old connection is
+        closed, which takes up to `drain_timeout` seconds.  Messages can be published from
+        other threads the whole time.
+
+        If `connect_function` raises after the hub already dropped the old connection, this
+        object is left disconnected: messages in flight on the old connection, and any
+        messages published before `connect` is called again, fail with the exception.
+        The exception is raised again from this function.
+        """
+        # The old connection keeps carrying traffic while this connects.
+        with self.lock:
+            self.switching = True
+        try:
+            new_connection = self.connect_function()
+        except Exception as e:
+            self._handle_renew_failure(e)
+            raise
+        finally:
+            with self.lock:
+                self.switching = False
+
+        with self.lock:
+            old_connection = self.connection
+            self._add_connection(new_connection)
+            self.connection = new_connection
+        self.switches.inc()
+        logger.info("Traffic moved to new connection")
+
+        if old_connection is not None:
+            self._drain(old_connection)
+
+    def _handle_renew_failure(self, e: BaseException) -> None:
+        """
+        Internal function called when `renew` can't open a new connection.  If the old
+        connection is still open, it keeps carrying traffic.  If it was already dropped and
+        closed, this object is marked disconnected and its messages are failed.
+        """
+        with self.lock:
+            self.switching = False
+            connection = self.connection
+            if connection is None or connection not in self.lost_connections:
+                return
+            self.connection = None
+            messages = self.in_flight.pop(connection, {})
+            self.early_acks.pop(connection, None)
+            self.lost_connections.discard(connection)
+            self.lock.notify_all()
+
+        logger.error(
+            "Unable to open new connection, and old connection is closed.  Failing {} unacknowledged messages".format(
+                len(messages)
+            )
+        )
+        for message in messages.values():
+            self._fail(message, e)
+
+    def _drain(self, connection: Any) -> None:
+        """
+        Wait for messages in flight on `connection` to be acknowledged, then close it and
+        publish any unacknowledged messages again on the current connection.
+        """
+        deadline = time.monotonic() + self.drain_timeout
+        with self.lock:
+            while (
+                self.in_flight.get(connection, None)
+                and connection not in self.lost_connections
+            ):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.lock.wait(remaining)
+            if connection not in self.in_flight:
+                # `handle_connection_lost` already took care of it.
+                return
+            already_closed = connection in self.lost_connections
+
+        if not already_closed:
+            self._close(connection)
+        self._republish(connection)
+
+    def _close(self, connection: Any) -> None:
+        try:
+            self.close_function(connection)
+        except Exception:
+            logger.warning("Error closing old connection", exc_info=True)
+
+    def _republish(self, connection: Any) -> None:
+        """
+        Forget `connection` and publish its unacknowledged messages on the current connection.
+        """
+        with self.lock:
+            messages = self.in_flight.pop(connection, {})
+            self.early_acks.pop(connection, None)
+            self.lost_connections.discard(connection)
+            self.lock.notify_all()
+        if messages:
+            logger.info(
+                "Publishing {} unacknowledged messages on new connection".format(
+                    len(messages)
+                )
+            )
+        for message in messages.values():
+            self.republished.inc()
+            try:
+                self._publish(message)
+            except Exception as e:
+                # This can run on the MQTT library's network thread, so the error goes to
+                # the message's future instead of escaping, and the other messages are
+                # still published.
+                logger.warning("Error republishing message", exc_info=True)
+                self._fail(message, e)
+
+    def publish(self, topic: str, payload: bytes) -> "Future[None]":
+        """
+        Publish a QoS 1 message on the current connection.
+
+        :param str topic: Topic to publish to
+        :param bytes payload: Message payload
+
+        :returns: `Future` which resolves when the message is acknowledged, on whichever
+            connection it was finally published on.  If there is no connection, because
+            `connect` wasn't called or `renew` failed, the future fails with
+            `ConnectionError`.
+        """
+        message = _InFlightMessage(topic, payload, Future())
+        self._publish(message)
+        return message.future
+
+    def _publish(self, message: _InFlightMessage) -> None:
+        with self.lock:
+            connection = self.connection
+            if connection is not None:
+                self.publishing[connection] = (
+                    self.publishing.get(connection, 0) + 1
+                )
+        if connection is None:
+            self._fail(message, ConnectionError("Not connected"))
+            return
+        # The lock isn't held here because MQTT libraries can call `handle_puback` from their
+        # own locks, and `publish_function` may need those locks.
+        try:
+            mid = self.publish_function(
+                connection, message.topic, message.payload
+            )
+        except Exception:
+            with self.lock:
+                self._finish_publishing(connection)
+            raise
+
+        acked = False
+        with self.lock:
+            in_flight = self.in_flight.get(connection, None)
+            if in_flight is None:
+                # The connection was closed while we were publishing.
+                republish = True
+            elif mid in self.early_acks[connection]:
+                self.early_acks[connection].discard(mid)
+                republish = False
+                acked = True
+            else:
+                republish = False
+                in_flight[mid] = message
+            self._finish_publishing(connection)
+
+        if acked:
+            self._complete(message)
+        if republish:
+            self.republished.inc()
+            self._publish(message)
+
+    def _finish_publishing(self, connection: Any) -> None:
+        """
+        Internal function to record that a call to `publish_function` returned.  Must be
+        called with `lock` held.
+        """
+        self.publishing[connection] -= 1
+        if not self.publishing[connection]:
+            del self.publishing[connection]
+            early_acks = self.early_acks.get(connection, None)
+            if early_acks:
+                early_acks.clear()
+
+    def _complete(self, message: _InFlightMessage) -> None:
+        """
+        Internal function to resolve the future for a message which was acknowledged, unless
+        the publisher already cancelled it.
+        """
+        if message.future.set_running_or_notify_cancel():
+            message.future.set_result(None)
+
+    def _fail(self, message: _InFlightMessage, e: BaseException) -> None:
+        """
+        Internal function to fail the future for a message which can't be published, unless
+        the publisher already cancelled it.
+        """
+        if message.future.set_running_or_notify_cancel():
+            message.future.set_exception(e)
+
+    def handle_puback(self, connection: Any, mid: int) -> None:
+        """
+        Record that a message was acknowledged.  Call this from the MQTT library's callback
+        for PUBACK, such as Paho's `on_publish`.
+
+        :param connection: The connection that the PUBACK arrived on.
+        :param int mid: The message id.
+        """
+        with self.lock:
+            in_flight = self.in_flight.get(connection, None)
+            if in_flight is None:
+                return
+            message = in_flight.pop(mid, None)
+            if not message:
+                if self.publishing.get(connection, 0):
+                    self.early_acks[connection].add(mid)
+                return
+            if not in_flight:
+                self.lock.notify_all()
+        self._complete(message)
+
+    def handle_connection_lost(self, connection: Any) -> None:
+        """
+        Record that a connection was dropped.  Call this from the MQTT library's disconnect
+        callback, such as Paho's `on_disconnect`.
+
+        If `connection` is an old connection, it is closed and its unacknowledged messages are
+        published on the current connection right away.  If it is dropped while `renew` is
+        connecting, which is what IoT Hub does when the new connection uses the same client
+        id, it is closed so it can't reconnect, and its messages are published again once the
+        new connection is ready.  Losing the current connection at any other time is left to
+        the MQTT library's reconnect logic.
+
+        :param connection: The connection that was dropped.
+        """
+        with self.lock:
+            if connection not in self.in_flight:
+                return
+            if connection in self.lost_connections:
+                return
+            is_current = connection is self.connection
+            if is_current and not self.switching:
+                return
+            self.lost_connections.add(connection)
+
+        logger.info("Old connection dropped")
+        self._close(connection)
+        if not is_current:
+            self._republish(connection)
+
+    @property
+    def in_flight_count(self) -> int:
+        """
+        Number of messages waiting for PUBACK, on all connections.
+        """
+        with self.lock:
+            return sum(len(messages) for messages in self.in_flight.values())
+
+    def close(self) -> None:
+        """
+        Close all connections.  Messages which are still in flight are not published again.
+        """
+        with self.lock:
+            connections = [
+                connection
+                for connection in self.in_flight.keys()
+                if connection not in self.lost_connections
+            ]
+            self.in_flight.clear()
+            self.early_acks.clear()
+            self.lost_connections.clear()
+            self.connection = None
+            self.lock.notify_all()
+        for connection in connections:
+            self.close_function(connection)
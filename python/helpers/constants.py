@@ -17,6 +17,61 @@ DEFAULT_TOKEN_RENEWAL_INTERVAL = 3600
 # Number of seconds before a SAS token expires that this code will create a new SAS token.
 DEFAULT_TOKEN_RENEWAL_MARGIN = 300
 
+# Fraction of the renewal margin used to randomize each token's renewal time.  With a value of
+# 0.5, a token is renewed somewhere between `DEFAULT_TOKEN_RENEWAL_MARGIN` and half that many
+# seconds before it expires.  This keeps identities that started together from all renewing and
+# reconnecting in the same second.  0 disables jitter.
+DEFAULT_TOKEN_RENEWAL_JITTER = 0.5
+
+# Number of seconds before a SAS token is renewed that the next SAS token is signed, in the
+# background, by `EdgeAuth`.  This keeps signing (which is an HTTP request for Edge modules)
+# out of the reconnect path.  Other auth classes sign locally and don't precompute by default.
+DEFAULT_TOKEN_PRECOMPUTE_LEAD_TIME = 60
+
+# Number of seconds that an unclaimed twin response is kept in an `IncomingMessageList` before it
+# is discarded.  Twin responses which arrive after the waiter has given up are never claimed.
+DEFAULT_TWIN_RESPONSE_TTL = 300
+
+# Number of seconds that an unclaimed method request is kept in an `IncomingMessageList` before it
+# is discarded.  The service stops waiting for a response long before this.
+DEFAULT_METHOD_REQUEST_TTL = 300
+
+# Number of seconds that an unclaimed item (PUBACK, SUBACK, etc) is kept in a `WaitableDict`
+# before it is discarded.
+DEFAULT_WAITABLE_ITEM_TTL = 300
+
+# Minimum number of seconds between sweeps for expired items in an `IncomingMessageList`
+DEFAULT_EXPIRY_SWEEP_INTERVAL = 10
+
+# Number of seconds to wait when connecting to the Edge workload API socket.
+DEFAULT_WORKLOAD_API_CONNECT_TIMEOUT = 5
+
+# Number of seconds to wait for a response from the Edge workload API.
+DEFAULT_WORKLOAD_API_READ_TIMEOUT = 30
+
+# Number of requests that `AsyncEdgeWorkloadApi` can have in flight at the same time.  Each
+# in-flight request uses its own connection.
+DEFAULT_WORKLOAD_API_MAX_CONNECTIONS = 4
+
+# Number of seconds that a trust bundle cached on disk by `TrustBundleCache` can be used
+# at startup, while a fresh copy is retrieved in the background.
+DEFAULT_TRUST_BUNDLE_CACHE_MAX_AGE = 7 * 24 * 3600
+
+# Number of seconds that a SAS token cached on disk by `SasTokenCache` needs to have left
+# before it expires to be reused when a module restarts.
+DEFAULT_SAS_TOKEN_CACHE_MIN_REMAINING = 2 * DEFAULT_TOKEN_RENEWAL_MARGIN
+
+# Number of seconds that `ConnectionSwitcher` waits for QoS 1 messages in flight on an old
+# connection to be acknowledged before closing it and publishing them again on the new one.
+DEFAULT_CONNECTION_DRAIN_TIMEOUT = 10
+
+# Maximum number of auth objects that `IdentityRegistry` keeps at once.  When there are more,
+# the least recently used ones are evicted.
+DEFAULT_IDENTITY_REGISTRY_MAX_ACTIVE = 5000
+
+# Maximum number of QoS 1 messages that `PublishWindow` lets wait for PUBACK at once.
+DEFAULT_PUBLISH_WINDOW_SIZE = 100
+
 # API version string for IOTHub APIs
 if EDGEHUB_TOPIC_RULES:
     IOTHUB_API_VERSION = "2018-06-30"
@@ -1,23 +1,41 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License. See License.txt in the project root for
 # license information.
+import asyncio
+import logging
 import os
-from . import base_auth, edge_workload_api, sas_token
+import threading
+from . import base_auth, constants, edge_workload_api, sas_token
+from .async_edge_workload_api import AsyncEdgeWorkloadApi
+from .identity import Identity
+from .trust_bundle_cache import TrustBundleCache
+from .sas_token_cache import SasTokenCache
 from typing import Any
 
+logger = logging.getLogger(__name__)
+
 
 class EdgeAuth(base_auth.RenewableTokenAuthorizationBase):
     def __init__(self) -> None:
         super(EdgeAuth, self).__init__()
 
-        self.hostname: str = os.environ["IOTEDGE_IOTHUBHOSTNAME"]
-        self.device_id: str = os.environ["IOTEDGE_DEVICEID"]
-        self.module_id: str = os.environ["IOTEDGE_MODULEID"]
+        self.identity = Identity(
+            os.environ["IOTEDGE_IOTHUBHOSTNAME"],
+            os.environ["IOTEDGE_DEVICEID"],
+            os.environ["IOTEDGE_MODULEID"],
+            os.environ["IOTEDGE_APIVERSION"],
+        )
         self.module_generation_id: str = os.environ[
             "IOTEDGE_MODULEGENERATIONID"
         ]
+        # The workload API signs with a key that changes when the module is recreated, which
+        # also changes the generation id.
+        self.sas_token_credential_fingerprint = self.module_generation_id
         self.workload_uri: str = os.environ["IOTEDGE_WORKLOADURI"]
-        self.api_version: str = os.environ["IOTEDGE_APIVERSION"]
+        # Signing is a workload API call, so sign the next token before it is needed.
+        self.sas_token_precompute_lead_time = (
+            constants.DEFAULT_TOKEN_PRECOMPUTE_LEAD_TIME
+        )
 
         self.workload_api = edge_workload_api.EdgeWorkloadApi(
             module_id=self.module_id,
@@ -25,15 +43,34 @@ class EdgeAuth(base_auth.RenewableTokenAuthorizationBase):
             workload_uri=self.workload_uri,
             api_version=self.api_version,
         )
+        self.async_workload_api: AsyncEdgeWorkloadApi = None
+        self.trust_bundle_cache: TrustBundleCache = None
+        self.trust_bundle_refresh_thread: threading.Thread = None
+        self.trust_bundle_refresh_task: asyncio.Task[None] = None
 
     @classmethod
-    def create_from_environment(cls) -> Any:
+    def create_from_environment(
+        cls,
+        trust_bundle_cache_path: str = None,
+        sas_token_cache_directory: str = None,
+    ) -> Any:
         """
         create a new auth object from the Edge module's environment.
 
+        :param str trust_bundle_cache_path: (optional) Path of a file used to cache the trust
+            bundle.  If a recent copy is cached, it is used right away and a fresh copy is
+            retrieved in the background.  If `None`, the trust bundle is not cached.
+        :param str sas_token_cache_directory: (optional) Directory used to cache SAS tokens.  If
+            a cached token for this module has enough time left, it is used instead of asking
+            the workload API to sign a new one.  If `None`, tokens are not cached.
+
         :returns: MqttEdgeAuth object created by this function.
         """
         obj = EdgeAuth()
+        if trust_bundle_cache_path:
+            obj.trust_bundle_cache = TrustBundleCache(trust_bundle_cache_path)
+        if sas_token_cache_directory:
+            obj.sas_token_cache = SasTokenCache(sas_token_cache_directory)
         obj._initialize()
         return obj
 
@@ -41,10 +78,149 @@ class EdgeAuth(base_auth.RenewableTokenAuthorizationBase):
         """
         Helper function to initialize a newly created auth object.
         """
-        self.server_verification_cert = self.workload_api.get_certificate()
+        if self._load_cached_trust_bundle():
+            self.trust_bundle_refresh_thread = threading.Thread(
+                target=self._refresh_trust_bundle_in_background,
+                name="TrustBundleRefresh",
+            )
+            self.trust_bundle_refresh_thread.daemon = True
+            self.trust_bundle_refresh_thread.start()
+        else:
+            self.refresh_trust_bundle()
 
+        cached_sas_token = self._load_cached_sas_token()
         self.sas_token = sas_token.RenewableSasToken(
-            uri=self.sas_uri, signing_function=self.workload_api.sign
+            uri=self.sas_uri,
+            signing_function=self.workload_api.sign,
+            initial_token=cached_sas_token,
+        )
+        if not cached_sas_token:
+            self._save_sas_token()
+
+    def _load_cached_trust_bundle(self) -> bool:
+        """
+        Helper function to use the cached trust bundle, if there is one.
+
+        :returns: True if a cached trust bundle is being used.
+        """
+        if not self.trust_bundle_cache:
+            return False
+        (certificate, age) = self.trust_bundle_cache.load()
+        if not certificate:
+            return False
+        logger.info("Using cached trust bundle, {:.0f} seconds old".format(age))
+        self.server_verification_cert = certificate
+        return True
+
+    def _set_trust_bundle(self, certificate: str) -> None:
+        """
+        Helper function to store a trust bundle returned by the workload API.
+        """
+        if self.server_verification_cert and (
+            certificate != self.server_verification_cert
+        ):
+            logger.info(
+                "Trust bundle has changed.  New connections use the new trust bundle"
+            )
+        self.server_verification_cert = certificate
+        if self.trust_bundle_cache:
+            self.trust_bundle_cache.save(certificate)
+
+    def refresh_trust_bundle(self) -> None:
+        """
+        Get the trust bundle from the workload API and use it for new TLS contexts created by
+        `create_tls_context`.  If a trust bundle cache is being used, it is updated.
+
+        :raises: OSError if unable to retrieve the trust bundle.
+        """
+        self._set_trust_bundle(self.workload_api.get_certificate())
+
+    def _refresh_trust_bundle_in_background(self) -> None:
+        """
+        Helper function which refreshes the trust bundle on a background thread.  If the
+        refresh fails, the cached trust bundle stays in use.
+        """
+        try:
+            self.refresh_trust_bundle()
+        except Exception:
+            logger.warning(
+                "Unable to refresh trust bundle.  Using cached trust bundle",
+                exc_info=True,
+            )
+
+    @classmethod
+    async def create_from_environment_async(
+        cls,
+        trust_bundle_cache_path: str = None,
+        sas_token_cache_directory: str = None,
+    ) -> Any:
+        """
+        create a new auth object from the Edge module's environment, for use from an asyncio
+        event loop.  The trust bundle and SAS token are retrieved using `AsyncEdgeWorkloadApi`,
+        so the event loop is never blocked.  Use `set_sas_token_renewal_timer_async` and
+        `renew_sas_token_async` with the returned object.
+
+        :param str trust_bundle_cache_path: (optional) Path of a file used to cache the trust
+            bundle.  If a recent copy is cached, it is used right away and a fresh copy is
+            retrieved in a background task.  If `None`, the trust bundle is not cached.
+        :param str sas_token_cache_directory: (optional) Directory used to cache SAS tokens.  If
+            a cached token for this module has enough time left, it is used instead of asking
+            the workload API to sign a new one.  If `None`, tokens are not cached.
+
+        :returns: EdgeAuth object created by this function.
+        """
+        obj = EdgeAuth()
+        if trust_bundle_cache_path:
+            obj.trust_bundle_cache = TrustBundleCache(trust_bundle_cache_path)
+        if sas_token_cache_directory:
+            obj.sas_token_cache = SasTokenCache(sas_token_cache_directory)
+        obj.async_workload_api = AsyncEdgeWorkloadApi(
+            module_id=obj.module_id,
+            generation_id=obj.module_generation_id,
+            workload_uri=obj.workload_uri,
+            api_version=obj.api_version,
         )
+        await obj._initialize_async()
+        return obj
 
-        self.sas_token.refresh()
+    async def _initialize_async(self) -> None:
+        """
+        Helper function to initialize a newly created auth object using `async_workload_api`.
+        """
+        if self._load_cached_trust_bundle():
+            self.trust_bundle_refresh_task = (
+                asyncio.get_running_loop().create_task(
+                    self._refresh_trust_bundle_in_background_async()
+                )
+            )
+        else:
+            await self.refresh_trust_bundle_async()
+
+        cached_sas_token = self._load_cached_sas_token()
+        self.sas_token = await sas_token.RenewableSasToken.create_async(
+            uri=self.sas_uri,
+            async_signing_function=self.async_workload_api.sign,
+            initial_token=cached_sas_token,
+        )
+        if not cached_sas_token:
+            self._save_sas_token()
+
+    async def refresh_trust_bundle_async(self) -> None:
+        """
+        asyncio version of `refresh_trust_bundle`, using `async_workload_api`.
+
+        :raises: OSError if unable to retrieve the trust bundle.
+        """
+        self._set_trust_bundle(await self.async_workload_api.get_certificate())
+
+    async def _refresh_trust_bundle_in_background_async(self) -> None:
+        """
+        asyncio version of `_refresh_trust_bundle_in_background`.
+        """
+        try:
+            await self.refresh_trust_bundle_async()
+        except Exception:
+            logger.warning(
+                "Unable to refresh trust bundle.  Using cached trust bundle",
+                exc_info=True,
+            )
@@ -11,11 +11,51 @@ import urllib
 
 import requests
 import requests_unixsocket
+import urllib3
+from requests_unixsocket.adapters import UnixHTTPConnectionPool
+from typing import Any, Dict
+
+from . import constants
 
-requests_unixsocket.monkeypatch()
 logger = logging.getLogger(__name__)
 
 
+class _UnixHTTPConnectionPool(UnixHTTPConnectionPool):  # type: ignore
+    """
+    `UnixHTTPConnectionPool` which keeps up to `maxsize` connections alive instead of 1.
+    """
+
+    def __init__(self, socket_path: str, timeout: Any, maxsize: int) -> None:
+        urllib3.connectionpool.HTTPConnectionPool.__init__(
+            self, "localhost", timeout=timeout, maxsize=maxsize
+        )
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+
+class _UnixAdapter(requests_unixsocket.UnixAdapter):  # type: ignore
+    """
+    `UnixAdapter` which keeps up to `max_connections` connections to the workload socket
+    alive, so concurrent requests don't open and discard extra connections.
+    """
+
+    def __init__(self, max_connections: int) -> None:
+        super(_UnixAdapter, self).__init__()
+        self.max_connections = max_connections
+
+    def get_connection(
+        self, url: str, proxies: Dict[str, str] = None
+    ) -> _UnixHTTPConnectionPool:
+        with self.pools.lock:
+            pool = self.pools.get(url)
+            if not pool:
+                pool = _UnixHTTPConnectionPool(
+                    url, self.timeout, self.max_connections
+                )
+                self.pools[url] = pool
+        return pool  # type: ignore
+
+
 class EdgeWorkloadApi:
     """
     Constructor for instantiating a iot hsm object.  This is an object that
@@ -27,6 +67,9 @@ class EdgeWorkloadApi:
        to authenticate the SSL connection between the IoE Edge module and IoT Edge
     2. A signing function, which can be used to create the sig field for a
        SharedAccessSignature string which can be used to authenticate with Iot Edge
+
+    All requests go through a single `requests_unixsocket.Session` owned by this object, so
+    connections to the workload socket are pooled and kept alive between calls.
     """
 
     def __init__(
@@ -35,6 +78,9 @@ class EdgeWorkloadApi:
         generation_id: str,
         workload_uri: str,
         api_version: str,
+        connect_timeout: float = constants.DEFAULT_WORKLOAD_API_CONNECT_TIMEOUT,
+        read_timeout: float = constants.DEFAULT_WORKLOAD_API_READ_TIMEOUT,
+        max_connections: int = constants.DEFAULT_WORKLOAD_API_MAX_CONNECTIONS,
     ):
         """
         Constructor for instantiating a Azure IoT Edge HSM object
@@ -43,11 +89,25 @@ class EdgeWorkloadApi:
         :param str api_version: The API version
         :param str generation_id: The module generation id
         :param str workload_uri: The workload uri
+        :param float connect_timeout: Number of seconds to wait when connecting to the workload
+            socket
+        :param float read_timeout: Number of seconds to wait for a response
+        :param int max_connections: Number of connections to the workload socket to keep alive
+            for concurrent requests
         """
         self.module_id = urllib.parse.quote(module_id, safe="")  # type: ignore
         self.api_version = api_version
         self.generation_id = generation_id
         self.workload_uri = _format_socket_uri(workload_uri)
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests_unixsocket.Session()
+        self.session.mount("http+unix://", _UnixAdapter(max_connections))
+
+    def close(self) -> None:
+        """
+        Close any connections to the workload API which are being kept alive.
+        """
+        self.session.close()
 
     def get_certificate(self) -> str:
         """
@@ -59,9 +119,10 @@ class EdgeWorkloadApi:
 
         :raises: IoTEdgeError if unable to retrieve the certificate.
         """
-        r = requests.get(
+        r = self.session.get(
             self.workload_uri + "trust-bundle",
             params={"api-version": self.api_version},
+            timeout=self.timeout,
         )
         # Validate that the request was successful
         try:
@@ -105,10 +166,11 @@ class EdgeWorkloadApi:
             "data": encoded_data_str,
         }
 
-        r = requests.post(  # can we use json field instead of data?
+        r = self.session.post(  # can we use json field instead of data?
             url=path,
             params={"api-version": self.api_version},
             data=json.dumps(sign_request),
+            timeout=self.timeout,
         )
         try:
             r.raise_for_status()
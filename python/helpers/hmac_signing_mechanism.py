@@ -9,7 +9,7 @@
 import hmac
 import hashlib
 import base64
-from typing import Union
+from typing import Iterable, List, Union
 
 
 class HmacSigningMechanism:
@@ -35,6 +35,13 @@ class HmacSigningMechanism:
             # NOTE: TypeError can only be raised in Python 2.7
             raise ValueError("Invalid Symmetric Key")
 
+        # Keyed HMAC state.  Creating an HMAC object pads and hashes the key, so we do that once
+        # here, and `copy()` this object for every signature.  Copies are independent, so `sign`
+        # can be called from multiple threads.
+        self._keyed_hmac = hmac.HMAC(
+            key=self._signing_key, digestmod=hashlib.sha256
+        )
+
     def sign(self, data_str: str) -> str:
         """
         Sign a data string with symmetric key and the HMAC-SHA256 algorithm.
@@ -54,9 +61,9 @@ class HmacSigningMechanism:
 
         # Derive signature via HMAC-SHA256 algorithm
         try:
-            hmac_digest = hmac.HMAC(
-                key=self._signing_key, msg=data, digestmod=hashlib.sha256
-            ).digest()
+            keyed_hmac = self._keyed_hmac.copy()
+            keyed_hmac.update(data)
+            hmac_digest = keyed_hmac.digest()
             signed_data = base64.b64encode(hmac_digest)
         except (TypeError):
             raise ValueError(
@@ -64,3 +71,30 @@ class HmacSigningMechanism:
             )
         # Convert from bytes to string
         return signed_data.decode("utf-8")
+
+    def sign_many(self, data_strs: Iterable[str]) -> List[str]:
+        """
+        Sign many data strings with symmetric key and the HMAC-SHA256 algorithm.
+
+        :param data_strs: Data strings to be signed
+        :type data_strs: iterable of str
+
+        :returns: The signed data, in the same order as `data_strs`
+        :rtype: list of str
+        """
+        copy = self._keyed_hmac.copy
+        b64encode = base64.b64encode
+        signed_data_strs: List[str] = []
+        for data_str in data_strs:
+            try:
+                data = data_str.encode("utf-8")
+            except AttributeError:
+                # If byte string, no need to encode
+                data = data_str  # type: ignore
+
+            keyed_hmac = copy()
+            keyed_hmac.update(data)
+            signed_data_strs.append(
+                b64encode(keyed_hmac.digest()).decode("utf-8")
+            )
+        return signed_data_strs
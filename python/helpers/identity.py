@@ -0,0 +1,154 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+from typing import Any
+from . import constants
+
+
+def format_sas_uri(hostname: str, device_id: str, module_id: str) -> str:
+    """
+    Return the sas uri used to make a sas token for the given device or module.
+
+    :param str hostname: name of the host that is being authorized with.  In the case of
+        a transparent gateway, this is the name of the destination host, and NOT the name
+        of the gateway.
+    :param str device_id: device_id for the device or module which is being authorized.
+    :param str module_id: module_id for the module being authorized.  `None` if a device is being
+        authorized.
+
+    :return: The URI which gets signed to create the SAS token.
+    """
+
+    if module_id:
+        return "{}/devices/{}/modules/{}".format(hostname, device_id, module_id)
+    else:
+        return "{}/devices/{}".format(hostname, device_id)
+
+
+class Identity(object):
+    """
+    Immutable object which holds the fields that identify a device or module, along with the
+    strings built from them: the MQTT `username` and `client_id`, the `sas_uri`, and the topic
+    prefixes.  These are built once, when the object is created, instead of every time they
+    are used.
+
+    Auth objects keep their identity in `identity`, and the functions in `topic_builder`
+    accept an `Identity` in place of `device_id`.
+
+    Identity objects can't be changed.  Use `replace` to make a copy with different fields.
+    They can be compared and used as dictionary keys.
+    """
+
+    __slots__ = [
+        "hostname",
+        "device_id",
+        "module_id",
+        "api_version",
+        "username",
+        "client_id",
+        "sas_uri",
+        "edge_topic_prefix",
+        "iothub_topic_prefix",
+    ]
+
+    # Declared here for type checkers.  Values are set in `__init__`.
+    hostname: str
+    device_id: str
+    module_id: str
+    api_version: str
+    username: str
+    client_id: str
+    sas_uri: str
+    edge_topic_prefix: str
+    iothub_topic_prefix: str
+
+    def __init__(
+        self,
+        hostname: str,
+        device_id: str,
+        module_id: str = None,
+        api_version: str = constants.IOTHUB_API_VERSION,
+    ) -> None:
+        """
+        :param str hostname: Name of the IoT Hub that the device or module belongs to.
+        :param str device_id: device_id for the device or module.
+        :param str module_id: (optional) module_id for the module.  `None` for a device.
+        :param str api_version: (optional) API version sent in the MQTT `username` field.
+        """
+        # Imported here because `topic_builder` imports this module.
+        from . import topic_builder
+
+        if module_id:
+            username = "{}/{}/{}/?api-version={}".format(
+                hostname, device_id, module_id, api_version
+            )
+            client_id = "{}/{}".format(device_id, module_id)
+        else:
+            username = "{}/{}/?api-version={}".format(
+                hostname, device_id, api_version
+            )
+            client_id = device_id
+
+        set_field = super(Identity, self).__setattr__
+        set_field("hostname", hostname)
+        set_field("device_id", device_id)
+        set_field("module_id", module_id)
+        set_field("api_version", api_version)
+        set_field("username", username)
+        set_field("client_id", client_id)
+        set_field("sas_uri", format_sas_uri(hostname, device_id, module_id))
+        set_field(
+            "edge_topic_prefix",
+            topic_builder.build_edge_topic_prefix(device_id, module_id),
+        )
+        set_field(
+            "iothub_topic_prefix",
+            topic_builder.build_iothub_topic_prefix(device_id, module_id),
+        )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("Identity objects are immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("Identity objects are immutable")
+
+    def _fields(self) -> Any:
+        return (self.hostname, self.device_id, self.module_id, self.api_version)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Identity):
+            return NotImplemented
+        return bool(self._fields() == other._fields())
+
+    def __hash__(self) -> int:
+        return hash(self._fields())
+
+    def __repr__(self) -> str:
+        return "Identity(hostname={!r}, device_id={!r}, module_id={!r}, api_version={!r})".format(
+            *self._fields()
+        )
+
+    def __reduce__(self) -> Any:
+        # `__setattr__` stops pickle and copy from restoring the slots, so rebuild the object
+        # from its fields instead.
+        return (Identity, self._fields())
+
+    def replace(
+        self,
+        hostname: str = None,
+        device_id: str = None,
+        module_id: str = None,
+        api_version: str = None,
+    ) -> "Identity":
+        """
+        Return a copy of this object, with some fields changed.  Fields which are `None` are
+        copied from this object.  To remove the `module_id`, use an empty string.
+
+        :returns: A new `Identity` object.
+        """
+        return Identity(
+            self.hostname if hostname is None else hostname,
+            self.device_id if device_id is None else device_id,
+            self.module_id if module_id is None else (module_id or None),
+            self.api_version if api_version is None else api_version,
+        )
@@ -0,0 +1,287 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import collections
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+from . import constants, connection_string as cs
+from .base_auth import RenewableTokenAuthorizationBase
+from .metrics import MetricsRegistry
+from .renewal_scheduler import RenewalScheduler
+from .symmetric_key_auth import SymmetricKeyAuth
+
+logger = logging.getLogger(__name__)
+
+# Creates an auth object for a parsed connection string.
+CreateAuthFunction = Callable[
+    [cs.ConnectionString], RenewableTokenAuthorizationBase
+]
+# Called with `(client_id, auth)` after an auth object is evicted.
+EvictedHandler = Callable[[str, RenewableTokenAuthorizationBase], None]
+
+# (client_id, auth)
+_EvictedAuth = Tuple[str, RenewableTokenAuthorizationBase]
+
+
+def _get_client_id(conn_str: cs.ConnectionString) -> str:
+    module_id = conn_str.get(cs.MODULE_ID)
+    if module_id:
+        return "{}/{}".format(conn_str[cs.DEVICE_ID], module_id)
+    else:
+        return conn_str[cs.DEVICE_ID]
+
+
+class IdentityRegistry(object):
+    """
+    Object which knows the connection strings for many identities, but only keeps auth objects
+    for the ones which are being used.  This is for gateways which know many more leaf
+    identities than are connected at any one time.
+
+    Adding an identity only stores its connection string.  The auth object (and its SAS token)
+    is created the first time `get` is called for that identity.  Once there are more than
+    `max_active` auth objects, the least recently used ones are evicted: their renewal timers
+    are cancelled and `on_evicted` is called, so the application can close the identity's
+    connection.  An evicted identity is still known, and `get` creates a new auth object for
+    it the next time it is used.
+
+    Identities are keyed by client_id (`device_id` or `device_id/module_id`).  All of the
+    methods on this object can be called from any thread.
+
+    These metrics are recorded:
+    `identity_registry_active` - number of auth objects which currently exist
+    `identity_registry_created` - number of auth objects created
+    `identity_registry_evicted` - number of auth objects evicted
+    """
+
+    def __init__(
+        self,
+        max_active: int = constants.DEFAULT_IDENTITY_REGISTRY_MAX_ACTIVE,
+        create_function: CreateAuthFunction = None,
+        renewal_scheduler: RenewalScheduler = None,
+        on_evicted: EvictedHandler = None,
+        metrics: MetricsRegistry = None,
+    ) -> None:
+        """
+        :param int max_active: Maximum number of auth objects to keep.  Must be at least 1.
+        :param callable create_function: (optional) Function which creates an auth object for
+            a `ConnectionString`.  If `None`, `SymmetricKeyAuth.create_from_connection_string`
+            is used.
+        :param RenewalScheduler renewal_scheduler: (optional) If set, this is assigned to the
+            `renewal_scheduler` attribute of each new auth object, so all of them share one
+            timer thread.
+        :param callable on_evicted: (optional) Handler which is called with
+            `(client_id, auth)` after an auth object is evicted and its renewal timers are
+            cancelled.
+        :param MetricsRegistry metrics: (optional) registry used to record metrics.  If `None`,
+            this object creates its own registry.
+        """
+        if max_active < 1:
+            raise ValueError("max_active must be at least 1")
+        self.max_active = max_active
+        self.create_function: CreateAuthFunction = (
+            create_function or SymmetricKeyAuth.create_from_connection_string
+        )
+        self.renewal_scheduler = renewal_scheduler
+        self.on_evicted = on_evicted
+        self.lock = threading.Lock()
+        # Connection string for every known identity, by client_id.
+        self.connection_strings: Dict[str, str] = {}
+        # Auth objects which exist, by client_id, with the least recently used first.
+        self.active: "collections.OrderedDict[str, RenewableTokenAuthorizationBase]" = (
+            collections.OrderedDict()
+        )
+        self.metrics = metrics or MetricsRegistry()
+        self.metrics.gauge(
+            "identity_registry_active", function=lambda: len(self.active)
+        )
+        self.created = self.metrics.counter("identity_registry_created")
+        self.evicted = self.metrics.counter("identity_registry_evicted")
+
+    def __len__(self) -> int:
+        return len(self.connection_strings)
+
+    def __contains__(self, client_id: str) -> bool:
+        return client_id in self.connection_strings
+
+    @property
+    def active_count(self) -> int:
+        """
+        Number of auth objects which currently exist.
+        """
+        return len(self.active)
+
+    def add(self, connection_string: Union[str, cs.ConnectionString]) -> str:
+        """
+        Add an identity.  If the identity is already known, its connection string is replaced
+        and its auth object, if there is one, is evicted, since it was created with the old
+        credentials.
+
+        :param connection_string: Connection string for the identity.  This can be a `str` or
+            a `ConnectionString` object that was already parsed.
+
+        :returns: The client_id of the identity.
+
+        :raises: `ValueError` if the connection string is invalid.
+        """
+        if isinstance(connection_string, cs.ConnectionString):
+            conn_str = connection_string
+        else:
+            conn_str = cs.ConnectionString(connection_string)
+        client_id = _get_client_id(conn_str)
+
+        evicted: List[_EvictedAuth] = []
+        with self.lock:
+            old_connection_string = self.connection_strings.get(client_id)
+            self.connection_strings[client_id] = str(conn_str)
+            if old_connection_string not in (None, str(conn_str)):
+                evicted = self._remove_active(client_id)
+        self._handle_evicted(evicted)
+        return client_id
+
+    def add_many(
+        self,
+        connection_strings: Iterable[Union[str, cs.ConnectionString]],
+    ) -> int:
+        """
+        Add many identities, for example from
+        `connection_string_loader.load_connection_strings`.
+
+        :param iterable connection_strings: Connection strings for the identities.
+
+        :returns: The number of connection strings added.
+
+        :raises: `ValueError` if a connection string is invalid.  Identities before the
+            invalid one are added.
+        """
+        count = 0
+        for connection_string in connection_strings:
+            self.add(connection_string)
+            count += 1
+        return count
+
+    def remove(self, client_id: str) -> bool:
+        """
+        Forget an identity, evicting its auth object if there is one.
+
+        :param str client_id: The client_id of the identity.
+
+        :returns: `True` if the identity was known.
+        """
+        with self.lock:
+            known = self.connection_strings.pop(client_id, None) is not None
+            evicted = self._remove_active(client_id)
+        self._handle_evicted(evicted)
+        return known
+
+    def get(self, client_id: str) -> RenewableTokenAuthorizationBase:
+        """
+        Return the auth object for an identity, creating it if it doesn't exist, and mark it as
+        the most recently used.  Creating an auth object may evict the least recently used one.
+
+        :param str client_id: The client_id of the identity.
+
+        :returns: The auth object.
+
+        :raises: `KeyError` if the identity is not known.
+        """
+        while True:
+            with self.lock:
+                auth = self.active.get(client_id)
+                if auth is not None:
+                    self.active.move_to_end(client_id)
+                    return auth
+                connection_string = self.connection_strings[client_id]
+
+            # Signing the first token can be slow, so other identities can be used while this
+            # one is created.
+            new_auth = self.create_function(
+                cs.ConnectionString(connection_string)
+            )
+            if self.renewal_scheduler:
+                new_auth.renewal_scheduler = self.renewal_scheduler
+
+            with self.lock:
+                if self.connection_strings.get(client_id) != connection_string:
+                    # The identity was removed or replaced while this was creating the auth
+                    # object, so this object has the wrong credentials.  Try again.
+                    continue
+                auth = self.active.get(client_id)
+                if auth is None:
+                    # No other thread created one first.
+                    auth = new_auth
+                    self.active[client_id] = auth
+                    self.created.inc()
+                    evicted = self._remove_least_recently_used()
+                else:
+                    self.active.move_to_end(client_id)
+                    evicted = []
+            self._handle_evicted(evicted)
+            return auth
+
+    def get_if_active(self, client_id: str) -> RenewableTokenAuthorizationBase:
+        """
+        Return the auth object for an identity without creating it, and without marking it
+        as used.
+
+        :param str client_id: The client_id of the identity.
+
+        :returns: The auth object, or `None` if it doesn't exist.
+        """
+        with self.lock:
+            return self.active.get(client_id)
+
+    def evict(self, client_id: str) -> bool:
+        """
+        Evict the auth object for an identity.  The identity is still known.
+
+        :param str client_id: The client_id of the identity.
+
+        :returns: `True` if there was an auth object to evict.
+        """
+        with self.lock:
+            evicted = self._remove_active(client_id)
+        self._handle_evicted(evicted)
+        return bool(evicted)
+
+    def evict_all(self) -> None:
+        """
+        Evict all auth objects.  Call this before shutting down, so no renewal timers are left
+        running.
+        """
+        with self.lock:
+            evicted = list(self.active.items())
+            self.active.clear()
+        self._handle_evicted(evicted)
+
+    def _remove_active(self, client_id: str) -> List[_EvictedAuth]:
+        """
+        Internal function to remove one auth object.  Must be called with `lock` held.
+        """
+        auth = self.active.pop(client_id, None)
+        if auth is None:
+            return []
+        return [(client_id, auth)]
+
+    def _remove_least_recently_used(self) -> List[_EvictedAuth]:
+        """
+        Internal function to remove auth objects until there are no more than `max_active`.
+        Must be called with `lock` held.
+        """
+        evicted: List[_EvictedAuth] = []
+        while len(self.active) > self.max_active:
+            evicted.append(self.active.popitem(last=False))
+        return evicted
+
+    def _handle_evicted(self, evicted: List[_EvictedAuth]) -> None:
+        """
+        Internal function to cancel the renewal timers for auth objects which were removed,
+        and call `on_evicted`.  This is called without holding `lock`, since `on_evicted` may
+        take a while to close a connection.
+        """
+        for (client_id, auth) in evicted:
+            logger.info("Evicting auth object for {}".format(client_id))
+            auth.cancel_sas_token_renewal_timer()
+            self.evicted.inc()
+            if self.on_evicted:
+                self.on_evicted(client_id, auth)
@@ -2,15 +2,39 @@
 # Licensed under the MIT License. See License.txt in the project root for
 # license information.
 import logging
-from typing import List, Callable
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Callable, Tuple
 import threading
 from .mqtt_message import MQTTMessage
-from . import topic_matcher
+from .metrics import MetricsRegistry
+from . import topic_matcher, constants
 
 logger = logging.getLogger(__name__)
 
 message_match_predicate = Callable[[str], bool]
 
+# Default number of seconds that unclaimed messages of each kind are kept.  Kinds which are not
+# in this dict never expire.
+DEFAULT_TTLS = {
+    topic_matcher.KIND_TWIN_RESPONSE: constants.DEFAULT_TWIN_RESPONSE_TTL,
+    topic_matcher.KIND_METHOD_REQUEST: constants.DEFAULT_METHOD_REQUEST_TTL,
+}
+
+
+class _IncomingMessageEntry(object):
+    """
+    Internal object used to keep track of a message along with the information we
+    need to expire it.
+    """
+
+    __slots__ = ["message", "kind", "arrival_time"]
+
+    def __init__(self, message: MQTTMessage, kind: str, arrival_time: float):
+        self.message = message
+        self.kind = kind
+        self.arrival_time = arrival_time
+
 
 class IncomingMessageList(object):
     """
@@ -23,14 +47,77 @@ class IncomingMessageList(object):
     These "wait" operations are done in a thread-safe manner using the `Condition` class
     provided by the `threading` module.
 
+    Messages which are never claimed, like twin responses that arrive after the waiter
+    has timed out, are discarded after a per-kind TTL (time to live).
+
+    `messages` is the list itself, as it always was.  Code which adds or removes messages
+    through it directly, while holding `cv`, still works.  Those messages are classified,
+    and the depths corrected, at the next expiry sweep.
+
+    This object records the following metrics, all labeled with the `name` of this object
+    and the message `kind`:
+    * `incoming_message_depth` gauge: number of messages currently in the list.
+    * `incoming_message_dwell_seconds` histogram: time between a message being added and
+      being popped.  This is the time that a message waited for the application.
+    * `incoming_messages_expired` counter: number of messages discarded because they expired.
+
     Callers using `asyncio` instead of `threading` should consider writing an awaitable version
     of this class using the `asyncio.Condition` class for synchronization.  Submitting a pull
     request with this functionality is encouraged.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        ttls: Dict[str, float] = None,
+        sweep_interval: float = constants.DEFAULT_EXPIRY_SWEEP_INTERVAL,
+        name: str = "incoming_messages",
+        metrics: MetricsRegistry = None,
+    ) -> None:
+        """
+        :param dict ttls: (optional) Number of seconds that unclaimed messages are kept, keyed by
+            message kind (one of the `KIND_` constants in `topic_matcher`).  Messages of kinds
+            which are not in this dict never expire.  If `None`, `DEFAULT_TTLS` is used.
+        :param float sweep_interval: Minimum number of seconds between checks for expired messages.
+        :param str name: Name of this object.  Used to label metrics, so each list which
+            shares a registry needs a different name.
+        :param MetricsRegistry metrics: (optional) registry used to record metrics.  If
+            `None`, this object creates its own registry.
+
+        :raises: `ValueError` if another list with the same `name` already registered its
+            depth gauges in `metrics`.
+        """
         self.messages: List[MQTTMessage] = []
+        # Kind and arrival time for each message in `messages`, keyed by `id(message)`.  Each
+        # entry holds a reference to its message, so the id can't be reused while the entry
+        # exists.
+        self.entries: Dict[int, _IncomingMessageEntry] = {}
         self.cv = threading.Condition()
+        # Copied, so changing the TTLs on one object doesn't change them for every object.
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.sweep_interval = sweep_interval
+        self.next_sweep_time = time.monotonic() + sweep_interval
+        self.name = name
+        self.metrics = metrics or MetricsRegistry()
+
+        # Depths are kept up to date as messages are added and removed.  The gauges read them
+        # when metrics are collected, so there is no extra cost on the message path.
+        self.depths: Dict[str, int] = {
+            kind: 0 for kind in topic_matcher.ALL_KINDS
+        }
+        for kind in topic_matcher.ALL_KINDS:
+            self.metrics.gauge(
+                "incoming_message_depth",
+                {"name": name, "kind": kind},
+                function=lambda kind=kind: self.depths[kind],  # type: ignore
+            )
+
+    def get_depths(self) -> Dict[str, int]:
+        """
+        Return the number of messages currently in the list, keyed by message kind.
+        """
+        with self.cv:
+            self._drain()
+            return dict(self.depths)
 
     def add_item(self, message: MQTTMessage) -> None:
         """
@@ -39,10 +126,112 @@ class IncomingMessageList(object):
 
         :param object message: The incoming message.
         """
+        now = time.monotonic()
         with self.cv:
-            self.messages.append(message)
+            self._append_entry(message, now)
+            self._expire_if_due(now)
             self.cv.notify_all()
 
+    def _append_entry(self, message: MQTTMessage, arrival_time: float) -> None:
+        """
+        Internal function to classify a message and add it to the end of our list.  Must be
+        called while holding `self.cv`.
+        """
+        entry = self._create_entry(message, arrival_time)
+        self.messages.append(message)
+        self.depths[entry.kind] += 1
+
+    def _create_entry(
+        self, message: MQTTMessage, arrival_time: float
+    ) -> _IncomingMessageEntry:
+        """
+        Internal function to classify a message and record its entry.  Messages which can't
+        be classified are kept as `KIND_UNKNOWN`, so a bad topic can't raise inside the
+        transport's callback.  Must be called while holding `self.cv`.
+        """
+        try:
+            (kind, _) = topic_matcher.classify_topic(message.topic)
+        except Exception:
+            logger.warning(
+                "Unable to classify message on {}".format(message.topic),
+                exc_info=True,
+            )
+            kind = topic_matcher.KIND_UNKNOWN
+        entry = _IncomingMessageEntry(message, kind, arrival_time)
+        self.entries[id(message)] = entry
+        return entry
+
+    def _get_entry(self, message: MQTTMessage) -> _IncomingMessageEntry:
+        """
+        Internal function to find the entry for a message in `messages`.  Returns `None` for
+        messages which were added to `messages` directly.  Must be called while holding
+        `self.cv`.
+        """
+        entry = self.entries.get(id(message), None)
+        if entry is not None and entry.message is message:
+            return entry
+        return None
+
+    def _drain(self) -> None:
+        """
+        Internal function which moves messages that have been handed off by the producer into
+        our list.  `add_item` adds messages directly, so there is nothing to do here.
+        Subclasses which add messages without holding `self.cv` override this.  Must be
+        called while holding `self.cv`.
+        """
+        pass
+
+    def _expire_if_due(self, now: float) -> None:
+        """
+        Internal function to remove expired messages, but only if `sweep_interval` seconds
+        have elapsed since the last sweep.  This keeps the cost of expiry low when
+        messages are arriving quickly.  Must be called while holding `self.cv`.
+        """
+        if now >= self.next_sweep_time:
+            self.next_sweep_time = now + self.sweep_interval
+            self._expire(now)
+
+    def _expire(self, now: float) -> None:
+        """
+        Internal function to remove all expired messages.  This also picks up messages which
+        were added to or removed from `messages` directly, and recounts the depths.  Must be
+        called while holding `self.cv`.
+        """
+        kept: List[MQTTMessage] = []
+        entries: Dict[int, _IncomingMessageEntry] = {}
+        depths = dict.fromkeys(self.depths, 0)
+        for message in self.messages:
+            entry = self._get_entry(message) or self._create_entry(message, now)
+            ttl = self.ttls.get(entry.kind, None)
+            if ttl is not None and now - entry.arrival_time > ttl:
+                logger.warning(
+                    "Discarding unclaimed {} message on {}".format(
+                        entry.kind, entry.message.topic
+                    )
+                )
+                self.metrics.counter(
+                    "incoming_messages_expired",
+                    {"name": self.name, "kind": entry.kind},
+                ).inc()
+            else:
+                kept.append(message)
+                entries[id(message)] = entry
+                depths[entry.kind] += 1
+
+        # Changed in place, since callers may hold a reference to the list.
+        if len(kept) != len(self.messages):
+            self.messages[:] = kept
+        self.entries = entries
+        self.depths.update(depths)
+
+    def expire_items(self) -> None:
+        """
+        Remove all expired messages now, without waiting for the next sweep.
+        """
+        with self.cv:
+            self._drain()
+            self._expire(time.monotonic())
+
     def _pop_next(self, predicate: message_match_predicate) -> MQTTMessage:
         """
         Internal function to remove and return the next message in the list
@@ -58,9 +247,20 @@ class IncomingMessageList(object):
         """
 
         with self.cv:
-            for message in self.messages:
+            self._drain()
+            now = time.monotonic()
+            self._expire_if_due(now)
+            for index, message in enumerate(self.messages):
                 if predicate(message.topic):
-                    self.messages.remove(message)
+                    del self.messages[index]
+                    entry = self._get_entry(message)
+                    if entry is not None:
+                        del self.entries[id(message)]
+                        self.depths[entry.kind] -= 1
+                        self.metrics.histogram(
+                            "incoming_message_dwell_seconds",
+                            {"name": self.name, "kind": entry.kind},
+                        ).observe(now - entry.arrival_time)
                     return message
         return None
 
@@ -191,3 +391,99 @@ class IncomingMessageList(object):
             ),
             timeout=timeout,
         )
+
+
+class HandoffIncomingMessageList(IncomingMessageList):
+    """
+    Version of `IncomingMessageList` where the producer never takes a lock.  This is
+    intended for the case where `add_item` is called from the transport's network thread and
+    one or more consumer threads spend time scanning the list for specific messages.
+
+    `add_item` appends the message to a `collections.deque`, which is atomic, and sets a
+    `threading.Event` to wake the consumers.  It never waits for `self.cv`, so it can't
+    be blocked by a consumer which is holding `self.cv` while it scans the list.  The
+    consumers move handed-off messages into the list the next time they look at it.
+    Classification and expiry happen on the consumer side.
+
+    This is a single-producer, single-consumer structure.  Only one thread should call
+    `add_item`, and only one thread should wait in the `pop_next_x` and `wait_for_message`
+    functions at any time.  With more than one waiting consumer, a consumer can miss the
+    wakeup for a message which another consumer moved into the list, and it won't see that
+    message until the next message arrives or its timeout elapses.
+
+    Other than that, the `pop_next_x` and `wait_for_message` functions behave exactly as they
+    do in `IncomingMessageList`.  The `incoming_message_depth` metric does not include messages
+    which have been handed off but not yet moved into the list by a consumer.
+    """
+
+    def __init__(
+        self,
+        ttls: Dict[str, float] = None,
+        sweep_interval: float = constants.DEFAULT_EXPIRY_SWEEP_INTERVAL,
+        name: str = "incoming_messages",
+        metrics: MetricsRegistry = None,
+    ) -> None:
+        super(HandoffIncomingMessageList, self).__init__(
+            ttls=ttls, sweep_interval=sweep_interval, name=name, metrics=metrics
+        )
+        self.handoff: Deque[Tuple[MQTTMessage, float]] = deque()
+        self.message_added = threading.Event()
+
+    def add_item(self, message: MQTTMessage) -> None:
+        """
+        Hand a message off to the consumers.  This function never blocks.
+
+        :param object message: The incoming message.
+        """
+        self.handoff.append((message, time.monotonic()))
+        self.message_added.set()
+
+    def _drain(self) -> None:
+        """
+        Internal function which moves messages from the handoff queue into our list.  Must be
+        called while holding `self.cv`.
+        """
+        while True:
+            try:
+                (message, arrival_time) = self.handoff.popleft()
+            except IndexError:
+                return
+            self._append_entry(message, arrival_time)
+
+    def _wait_for(self, condition: Callable[[], Any], timeout: float) -> Any:
+        """
+        Internal function which waits until `condition` returns a truthy value or until
+        `timeout` seconds elapse.
+
+        :returns: The last value returned by `condition`.
+        """
+        end_time = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # Clear the event before checking.  If the producer adds a message after our check,
+            # the event will be set again and our wait will return immediately.
+            self.message_added.clear()
+            result = condition()
+            if result:
+                return result
+            if end_time is None:
+                self.message_added.wait()
+            else:
+                remaining = end_time - time.monotonic()
+                if remaining <= 0:
+                    return result
+                self.message_added.wait(remaining)
+
+    def _wait_and_pop_next(
+        self, predicate: message_match_predicate, timeout: float
+    ) -> MQTTMessage:
+        return self._wait_for(  # type: ignore
+            lambda: self._pop_next(predicate), timeout
+        )
+
+    def wait_for_message(self, timeout: float) -> bool:
+        def has_message() -> bool:
+            with self.cv:
+                self._drain()
+                return len(self.messages) > 0
+
+        return self._wait_for(has_message, timeout)  # type: ignore
@@ -0,0 +1,305 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Tuple
+from .mqtt_message import MQTTMessage
+from . import topic_matcher
+
+logger = logging.getLogger(__name__)
+
+message_handler = Callable[[MQTTMessage], None]
+
+
+class _HandlerSlot(object):
+    """
+    Internal object used to keep track of a single registered handler, along with the
+    messages which are waiting for that handler to become available.
+    """
+
+    def __init__(self, handler: message_handler, max_concurrency: int) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.handler = handler
+        self.max_concurrency = max_concurrency
+        self.running = 0
+        self.pending: Deque[MQTTMessage] = deque()
+
+
+class MessageDispatcher(object):
+    """
+    Object used to route incoming MQTT messages to handler functions.  Handlers are registered
+    by message kind (c2d, twin response, twin desired property patch, method name, input name),
+    and each incoming message is classified exactly once, using `topic_matcher.classify_topic`.
+
+    Handlers are run on a `ThreadPoolExecutor`, so `dispatch` never runs customer code and it
+    never blocks waiting for a handler to finish.  This makes it safe to call from inside
+    the transport's network thread.  For Paho, `handle_on_message` can be assigned directly
+    to the client's `on_message` attribute.
+
+    Each handler has a concurrency limit.  When a handler is already running that many times,
+    new messages for that handler are queued and run, in order, as earlier calls complete.
+    Different handlers run in parallel, up to the number of workers in the pool.
+
+    Callers using `asyncio` instead of `threading` should consider writing a version
+    of this class which schedules handlers using `loop.create_task`.  Submitting a pull
+    request with this functionality is encouraged.
+    """
+
+    def __init__(
+        self, max_workers: int = None, default_max_concurrency: int = 1
+    ) -> None:
+        """
+        :param int max_workers: (optional) Number of threads used to run handlers.  If `None`,
+            the `ThreadPoolExecutor` default is used.
+        :param int default_max_concurrency: Number of calls that can run at the same time for
+            any handler which is registered without an explicit `max_concurrency` value.
+        """
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="MessageDispatcher"
+        )
+        self.default_max_concurrency = default_max_concurrency
+        self.lock = threading.Lock()
+        self.handlers: Dict[Tuple[str, str], _HandlerSlot] = {}
+        self.default_handler: _HandlerSlot = None
+        # Set by `shutdown`.  Messages dispatched after this are dropped.
+        self.closed = False
+
+    def _register(
+        self,
+        kind: str,
+        name: str,
+        handler: message_handler,
+        max_concurrency: int,
+    ) -> None:
+        """
+        Internal function to add a handler to our registry.
+        """
+        slot = _HandlerSlot(
+            handler, max_concurrency or self.default_max_concurrency
+        )
+        with self.lock:
+            self.handlers[(kind, name)] = slot
+
+    def register_c2d_handler(
+        self, handler: message_handler, max_concurrency: int = None
+    ) -> None:
+        """
+        Register a handler which gets called for every c2d message.
+
+        :param callable handler: Function which accepts an MQTT message object.
+        :param int max_concurrency: (optional) Number of calls to this handler which can run
+            at the same time.
+        """
+        self._register(topic_matcher.KIND_C2D, None, handler, max_concurrency)
+
+    def register_twin_patch_desired_handler(
+        self, handler: message_handler, max_concurrency: int = None
+    ) -> None:
+        """
+        Register a handler which gets called for every twin desired property patch message.
+
+        :param callable handler: Function which accepts an MQTT message object.
+        :param int max_concurrency: (optional) Number of calls to this handler which can run
+            at the same time.
+        """
+        self._register(
+            topic_matcher.KIND_TWIN_PATCH_DESIRED,
+            None,
+            handler,
+            max_concurrency,
+        )
+
+    def register_twin_response_handler(
+        self, handler: message_handler, max_concurrency: int = None
+    ) -> None:
+        """
+        Register a handler which gets called for every twin response message.  This is
+        typically set to the `add_item` method of an `IncomingMessageList` object, so code
+        waiting for twin responses can continue to use
+        `IncomingMessageList.pop_next_twin_response`.
+
+        :param callable handler: Function which accepts an MQTT message object.
+        :param int max_concurrency: (optional) Number of calls to this handler which can run
+            at the same time.
+        """
+        self._register(
+            topic_matcher.KIND_TWIN_RESPONSE, None, handler, max_concurrency
+        )
+
+    def register_method_handler(
+        self,
+        method_name: str,
+        handler: message_handler,
+        max_concurrency: int = None,
+    ) -> None:
+        """
+        Register a handler which gets called for method requests.
+
+        :param str method_name: Name of the method to handle.  If `None`, the handler gets
+            called for any method request which does not have a handler registered for
+            that specific method name.
+        :param callable handler: Function which accepts an MQTT message object.
+        :param int max_concurrency: (optional) Number of calls to this handler which can run
+            at the same time.
+        """
+        self._register(
+            topic_matcher.KIND_METHOD_REQUEST,
+            method_name,
+            handler,
+            max_concurrency,
+        )
+
+    def register_input_handler(
+        self,
+        input_name: str,
+        handler: message_handler,
+        max_concurrency: int = None,
+    ) -> None:
+        """
+        Register a handler which gets called for messages sent to an Edge module input.
+
+        :param str input_name: Name of the input to handle.  If `None`, the handler gets
+            called for any input message which does not have a handler registered for
+            that specific input name.
+        :param callable handler: Function which accepts an MQTT message object.
+        :param int max_concurrency: (optional) Number of calls to this handler which can run
+            at the same time.
+        """
+        self._register(
+            topic_matcher.KIND_INPUT_MESSAGE,
+            input_name,
+            handler,
+            max_concurrency,
+        )
+
+    def register_default_handler(
+        self, handler: message_handler, max_concurrency: int = None
+    ) -> None:
+        """
+        Register a handler which gets called for any message that doesn't match any other
+        handler.
+
+        :param callable handler: Function which accepts an MQTT message object.
+        :param int max_concurrency: (optional) Number of calls to this handler which can run
+            at the same time.
+        """
+        slot = _HandlerSlot(
+            handler, max_concurrency or self.default_max_concurrency
+        )
+        with self.lock:
+            self.default_handler = slot
+
+    def _find_slot(self, kind: str, name: str) -> _HandlerSlot:
+        """
+        Internal function to find the handler for a classified message.
+        """
+        slot = self.handlers.get((kind, name), None)
+        if not slot and name:
+            slot = self.handlers.get((kind, None), None)
+        return slot or self.default_handler
+
+    def dispatch(self, message: MQTTMessage) -> bool:
+        """
+        Route an incoming message to the appropriate handler.  This function returns without
+        waiting for the handler to run.
+
+        :param object message: The incoming message.
+
+        :returns: `True` if the message was queued for a handler.  `False` if no handler
+            was registered for this message, or the dispatcher was shut down, and the message
+            was dropped.
+        """
+        (kind, name) = topic_matcher.classify_topic(message.topic)
+
+        with self.lock:
+            if self.closed:
+                logger.warning(
+                    "Dispatcher is shut down.  Dropping message on {}.".format(
+                        message.topic
+                    )
+                )
+                return False
+            slot = self._find_slot(kind, name)
+            if not slot:
+                logger.warning(
+                    "No handler registered for message on {}.  Dropping.".format(
+                        message.topic
+                    )
+                )
+                return False
+            if slot.running >= slot.max_concurrency:
+                slot.pending.append(message)
+                return True
+            slot.running += 1
+
+        return self._submit(slot, message)
+
+    def _submit(self, slot: _HandlerSlot, message: MQTTMessage) -> bool:
+        """
+        Internal function to run a handler on the worker pool.  The caller must have already
+        counted this call in `slot.running`.  If the pool was shut down, the count is given
+        back and the message is dropped.
+
+        :returns: `True` if the handler was scheduled.
+        """
+        try:
+            self.executor.submit(self._run_handler, slot, message)
+        except RuntimeError:
+            with self.lock:
+                slot.running -= 1
+            logger.warning(
+                "Dispatcher is shut down.  Dropping message on {}.".format(
+                    message.topic
+                )
+            )
+            return False
+        return True
+
+    def handle_on_message(
+        self, client: Any, userdata: Any, message: MQTTMessage
+    ) -> None:
+        """
+        Function which matches the signature of the Paho `on_message` callback.  This can
+        be used as the `on_message` handler for a Paho client object.
+        """
+        self.dispatch(message)
+
+    def _run_handler(self, slot: _HandlerSlot, message: MQTTMessage) -> None:
+        """
+        Internal function to call a handler inside a worker thread and, when it completes,
+        schedule the next message that is waiting for this handler.
+        """
+        try:
+            slot.handler(message)
+        except Exception:
+            logger.error(
+                "Exception in handler for message on {}".format(message.topic),
+                exc_info=True,
+            )
+
+        with self.lock:
+            if slot.pending:
+                next_message = slot.pending.popleft()
+            else:
+                slot.running -= 1
+                return
+
+        self._submit(slot, next_message)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the worker pool.  Messages that are queued but not yet running are dropped.
+
+        :param bool wait: If `True`, wait for running handlers to complete before returning.
+        """
+        with self.lock:
+            self.closed = True
+            for slot in self.handlers.values():
+                slot.pending.clear()
+            if self.default_handler:
+                self.default_handler.pending.clear()
+        self.executor.shutdown(wait=wait)
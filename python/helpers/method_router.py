@@ -0,0 +1,167 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple, Union, List
+from .mqtt_message import MQTTMessage
+from .message import Message
+from .metrics import MetricsRegistry
+from . import topic_parser, topic_builder
+
+logger = logging.getLogger(__name__)
+
+MethodResponsePayload = Union[bytes, str, Dict[str, Any], List[Any]]
+publish_function = Callable[[str, bytes], Any]
+
+
+class MethodRequest(object):
+    """
+    A method request which has been parsed once, when it was received.  Handlers receive
+    this object instead of the raw MQTT message, so they never need to parse the topic again.
+
+    Data Attributes:
+    topic (str): Topic the request was received on
+    payload (bytes or str): Payload of the request
+    method_name (str): Name of the method being called
+    request_id (str): Request ID, used to match the response with this request
+    device_id (str): device_id the request was sent to.  Only set with EdgeHub topic rules.
+    module_id (str): module_id the request was sent to.  Only set with EdgeHub topic rules.
+    received_time (float): `time.monotonic()` value when this request was parsed
+    """
+
+    def __init__(self, message: MQTTMessage) -> None:
+        self.received_time = time.monotonic()
+        self.topic = message.topic
+        self.payload = message.payload
+        (
+            self.method_name,
+            self.request_id,
+            self.device_id,
+            self.module_id,
+        ) = topic_parser.extract_method_request_fields(message.topic)
+
+    def build_response_topic(self, status_code: Union[int, str]) -> str:
+        """
+        Build the topic used to respond to this request.
+
+        :param status_code: The result code for the method response.
+
+        :returns: The topic string used to return method results to the service.
+        """
+        return topic_builder.build_method_response_publish_topic_from_fields(
+            self.request_id, str(status_code), self.device_id, self.module_id
+        )
+
+
+method_handler = Callable[
+    [MethodRequest], Tuple[Union[int, str], MethodResponsePayload]
+]
+
+
+def _method_not_found_handler(
+    request: MethodRequest,
+) -> Tuple[int, MethodResponsePayload]:
+    """
+    Default fallback handler used for methods which don't have a registered handler.
+    """
+    return (
+        404,
+        {"message": "No handler for method {}".format(request.method_name)},
+    )
+
+
+class MethodRouter(object):
+    """
+    Object used to route method requests to handler functions, keyed by method name, and to
+    publish the responses that those handlers return.
+
+    The method name and all other fields needed to respond are extracted from the request
+    topic exactly once, in `MethodRequest`.  Handlers are looked up in a `dict`, so routing
+    cost doesn't depend on the number of registered methods.  The router is not tied to
+    any transport.  Responses are sent using the `publish_function` that the caller provides.
+
+    Handlers accept a `MethodRequest` object and return a tuple of `(status_code, payload)`.
+    The payload can be anything that the `Message` object accepts as a payload.  If a
+    handler raises an exception, a `500` response is sent.
+
+    The time from receiving a request to publishing the response is recorded in a
+    `method_latency_seconds` histogram for each method name.
+
+    The router does not create any threads.  Requests are handled on whatever thread calls
+    `handle_method_request`.  `handle_method_request` can be registered as a method handler
+    with a `MessageDispatcher` object in order to run handlers on a worker pool.
+    """
+
+    def __init__(
+        self,
+        publish_function: publish_function,
+        metrics: MetricsRegistry = None,
+    ) -> None:
+        """
+        :param callable publish_function: Function which accepts a topic string and a payload
+            and publishes the payload on that topic.  For Paho, this can be a function which
+            calls `client.publish(topic, payload, qos=1)`.
+        :param MetricsRegistry metrics: (optional) registry used to record method latency.  If
+            `None`, the router creates its own registry.
+        """
+        self.publish_function = publish_function
+        self.metrics = metrics or MetricsRegistry()
+        self.lock = threading.Lock()
+        self.handlers: Dict[str, method_handler] = {}
+        self.default_handler: method_handler = _method_not_found_handler
+
+    def register_method_handler(
+        self, method_name: str, handler: method_handler
+    ) -> None:
+        """
+        Register a handler for a specific method name.
+
+        :param str method_name: Name of the method
+        :param callable handler: Function which accepts a `MethodRequest` object and returns
+            a tuple of `(status_code, payload)`.
+        """
+        with self.lock:
+            self.handlers[method_name] = handler
+
+    def register_default_handler(self, handler: method_handler) -> None:
+        """
+        Register the handler used for method names which don't have a specific handler.
+        If this is never called, the router responds to unknown methods with a `404` status.
+
+        :param callable handler: Function which accepts a `MethodRequest` object and returns
+            a tuple of `(status_code, payload)`.
+        """
+        self.default_handler = handler
+
+    def handle_method_request(self, message: MQTTMessage) -> None:
+        """
+        Parse a method request message, call the matching handler, and publish the response.
+
+        :param object message: The incoming method request message.
+
+        :raises: `ValueError` if the message is not a method request.
+        """
+        request = MethodRequest(message)
+        handler = self.handlers.get(request.method_name, self.default_handler)
+
+        try:
+            (status_code, payload) = handler(request)
+        except Exception as e:
+            logger.error(
+                "Exception in handler for method {}".format(
+                    request.method_name
+                ),
+                exc_info=True,
+            )
+            (status_code, payload) = (500, {"message": str(e)})
+
+        self.publish_function(
+            request.build_response_topic(status_code),
+            Message(payload).get_binary_payload(),
+        )
+
+        self.metrics.histogram(
+            "method_latency_seconds", {"method_name": request.method_name}
+        ).observe(time.monotonic() - request.received_time)
@@ -0,0 +1,245 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import bisect
+import threading
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+# Default histogram bucket boundaries, in seconds.  These are suitable for measuring
+# latency of operations which take anywhere from a millisecond to a minute.
+DEFAULT_LATENCY_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+Labels = Dict[str, str]
+Sample = Dict[str, Any]
+gauge_function = Callable[[], float]
+
+
+class Counter(object):
+    """
+    Thread-safe value which only goes up.  Used to count events like expired messages.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self._value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        """
+        Increment the counter.
+
+        :param int amount: Amount to add to the counter.
+        """
+        with self.lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        """
+        Current value of the counter.
+        """
+        return self._value
+
+
+class Gauge(object):
+    """
+    Value which can go up and down, like the current depth of a queue.  A gauge can either
+    be set directly, or it can be given a function which gets called to calculate the
+    current value each time the gauge is read.
+    """
+
+    def __init__(self, function: gauge_function = None) -> None:
+        """
+        :param callable function: (optional) Function which returns the current value of this gauge.
+        """
+        self.function = function
+        self._value = 0.0
+
+    def set(self, value: float) -> None:
+        """
+        Set the value of this gauge.
+
+        :param float value: New value for this gauge.
+        """
+        self._value = value
+
+    @property
+    def value(self) -> float:
+        """
+        Current value of the gauge.
+        """
+        if self.function:
+            return self.function()
+        else:
+            return self._value
+
+
+class Histogram(object):
+    """
+    Thread-safe histogram which counts observed values in fixed buckets.  Used to record
+    latencies.  Bucket counts are cumulative when collected, in the same way that
+    Prometheus histograms are.
+    """
+
+    def __init__(
+        self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS
+    ) -> None:
+        """
+        :param list buckets: Upper bounds of the histogram buckets, in increasing order.  An
+            extra bucket for values larger than the last bound is always added.
+        """
+        self.lock = threading.Lock()
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Record a value in the histogram.
+
+        :param float value: The value to record.
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return a consistent copy of the histogram values.
+
+        :returns: dict with `buckets` (a list of `(upper_bound, cumulative_count)` tuples, with
+            `float("inf")` as the last bound), `count`, and `sum`.
+        """
+        with self.lock:
+            counts = list(self.bucket_counts)
+            count = self.count
+            total = self.sum
+
+        cumulative: List[Tuple[float, int]] = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            running += bucket_count
+            cumulative.append((bound, running))
+
+        return {"buckets": cumulative, "count": count, "sum": total}
+
+
+class MetricsRegistry(object):
+    """
+    Collection of named metrics.  Objects which record metrics accept a registry, so
+    an application can share a single registry between all of its helper objects and
+    scrape all of them at once using `collect`.
+
+    This object does not export metrics anywhere.  Applications are expected to call
+    `collect` from whatever exporter they use and translate the results.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.metrics: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Any] = {}
+
+    def _get_or_create(
+        self, name: str, labels: Labels, factory: Callable[[], Any]
+    ) -> Any:
+        """
+        Internal function to return an existing metric, or to create a new one.
+        """
+        key = (name, tuple(sorted((labels or {}).items())))
+        metric = self.metrics.get(key, None)
+        if metric is None:
+            with self.lock:
+                metric = self.metrics.get(key, None)
+                if metric is None:
+                    metric = factory()
+                    self.metrics[key] = metric
+        return metric
+
+    def counter(self, name: str, labels: Labels = None) -> Counter:
+        """
+        Return the counter with the given name and labels, creating it if necessary.
+        """
+        return self._get_or_create(name, labels, Counter)  # type: ignore
+
+    def gauge(
+        self, name: str, labels: Labels = None, function: gauge_function = None
+    ) -> Gauge:
+        """
+        Return the gauge with the given name and labels, creating it if necessary.
+
+        :param callable function: (optional) Function used to calculate the gauge value.  Only
+            used if the gauge is being created.
+
+        :raises: `ValueError` if `function` is set and the gauge already exists with a
+            different function.  Otherwise, the second object's gauge would be silently
+            dropped, and the metric would keep reporting the first object.
+        """
+        gauge: Gauge = self._get_or_create(
+            name, labels, lambda: Gauge(function)
+        )
+        if function is not None and gauge.function is not function:
+            raise ValueError(
+                "Gauge {} with labels {} is already registered".format(
+                    name, labels
+                )
+            )
+        return gauge
+
+    def histogram(
+        self,
+        name: str,
+        labels: Labels = None,
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        """
+        Return the histogram with the given name and labels, creating it if necessary.
+
+        :param list buckets: (optional) Bucket boundaries.  Only used if the histogram is being
+            created.
+        """
+        return self._get_or_create(  # type: ignore
+            name, labels, lambda: Histogram(buckets)
+        )
+
+    def collect(self) -> List[Sample]:
+        """
+        Return the current value of every metric in this registry.  This is the "pull"
+        API used by metrics exporters.
+
+        :returns: list of dicts, each with `name`, `labels`, and `type` keys.  Counters and
+            gauges also have a `value` key.  Histograms also have the keys returned by
+            `Histogram.snapshot`.
+        """
+        with self.lock:
+            metrics = list(self.metrics.items())
+
+        samples: List[Sample] = []
+        for ((name, labels), metric) in metrics:
+            sample: Sample = {"name": name, "labels": dict(labels)}
+            if isinstance(metric, Counter):
+                sample["type"] = "counter"
+                sample["value"] = metric.value
+            elif isinstance(metric, Gauge):
+                sample["type"] = "gauge"
+                sample["value"] = metric.value
+            else:
+                sample["type"] = "histogram"
+                sample.update(metric.snapshot())
+            samples.append(sample)
+        return samples
@@ -0,0 +1,241 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import collections
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, List, Set, Tuple
+from . import constants
+from .metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+# Publishes a QoS 1 message and returns the message id.
+PublishFunction = Callable[[str, bytes], int]
+
+# (topic, payload, future)
+_PendingMessage = Tuple[str, bytes, "Future[None]"]
+
+
+class PublishWindow(object):
+    """
+    Object which publishes QoS 1 messages without waiting for each PUBACK, while keeping no
+    more than `window_size` messages in flight.
+
+    Each message gets a `Future` which resolves when its PUBACK arrives.  Futures are kept in a
+    dict by message id, so acknowledging a message is O(1), no matter how many are in flight.
+    When the window is full, `publish` either waits for room or queues the message and returns
+    right away.  Queued messages are published in order as PUBACKs arrive.
+
+    This object doesn't know anything about the MQTT library being used.  The application
+    passes in a function to publish, and calls `handle_puback` from its library's callback.
+    The PUBACK can arrive before `publish_function` returns the message id, so PUBACKs for
+    unknown message ids are remembered while a publish is in progress.
+
+    With Paho, the window doesn't help beyond Paho's own in-flight limit, which defaults to 20.
+    Call `max_inflight_messages_set` with at least `window_size`.
+
+    These metrics are recorded:
+    `publish_window_in_flight` - number of messages waiting for PUBACK
+    `publish_window_full` - number of messages which had to wait or be queued because the
+        window was full
+    """
+
+    def __init__(
+        self,
+        publish_function: PublishFunction,
+        window_size: int = constants.DEFAULT_PUBLISH_WINDOW_SIZE,
+        metrics: MetricsRegistry = None,
+    ) -> None:
+        """
+        :param callable publish_function: Function which publishes a QoS 1 message and returns
+            the message id.
+        :param int window_size: Maximum number of messages waiting for PUBACK.  Must be at
+            least 1.
+        :param MetricsRegistry metrics: (optional) registry used to record metrics.  If `None`,
+            this object creates its own registry.
+        """
+        if window_size < 1:
+            raise ValueError("window_size must be at least 1")
+        self.publish_function = publish_function
+        self.window_size = window_size
+        self.lock = threading.Condition()
+        # Messages waiting for PUBACK, by message id.
+        self.in_flight: Dict[int, "Future[None]"] = {}
+        # Number of messages being published, which have a place in the window but don't have
+        # a message id yet.
+        self.publishing = 0
+        # PUBACKs which arrived while a publish was in progress, for message ids we didn't have
+        # yet.  Cleared when no publishes are in progress, so PUBACKs for messages which weren't
+        # published through this object don't pile up.
+        self.early_acks: Set[int] = set()
+        # Messages which were queued because the window was full.
+        self.pending: Deque[_PendingMessage] = collections.deque()
+        self.metrics = metrics or MetricsRegistry()
+        self.metrics.gauge(
+            "publish_window_in_flight", function=lambda: len(self.in_flight)
+        )
+        self.window_full = self.metrics.counter("publish_window_full")
+
+    @property
+    def in_flight_count(self) -> int:
+        """
+        Number of messages which are waiting for PUBACK or are being published.
+        """
+        return len(self.in_flight) + self.publishing
+
+    @property
+    def pending_count(self) -> int:
+        """
+        Number of messages queued because the window was full.
+        """
+        return len(self.pending)
+
+    def _has_room(self) -> bool:
+        return len(self.in_flight) + self.publishing < self.window_size
+
+    def publish(
+        self,
+        topic: str,
+        payload: bytes,
+        block: bool = True,
+        timeout: float = None,
+    ) -> "Future[None]":
+        """
+        Publish a QoS 1 message.
+
+        :param str topic: Topic to publish to
+        :param bytes payload: Message payload
+        :param bool block: What to do if the window is full.  If `True`, wait for room.  If
+            `False`, queue the message and return without waiting.  It is published when
+            PUBACKs make room.
+        :param float timeout: (optional) Number of seconds to wait for room when `block` is
+            `True`.  If `None`, wait forever.
+
+        :returns: `Future` which resolves when the message is acknowledged.  If
+            `publish_function` raises, the exception is set on the future.  The future can
+            only be cancelled while the message is queued.  Cancelled messages are dropped
+            from the queue without being published.
+
+        :raises: `TimeoutError` if `timeout` elapses before there is room.
+        """
+        future: "Future[None]" = Future()
+        with self.lock:
+            # Queued messages go first, so messages are published in order.
+            if self.pending or not self._has_room():
+                self.window_full.inc()
+                if not block:
+                    self.pending.append((topic, payload, future))
+                    return future
+                if not self.lock.wait_for(
+                    lambda: not self.pending and self._has_room(), timeout
+                ):
+                    raise TimeoutError("Publish window is full")
+            self.publishing += 1
+        # Nobody has seen this future yet, so this can't fail.  Once it is running, it can't
+        # be cancelled, so the PUBACK can always complete it.
+        future.set_running_or_notify_cancel()
+
+        if self._send(topic, payload, future):
+            self._send_pending()
+        return future
+
+    def _send(self, topic: str, payload: bytes, future: "Future[None]") -> bool:
+        """
+        Internal function to publish a message which already has a place in the window.
+        `future` must already be running, so it can't be cancelled.
+        `lock` isn't held here because MQTT libraries can call `handle_puback` from their own
+        locks, and `publish_function` may need those locks.
+
+        :returns: `True` if the message gave up its place in the window, because it failed or
+            was already acknowledged.
+        """
+        try:
+            mid = self.publish_function(topic, payload)
+        except Exception as e:
+            logger.warning("Error publishing message", exc_info=True)
+            with self.lock:
+                self._finish_publishing()
+            future.set_exception(e)
+            return True
+
+        with self.lock:
+            if mid in self.early_acks:
+                self.early_acks.discard(mid)
+                acked = True
+            else:
+                self.in_flight[mid] = future
+                acked = False
+            self._finish_publishing()
+        if acked:
+            future.set_result(None)
+        return acked
+
+    def _finish_publishing(self) -> None:
+        """
+        Internal function to release the place held by a publish in progress.  Must be
+        called with `lock` held.
+        """
+        self.publishing -= 1
+        if not self.publishing:
+            self.early_acks.clear()
+        self.lock.notify_all()
+
+    def _send_pending(self) -> None:
+        """
+        Internal function to publish queued messages until the queue is empty or the window
+        is full.
+        """
+        while True:
+            to_send: List[_PendingMessage] = []
+            with self.lock:
+                cancelled = False
+                while self.pending and self._has_room():
+                    message = self.pending.popleft()
+                    if message[2].set_running_or_notify_cancel():
+                        to_send.append(message)
+                        self.publishing += 1
+                    else:
+                        cancelled = True
+                if cancelled:
+                    self.lock.notify_all()
+            if not to_send:
+                return
+            for (topic, payload, future) in to_send:
+                self._send(topic, payload, future)
+
+    def handle_puback(self, mid: int) -> None:
+        """
+        Record that a message was acknowledged.  Call this from the MQTT library's callback
+        for PUBACK, such as Paho's `on_publish`.
+
+        :param int mid: The message id.
+        """
+        with self.lock:
+            future = self.in_flight.pop(mid, None)
+            if future is None:
+                if self.publishing:
+                    self.early_acks.add(mid)
+                return
+            self.lock.notify_all()
+        if not future.done():
+            future.set_result(None)
+        if self.pending:
+            self._send_pending()
+
+    def wait_for_all(self, timeout: float = None) -> bool:
+        """
+        Wait for all messages, including queued ones, to be acknowledged.
+
+        :param float timeout: (optional) Number of seconds to wait.  If `None`, wait forever.
+
+        :returns: `True` if all messages were acknowledged, or `False` if `timeout` elapsed.
+        """
+        with self.lock:
+            return self.lock.wait_for(
+                lambda: not self.in_flight
+                and not self.publishing
+                and not self.pending,
+                timeout,
+            )
@@ -0,0 +1,92 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import threading
+import time
+from typing import Any
+
+
+class RateLimiter(object):
+    """
+    Object used to limit how often, and how many at the same time, an operation can run
+    across many objects.  This is used to keep a large number of identities from renewing
+    their SAS tokens and reconnecting all at once.
+
+    The rate limit is a token bucket: up to `burst` operations can start at once, after which
+    operations start at `max_per_second`.  The concurrency limit is a semaphore which is held
+    until the operation completes.  Either limit can be `None` to disable it.
+
+    This object can be used as a context manager:
+
+        with rate_limiter:
+            do_the_operation()
+    """
+
+    def __init__(
+        self,
+        max_per_second: float = None,
+        max_concurrent: int = None,
+        burst: int = None,
+    ) -> None:
+        """
+        :param float max_per_second: (optional) Number of operations which can start each second.
+        :param int max_concurrent: (optional) Number of operations which can run at the same time.
+        :param int burst: (optional) Number of operations which can start at once before
+            `max_per_second` applies.  Defaults to `max_per_second`, or 1 if that is less than 1.
+        """
+        if max_per_second is not None and max_per_second <= 0:
+            raise ValueError("max_per_second must be greater than 0")
+        if max_concurrent is not None and max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+
+        self.max_per_second = max_per_second
+        self.burst = burst or max(1, int(max_per_second or 1))
+        self.tokens = float(self.burst)
+        self.last_refill_time = time.monotonic()
+        self.lock = threading.Lock()
+        self.semaphore: threading.BoundedSemaphore = None
+        if max_concurrent:
+            self.semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    def _take_token(self) -> None:
+        """
+        Internal function to wait until the token bucket has a token, and then take it.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst,
+                    self.tokens
+                    + (now - self.last_refill_time) * self.max_per_second,
+                )
+                self.last_refill_time = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.max_per_second
+            time.sleep(delay)
+
+    def acquire(self) -> None:
+        """
+        Wait until the operation is allowed to start.  Every call to `acquire` must be
+        matched with a call to `release` when the operation completes.
+        """
+        if self.max_per_second:
+            self._take_token()
+        if self.semaphore:
+            self.semaphore.acquire()
+
+    def release(self) -> None:
+        """
+        Indicate that an operation started with `acquire` has completed.
+        """
+        if self.semaphore:
+            self.semaphore.release()
+
+    def __enter__(self) -> "RateLimiter":
+        self.acquire()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.release()
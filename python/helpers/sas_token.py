@@ -7,10 +7,11 @@
 
 import time
 import six.moves.urllib as urllib
-from typing import Dict, Callable
+from typing import Any, Awaitable, Dict, Callable, Tuple
 from . import constants
 
 SigningFunction = Callable[[str], str]
+AsyncSigningFunction = Callable[[str], Awaitable[str]]
 
 
 class RenewableSasToken(object):
@@ -19,6 +20,13 @@ class RenewableSasToken(object):
     This token is 'renewable', which means that it can be updated when necessary to
     prevent expiry, by using the .refresh() method.
 
+    The next token can be signed ahead of time, on a background thread, by using the
+    .precompute() method.  When a precomputed token is available, .refresh() swaps it in
+    without calling the signing function.
+
+    Tokens which are signed by a coroutine, such as `AsyncEdgeWorkloadApi.sign`, are created
+    with .create_async() and refreshed with .refresh_async().
+
     Data Attributes:
     expiry_time (int): Time that token will expire (in UTC, since epoch)
     ttl (int): Time to live for the token, in seconds
@@ -35,17 +43,22 @@ class RenewableSasToken(object):
         signing_function: SigningFunction,
         key_name: str = None,
         ttl: int = constants.DEFAULT_TOKEN_RENEWAL_INTERVAL,
+        initial_token: Tuple[str, int] = None,
     ):
         """
         :param str uri: URI of the resouce to be accessed
         :param function signing_function: The signing function to use in the SasToken
         :param str key_name: Symmetric Key Name (optional)
         :param int ttl: Time to live for the token, in seconds (default 3600)
+        :param tuple initial_token: (optional) Tuple of `(token, expiry_time)` for a token that
+            was already signed for this uri, for example by `bulk_minting.mint_sas_tokens`.  If
+            `None`, a new token is signed.
 
         :raises: SasTokenError if an error occurs building a SasToken
         """
         self._uri = uri
         self._signing_function = signing_function
+        self._async_signing_function: AsyncSigningFunction = None
         self._key_name = key_name
         self._expiry_time: int = (
             None
@@ -53,9 +66,44 @@ class RenewableSasToken(object):
         self._token: str = (
             None
         )  # This will be overwritten by the .refresh() call below
+        self._next_token: Tuple[str, int] = None
 
         self.ttl = ttl
-        self.refresh()
+        if initial_token:
+            (self._token, self._expiry_time) = initial_token
+        else:
+            self.refresh()
+
+    @classmethod
+    async def create_async(
+        cls,
+        uri: str,
+        async_signing_function: AsyncSigningFunction,
+        key_name: str = None,
+        ttl: int = constants.DEFAULT_TOKEN_RENEWAL_INTERVAL,
+        initial_token: Tuple[str, int] = None,
+    ) -> Any:
+        """
+        Create a token which is signed by a coroutine.  The returned object must be refreshed
+        using `refresh_async`.
+
+        :param str uri: URI of the resouce to be accessed
+        :param function async_signing_function: Coroutine function used to sign the token
+        :param str key_name: Symmetric Key Name (optional)
+        :param int ttl: Time to live for the token, in seconds (default 3600)
+        :param tuple initial_token: (optional) Tuple of `(token, expiry_time)` for a token that
+            was already signed for this uri.  If `None`, a new token is signed.
+
+        :returns: RenewableSasToken object
+        """
+        # The empty initial token keeps the constructor from signing.  It gets replaced below.
+        obj = cls(
+            uri, None, key_name, ttl, initial_token=initial_token or ("", 0)
+        )
+        obj._async_signing_function = async_signing_function
+        if not initial_token:
+            await obj.refresh_async()
+        return obj
 
     def __str__(self) -> str:
         return self._token
@@ -63,36 +111,111 @@ class RenewableSasToken(object):
     def refresh(self) -> None:
         """
         Refresh the SasToken lifespan, giving it a new expiry time, and generating a new token.
+        If a precomputed token with at least half of `ttl` remaining is available, it is used
+        instead of generating a new token.
+        """
+        if not self._use_next_token():
+            expiry_time = int(time.time() + self.ttl)
+            (self._token, self._expiry_time) = (
+                self._build_token(expiry_time),
+                expiry_time,
+            )
+
+    def _use_next_token(self) -> bool:
+        """
+        Internal function to swap in the precomputed token, if there is one and it has at least
+        half of `ttl` remaining.
+
+        :returns: True if the precomputed token is now the current token.
+        """
+        (next_token, self._next_token) = (self._next_token, None)
+        if next_token and next_token[1] - time.time() >= self.ttl / 2:
+            (self._token, self._expiry_time) = next_token
+            return True
+        return False
+
+    async def refresh_async(self) -> None:
+        """
+        Version of `refresh` for tokens which were created using `create_async`.
+        """
+        if not self._use_next_token():
+            expiry_time = int(time.time() + self.ttl)
+            try:
+                signature = await self._async_signing_function(
+                    self._get_message_to_sign(expiry_time)
+                )
+            except Exception as e:
+                raise ValueError(
+                    "Unable to build SasToken from given values", e
+                )
+            (self._token, self._expiry_time) = (
+                self._format_token(signature, expiry_time),
+                expiry_time,
+            )
+
+    def precompute(self, expiry_time: int = None) -> None:
+        """
+        Sign the next token and keep it until the next call to `refresh`.  This can be called
+        on a background thread before the token needs to be renewed, so that `refresh` does
+        not need to wait for the signing function.
+
+        :param int expiry_time: (optional) Expiry time for the next token.  This is typically
+            the time that `refresh` is expected to be called, plus `ttl`.  If `None`, the
+            expiry time is calculated from the current time.
+        """
+        if expiry_time is None:
+            expiry_time = int(time.time() + self.ttl)
+        self._next_token = (self._build_token(expiry_time), expiry_time)
+
+    @property
+    def has_precomputed_token(self) -> bool:
+        """
+        True if a token has been precomputed and is waiting for the next call to `refresh`.
         """
-        self._expiry_time = int(time.time() + self.ttl)
-        self._token = self._build_token()
+        return self._next_token is not None
 
-    def _build_token(self) -> str:
+    def _build_token(self, expiry_time: int) -> str:
         """Buid SasToken representation
 
+        :param int expiry_time: Expiry time to put in the token
+
         :returns: String representation of the token
         """
-        url_encoded_uri = urllib.parse.quote(self._uri, safe="")
-        message = url_encoded_uri + "\n" + str(self.expiry_time)
         try:
-            signature = self._signing_function(message)
+            signature = self._signing_function(
+                self._get_message_to_sign(expiry_time)
+            )
         except Exception as e:
             # Because of variant signing mechanisms, we don't know what error might be raised.
             # So we catch all of them.
             raise ValueError("Unable to build SasToken from given values", e)
+        return self._format_token(signature, expiry_time)
+
+    def _get_message_to_sign(self, expiry_time: int) -> str:
+        """
+        Return the string which gets signed to create a token with the given expiry time.
+        """
+        url_encoded_uri: str = urllib.parse.quote(self._uri, safe="")
+        return url_encoded_uri + "\n" + str(expiry_time)
+
+    def _format_token(self, signature: str, expiry_time: int) -> str:
+        """
+        Return the token string for a signature returned by the signing function.
+        """
+        url_encoded_uri = urllib.parse.quote(self._uri, safe="")
         url_encoded_signature = urllib.parse.quote(signature, safe="")
         if self._key_name:
             token = self._auth_rule_token_format.format(
                 resource=url_encoded_uri,
                 signature=url_encoded_signature,
-                expiry=str(self.expiry_time),
+                expiry=str(expiry_time),
                 keyname=self._key_name,
             )
         else:
             token = self._simple_token_format.format(
                 resource=url_encoded_uri,
                 signature=url_encoded_signature,
-                expiry=str(self.expiry_time),
+                expiry=str(expiry_time),
             )
         return token
 
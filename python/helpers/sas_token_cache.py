@@ -0,0 +1,140 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Tuple
+from . import constants
+
+logger = logging.getLogger(__name__)
+
+
+class SasTokenCache(object):
+    """
+    Object which keeps SAS tokens on disk, so a module which restarts can reuse the token it
+    signed before it stopped instead of signing a new one.  This saves a workload API call for
+    `EdgeAuth`, and a lot of HMAC work when many identities restart at once.
+
+    Each sas_uri has its own file, named with a SHA-256 hash of the uri.  The directory is
+    created with permissions `0700` and the files with `0600`, since anyone who can read a
+    token can connect as that identity until it expires.  Files are written to a temporary file
+    and renamed into place, so readers never see a partial file.
+
+    A cached token is only valid if it was signed with the identity's current key, so each
+    entry is saved with a fingerprint of the credential that signed it.  An entry whose
+    fingerprint doesn't match the one passed to `load` is treated as a miss, so a token signed
+    with a key that was rotated is never reused.
+    """
+
+    def __init__(
+        self,
+        cache_directory: str,
+        min_remaining: int = constants.DEFAULT_SAS_TOKEN_CACHE_MIN_REMAINING,
+    ) -> None:
+        """
+        :param str cache_directory: Directory to store cached tokens in.
+        :param int min_remaining: Number of seconds that a cached token needs to have left
+            before it expires to be used.
+        """
+        self.cache_directory = cache_directory
+        self.min_remaining = min_remaining
+
+    def _get_path(self, sas_uri: str) -> str:
+        return os.path.join(
+            self.cache_directory,
+            hashlib.sha256(sas_uri.encode("utf-8")).hexdigest() + ".json",
+        )
+
+    def load(
+        self, sas_uri: str, credential_fingerprint: str = None
+    ) -> Tuple[str, int]:
+        """
+        Load the cached token for a sas_uri.
+
+        :param str sas_uri: The uri that the token was signed for.
+        :param str credential_fingerprint: (optional) Fingerprint of the credential that the
+            token needs to be signed with.  This must match the fingerprint that the token was
+            saved with.
+
+        :returns: tuple of `(token, expiry_time)`, or `None` if there is no cached token with
+            a matching fingerprint and at least `min_remaining` seconds left.
+        """
+        path = self._get_path(sas_uri)
+        try:
+            with open(path, "r") as f:
+                contents = json.load(f)
+            if contents["sas_uri"] != sas_uri:
+                return None
+            if contents.get("credential_fingerprint") != credential_fingerprint:
+                logger.info(
+                    "Cached SAS token was signed with a different credential.  Ignoring it"
+                )
+                return None
+            token: str = contents["token"]
+            expiry_time = int(contents["expiry_time"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.warning(
+                "Unable to read SAS token cache {}".format(path), exc_info=True
+            )
+            return None
+
+        if expiry_time - time.time() < self.min_remaining:
+            return None
+        return (token, expiry_time)
+
+    def save(
+        self,
+        sas_uri: str,
+        token: str,
+        expiry_time: int,
+        credential_fingerprint: str = None,
+    ) -> None:
+        """
+        Save a token to the cache.  Errors are logged and ignored, since the cache is only an
+        optimization.
+
+        :param str sas_uri: The uri that the token was signed for.
+        :param str token: The token.
+        :param int expiry_time: Time that the token expires (in UTC, since epoch)
+        :param str credential_fingerprint: (optional) Fingerprint of the credential that
+            signed the token.
+        """
+        path = self._get_path(sas_uri)
+        contents = {
+            "sas_uri": sas_uri,
+            "token": token,
+            "expiry_time": expiry_time,
+            "credential_fingerprint": credential_fingerprint,
+        }
+        try:
+            os.makedirs(self.cache_directory, mode=0o700, exist_ok=True)
+            # mkstemp creates the file with permissions 0600
+            (fd, temp_path) = tempfile.mkstemp(dir=self.cache_directory)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(contents, f)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except OSError:
+            logger.warning(
+                "Unable to write SAS token cache {}".format(path), exc_info=True
+            )
+
+    def invalidate(self, sas_uri: str) -> None:
+        """
+        Remove the cached token for a sas_uri, if there is one.
+
+        :param str sas_uri: The uri that the token was signed for.
+        """
+        try:
+            os.unlink(self._get_path(sas_uri))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,118 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict
+from . import constants
+from .metrics import MetricsRegistry
+from .sas_token import SigningFunction
+
+logger = logging.getLogger(__name__)
+
+
+class SignRequestCoalescer(object):
+    """
+    Object which wraps a signing function, such as `EdgeWorkloadApi.sign`, so that many threads
+    can sign at the same time without sending duplicate requests.
+
+    Concurrent callers which ask to sign the same data string share a single in-flight
+    request, and all of them get its result.  This is safe because signing is deterministic:
+    the same key and the same data string always produce the same signature.  Distinct data
+    strings are signed in parallel on a bounded pool of `max_concurrent_requests` threads.  With
+    `EdgeWorkloadApi`, set `max_connections` to the same value so each thread keeps its own
+    connection alive.
+
+    Only use one coalescer per signing key.  Data strings signed with different keys produce
+    different signatures, so coalescing across keys would return the wrong signature.
+
+    `sign` matches the signature of `SigningFunction`, so it can be passed to
+    `RenewableSasToken` in place of the function it wraps.
+
+    These counters are recorded:
+    `sign_requests` - number of calls to `sign`
+    `sign_requests_sent` - number of calls made to the wrapped signing function
+    `sign_requests_coalesced` - number of calls which shared an in-flight request.  Each one is
+        a saved round trip.
+    """
+
+    def __init__(
+        self,
+        signing_function: SigningFunction,
+        max_concurrent_requests: int = constants.DEFAULT_WORKLOAD_API_MAX_CONNECTIONS,
+        metrics: MetricsRegistry = None,
+    ) -> None:
+        """
+        :param callable signing_function: Function which signs a data string.
+        :param int max_concurrent_requests: Number of calls to `signing_function` which can run
+            at the same time.
+        :param MetricsRegistry metrics: (optional) registry used to record counters.  If `None`,
+            this object creates its own registry.
+        """
+        self.signing_function = signing_function
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_requests,
+            thread_name_prefix="SignRequestCoalescer",
+        )
+        self.lock = threading.Lock()
+        self.in_flight: Dict[str, "Future[str]"] = {}
+        self.metrics = metrics or MetricsRegistry()
+        self.requests = self.metrics.counter("sign_requests")
+        self.requests_sent = self.metrics.counter("sign_requests_sent")
+        self.requests_coalesced = self.metrics.counter(
+            "sign_requests_coalesced"
+        )
+
+    def get_future(self, data_str: str) -> "Future[str]":
+        """
+        Return a `Future` which resolves to the signature for `data_str`.  If a request to sign
+        `data_str` is already in flight, its `Future` is returned.  Otherwise, a new request
+        is queued.
+
+        :param str data_str: The data string to sign
+
+        :returns: `Future` object which resolves to the signature, or raises the exception
+            raised by the signing function.
+        """
+        self.requests.inc()
+        with self.lock:
+            future = self.in_flight.get(data_str, None)
+            if future:
+                self.requests_coalesced.inc()
+            else:
+                future = self.executor.submit(self._sign, data_str)
+                self.in_flight[data_str] = future
+        return future
+
+    def sign(self, data_str: str) -> str:
+        """
+        Sign a data string, sharing an in-flight request for the same data string if there is
+        one.  This blocks until the signature is available.
+
+        :param str data_str: The data string to sign
+
+        :returns: The signature returned by the signing function.
+        """
+        return self.get_future(data_str).result()
+
+    def _sign(self, data_str: str) -> str:
+        """
+        Internal function which calls the signing function on a worker thread.
+        """
+        self.requests_sent.inc()
+        try:
+            return self.signing_function(data_str)
+        finally:
+            # Callers that arrive after this point send a new request, so results (and
+            # failures) are only shared with callers that overlapped this request.
+            with self.lock:
+                self.in_flight.pop(data_str, None)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the worker pool.
+
+        :param bool wait: If `True`, wait for in-flight requests to complete before returning.
+        """
+        self.executor.shutdown(wait=wait)
@@ -1,7 +1,8 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License. See License.txt in the project root for
 # license information.
-from typing import Any
+import hashlib
+from typing import Any, Tuple, Union
 from . import (
     base_auth,
     hmac_signing_mechanism,
@@ -9,6 +10,8 @@ from . import (
     connection_string as cs,
     constants,
 )
+from .identity import Identity
+from .sas_token_cache import SasTokenCache
 
 
 class SymmetricKeyAuth(base_auth.RenewableTokenAuthorizationBase):
@@ -16,11 +19,22 @@ class SymmetricKeyAuth(base_auth.RenewableTokenAuthorizationBase):
         super(SymmetricKeyAuth, self).__init__()
 
     @classmethod
-    def create_from_connection_string(cls, connection_string: str) -> Any:
+    def create_from_connection_string(
+        cls,
+        connection_string: Union[str, cs.ConnectionString],
+        initial_sas_token: Tuple[str, int] = None,
+        sas_token_cache_directory: str = None,
+    ) -> Any:
         """
         create a new auth object from a connection string
 
-        :param str connection_string: Connection string to create auth object for
+        :param connection_string: Connection string to create auth object for.  This can be a
+            `str` or a `ConnectionString` object that was already parsed.
+        :param tuple initial_sas_token: (optional) Tuple of `(token, expiry_time)` for a SAS
+            token that was already signed for this identity.  If `None`, a new token is signed.
+        :param str sas_token_cache_directory: (optional) Directory used to cache SAS tokens.  If
+            a cached token for this identity has enough time left, it is used instead of
+            signing a new one.  If `None`, tokens are not cached.
         :param int token_renewal_interval: Number of seconds that SAS tokens created by
             this obhject will be valid.
         :param int token_renewal_margen: Number of seconds to subtract from
@@ -29,29 +43,48 @@ class SymmetricKeyAuth(base_auth.RenewableTokenAuthorizationBase):
         :returns: MqttEdgeAuth object created by this function.
         """
         obj = SymmetricKeyAuth()
-        obj._initialize(connection_string)
+        if sas_token_cache_directory:
+            obj.sas_token_cache = SasTokenCache(sas_token_cache_directory)
+        obj._initialize(connection_string, initial_sas_token)
         return obj
 
-    def _initialize(self, connection_string: str) -> None:
+    def _initialize(
+        self,
+        connection_string: Union[str, cs.ConnectionString],
+        initial_sas_token: Tuple[str, int] = None,
+    ) -> None:
         """
         Helper function to initialize a newly created auth object.
         """
-        conn_str = cs.ConnectionString(connection_string)
+        if isinstance(connection_string, cs.ConnectionString):
+            conn_str = connection_string
+        else:
+            conn_str = cs.ConnectionString(connection_string)
 
-        self.hostname = conn_str[cs.HOST_NAME]
-        self.device_id = conn_str[cs.DEVICE_ID]
-        self.module_id = conn_str.get(cs.MODULE_ID, None)
+        self.identity = Identity(
+            conn_str[cs.HOST_NAME],
+            conn_str[cs.DEVICE_ID],
+            conn_str.get(cs.MODULE_ID, None),
+            self.api_version,
+        )
         self.gateway_host_name = conn_str.get(cs.GATEWAY_HOST_NAME, None)
 
         shared_access_key = conn_str[cs.SHARED_ACCESS_KEY]
+        self.sas_token_credential_fingerprint = hashlib.sha256(
+            shared_access_key.encode("utf-8")
+        ).hexdigest()
 
         signing_mechanism = hmac_signing_mechanism.HmacSigningMechanism(
             shared_access_key
         )
+        cached_sas_token = (
+            None if initial_sas_token else self._load_cached_sas_token()
+        )
         self.sas_token = sas_token.RenewableSasToken(
             uri=self.sas_uri,
             signing_function=signing_mechanism.sign,
             ttl=constants.DEFAULT_TOKEN_RENEWAL_INTERVAL,
+            initial_token=initial_sas_token or cached_sas_token,
         )
-
-        self.sas_token.refresh()
+        if not cached_sas_token:
+            self._save_sas_token()
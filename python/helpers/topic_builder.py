@@ -2,38 +2,51 @@
 # Licensed under the MIT License. See License.txt in the project root for
 # license information.
 from uuid import uuid4
-from typing import List, Tuple
+from typing import List, Tuple, Union
 from datetime import datetime
 import six.moves.urllib as urllib
-from . import topic_parser, constants, Message, version_compat
+from . import topic_parser, constants, version_compat
+from .message import Message
+from .identity import Identity
 
 
-def build_edge_topic_prefix(device_id: str, module_id: str) -> str:
+def build_edge_topic_prefix(
+    device_id: Union[str, Identity], module_id: str
+) -> str:
     """
     Helper function to build the prefix that is common to all topics.
 
-    :param str device_id: The device_id for the device or module.
+    :param device_id: The device_id for the device or module, or an `Identity` object.  If
+        this is an `Identity`, `module_id` is ignored.
     :param str module_id: (optional) The module_id for the module.  Set to `None` if build a prefix for a device.
 
     :return: The topic prefix, including the trailing slash (`/`)
     """
+    if isinstance(device_id, Identity):
+        return device_id.edge_topic_prefix
     if module_id:
         return "$iothub/{}/{}/".format(device_id, module_id)
     else:
         return "$iothub/{}/".format(device_id)
 
 
-def build_iothub_topic_prefix(device_id: str, module_id: str = None) -> str:
+def build_iothub_topic_prefix(
+    device_id: Union[str, Identity], module_id: str = None
+) -> str:
     """
     return the string that is at the beginning of all topics for this
     device/module
 
-    :param str device_id: The device_id for the device or module.
+    :param device_id: The device_id for the device or module, or an `Identity` object.  If
+        this is an `Identity`, `module_id` is ignored.
     :param str module_id: (optional) The module_id for the module.  Set to `None` if build a prefix for a device.
 
     :return: The topic prefix, including the trailing slash (`/`)
     """
 
+    if isinstance(device_id, Identity):
+        return device_id.iothub_topic_prefix
+
     # NOTE: Neither Device ID nor Module ID should be URL encoded in a topic string.
     # See the repo wiki article for details:
     # https://github.com/Azure/azure-iot-sdk-python/wiki/URL-Encoding-(MQTT)
@@ -44,14 +57,17 @@ def build_iothub_topic_prefix(device_id: str, module_id: str = None) -> str:
 
 
 def build_twin_response_subscribe_topic(
-    device_id: str, module_id: str = None, include_wildcard_suffix: bool = True
+    device_id: Union[str, Identity],
+    module_id: str = None,
+    include_wildcard_suffix: bool = True,
 ) -> str:
     """
     Build a topic string that can be used to subscribe to twin resopnses.  These
     are messages that are sent back from the service when the cilent sends a twin
     "get" operation or a twin "patch reported properties" operation.
 
-    :param str device_id: The device_id for the device or module.
+    :param device_id: The device_id for the device or module, or an `Identity` object.  If
+        this is an `Identity`, `module_id` is ignored.
     :param str module_id: (optional) The module_id for the module.  Set to `None` if subscribing for a device.
     :param bool include_wildcard_suffix: True to include "#" at the end (for subscribing),
         False to exclude it (for topic matching)
@@ -69,13 +85,16 @@ def build_twin_response_subscribe_topic(
 
 
 def build_twin_patch_desired_subscribe_topic(
-    device_id: str, module_id: str, include_wildcard_suffix: bool = True
+    device_id: Union[str, Identity],
+    module_id: str,
+    include_wildcard_suffix: bool = True,
 ) -> str:
     """
     Build a topic string that can be used to subscribe to twin desired property
     patches for sepcified device or module.
 
-    :param str device_id: The device_id for the device or module.
+    :param device_id: The device_id for the device or module, or an `Identity` object.  If
+        this is an `Identity`, `module_id` is ignored.
     :param str module_id: (optional) The module_id for the module.  Set to `None` if subscribing for a device.
     :param bool include_wildcard_suffix: True to include "#" at the end (for subscribing),
         False to exclude it (for topic matching)
@@ -93,7 +112,7 @@ def build_twin_patch_desired_subscribe_topic(
 
 
 def build_twin_patch_reported_publish_topic(
-    device_id: str, module_id: str
+    device_id: Union[str, Identity], module_id: str
 ) -> str:
     """
     Build a topic string that can be used to publish a twin reported property patch.  This is a
@@ -107,7 +126,8 @@ def build_twin_patch_reported_publish_topic(
     The response to this `patch` operation is returned in a twin response message with a matching
     `request_id` value.
 
-    :param str device_id: The device_id for the device or module.
+    :param device_id: The device_id for the device or module, or an `Identity` object.  If
+        this is an `Identity`, `module_id` is ignored.
     :param str module_id: (optional) The module_id for the module.  Set to `None` if publishing for a device.
 
 
@@ -123,7 +143,9 @@ def build_twin_patch_reported_publish_topic(
         return "$iothub/twin/PATCH/properties/reported/?$rid=" + str(uuid4())
 
 
-def build_twin_get_publish_topic(device_id: str, module_id: str) -> str:
+def build_twin_get_publish_topic(
+    device_id: Union[str, Identity], module_id: str
+) -> str:
     """
     Build a topic string that can be used to get a device twin from the service.  This is a
     "one time" topic which can only be used once since it contains a unique identifier that is used.
@@ -133,7 +155,8 @@ def build_twin_get_publish_topic(device_id: str, module_id: str) -> str:
     The response to this `get` operation is returned in a twin response message with a matching
     `request_id` value.
 
-    :param str device_id: The device_id for the device or module.
+    :param device_id: The device_id for the device or module, or an `Identity` object.  If
+        this is an `Identity`, `module_id` is ignored.
     :param str module_id: (optional) The module_id for the module.  Set to `None` if publishing for a device.
 
     :return: The topic string used publish a twin get operation to the service.
@@ -149,14 +172,15 @@ def build_twin_get_publish_topic(device_id: str, module_id: str) -> str:
 
 
 def build_telemetry_publish_topic(
-    device_id: str, module_id: str, message: Message
+    device_id: Union[str, Identity], module_id: str, message: Message
 ) -> str:
     """
     Build a topic string that can be used to publish device/module telemetry to the service.  If
     a properties array is provided, those properties are encoded into the topic string.  This topic
     _can_ be reused if publishing for the same device/module with the same properties.
 
-    :param str device_id: The device_id for the device or module.
+    :param device_id: The device_id for the device or module, or an `Identity` object.  If
+        this is an `Identity`, `module_id` is ignored.
     :param str module_id: (optional) The module_id for the module.  Set to `None` if publishing for a device.
 
     :return: The topic string used publish device/module telemetry to the service.
@@ -178,12 +202,15 @@ def build_telemetry_publish_topic(
 
 
 def build_c2d_subscribe_topic(
-    device_id: str, module_id: str, include_wildcard_suffix: bool = True
+    device_id: Union[str, Identity],
+    module_id: str,
+    include_wildcard_suffix: bool = True,
 ) -> str:
     """
     Build a topic string that can be used to subscribe to C2D messages for the device or module.
 
-    :param str device_id: The device_id for the device or module.
+    :param device_id: The device_id for the device or module, or an `Identity` object.  If
+        this is an `Identity`, `module_id` is ignored.
     :param str module_id: (optional) The module_id for the module.  Set to `None` if subscribing for a device.
     :param bool include_wildcard_suffix: True to include "#" at the end (for subscribing),
         False to exclude it (for topic matching)
@@ -206,12 +233,15 @@ def build_c2d_subscribe_topic(
 
 
 def build_method_request_subscribe_topic(
-    device_id: str, module_id: str, include_wildcard_suffix: bool = True
+    device_id: Union[str, Identity],
+    module_id: str,
+    include_wildcard_suffix: bool = True,
 ) -> str:
     """
     Build a topic string that can be used to subscribe to method requests
 
-    :param str device_id: The device_id for the device or module.
+    :param device_id: The device_id for the device or module, or an `Identity` object.  If
+        this is an `Identity`, `module_id` is ignored.
     :param str module_id: (optional) The module_id for the module. Set to `None` if subscribing for a device.
     :param bool include_wildcard_suffix: True to include "#" at the end (for subscribing),
         False to exclude it (for topic matching)
@@ -247,7 +277,35 @@ def build_method_response_publish_topic(
     if constants.EDGEHUB_TOPIC_RULES:
         device_id = topic_parser.extract_device_id(request_topic)
         module_id = topic_parser.extract_module_id(request_topic)
+    else:
+        device_id = None
+        module_id = None
+
+    return build_method_response_publish_topic_from_fields(
+        request_id, status_code, device_id, module_id
+    )
+
 
+def build_method_response_publish_topic_from_fields(
+    request_id: str,
+    status_code: str,
+    device_id: Union[str, Identity] = None,
+    module_id: str = None,
+) -> str:
+    """
+    Build a topic string that can be used to publish a response to a specific method request,
+    using fields which have already been parsed out of the request topic (for example, by
+    `topic_parser.extract_method_request_fields`).  This avoids parsing the request topic again.
+
+    :param str request_id: The request_id from the method request being responded to.
+    :param str status code: The result code for the method response.
+    :param device_id: The device_id for the device or module, or an `Identity` object.  If
+        this is an `Identity`, `module_id` is ignored.  Only used with EdgeHub topic rules.
+    :param str module_id: (optional) The module_id for the module.  Only used with EdgeHub topic rules.
+
+    :return: The topic string used to return method results to the service.
+    """
+    if constants.EDGEHUB_TOPIC_RULES:
         return build_edge_topic_prefix(
             device_id, module_id
         ) + "methods/res/{}/?$rid={}".format(
@@ -1,8 +1,25 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License. See License.txt in the project root for
 # license information.
+from typing import Tuple
 from . import topic_parser, topic_builder, constants
 
+# Kinds of incoming messages, as returned by `classify_topic`
+KIND_TWIN_RESPONSE = "twin_response"
+KIND_TWIN_PATCH_DESIRED = "twin_patch_desired"
+KIND_METHOD_REQUEST = "method_request"
+KIND_C2D = "c2d"
+KIND_INPUT_MESSAGE = "input_message"
+KIND_UNKNOWN = "unknown"
+ALL_KINDS = (
+    KIND_TWIN_RESPONSE,
+    KIND_TWIN_PATCH_DESIRED,
+    KIND_METHOD_REQUEST,
+    KIND_C2D,
+    KIND_INPUT_MESSAGE,
+    KIND_UNKNOWN,
+)
+
 
 def is_twin_response(topic: str, request_topic: str) -> bool:
     """
@@ -77,7 +94,7 @@ def is_method_request(topic: str, method_name: str = None) -> bool:
     else:
         is_method = topic.startswith("$iothub/methods/POST")
 
-    if not method_name:
+    if not method_name or not is_method:
         return is_method
     else:
         return topic_parser.extract_method_name(topic) == method_name
@@ -130,3 +147,60 @@ def sent_to_module(topic: str, device_id: str, module_id: str) -> bool:
             return topic.startswith(
                 topic_builder.build_iothub_topic_prefix(device_id, module_id)
             )
+
+
+def is_input_message(topic: str) -> bool:
+    """
+    Determine if a topic string is for a message sent to an Edge module input.
+
+    :param str topic: The topic to test
+
+    :returns: True if the topic is an Edge module input message.
+    """
+    if constants.EDGEHUB_TOPIC_RULES:
+        return topic.startswith("$iothub/") and "/inputs/" in topic
+    else:
+        return topic.startswith("devices/") and "/inputs/" in topic
+
+
+def classify_topic(topic: str) -> Tuple[str, str]:
+    """
+    Determine what kind of message a received topic string is for.  This does all of the
+    matching and parsing needed to route a message in a single pass, so callers that
+    route many messages don't need to call the individual `is_x` functions one at a time.
+
+    :param str topic: The topic to classify
+
+    :returns: A tuple of `(kind, name)`.  `kind` is one of the `KIND_` constants in this module.
+        `name` is the method name for method requests, the input name for input messages,
+        and `None` for all other kinds.  Topics which look like method requests or input
+        messages but don't contain a non-empty name, like `$iothub/methods/POST` or
+        `$iothub/methods/POST/`, are `KIND_UNKNOWN`.
+    """
+    # The name is never in the properties, so they are left out before extracting it.
+    path = topic.partition("?")[0]
+    try:
+        if is_twin_response(topic, None):
+            return (KIND_TWIN_RESPONSE, None)
+        elif is_twin_patch_desired(topic):
+            return (KIND_TWIN_PATCH_DESIRED, None)
+        elif is_method_request(topic):
+            (kind, name) = (
+                KIND_METHOD_REQUEST,
+                topic_parser.extract_method_name(path),
+            )
+        elif is_c2d(topic):
+            return (KIND_C2D, None)
+        elif is_input_message(topic):
+            (kind, name) = (
+                KIND_INPUT_MESSAGE,
+                topic_parser.extract_input_name(path),
+            )
+        else:
+            return (KIND_UNKNOWN, None)
+    except ValueError:
+        return (KIND_UNKNOWN, None)
+
+    if not name:
+        return (KIND_UNKNOWN, None)
+    return (kind, name)
@@ -1,7 +1,7 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License. See License.txt in the project root for
 # license information.
-from typing import Dict, List, Union
+from typing import Dict, List, Tuple, Union
 import six.moves.urllib as urllib
 from . import constants
 
@@ -151,6 +151,58 @@ def extract_method_name(topic: str) -> str:
     )
 
 
+def extract_method_request_fields(topic: str) -> Tuple[str, str, str, str]:
+    """
+    Extract all of the fields needed to handle and respond to a method request in a single pass.
+    Code which routes method requests should call this once per request instead of calling
+    `extract_method_name`, `extract_request_id`, `extract_device_id` and `extract_module_id`
+    separately.
+
+    :param str topic: The topic to extract the values from
+
+    :raises: `ValueError` if the topic is not targeted to iothub, is not targeted to a method, or does not contain a method name and request_id
+
+    :returns: A tuple of `(method_name, request_id, device_id, module_id)`.  `device_id` and `module_id`
+        are only returned when using EdgeHub topic rules, since IoTHub method topics don't contain them.
+        Otherwise, they are `None`.  `module_id` is also `None` if the request is for a device.
+    """
+    if constants.EDGEHUB_TOPIC_RULES:
+        marker = "/methods/post/"
+    else:
+        marker = "/methods/POST/"
+    _verify_topic(topic, marker, "methods")
+
+    (path, _, properties) = topic.partition("?")
+    (prefix, _, remainder) = path.partition(marker)
+    method_name = remainder.split("/", 1)[0]
+    if not method_name:
+        raise ValueError(
+            "Topic string is not a method call or does not contain a method name"
+        )
+
+    request_id = None
+    for entry in properties.split("&"):
+        (key, separator, value) = entry.partition("=")
+        if urllib.parse.unquote(key).lstrip("$") == "rid":
+            if not separator:
+                raise ValueError(
+                    "Topic string contains a request_id property without a value"
+                )
+            request_id = urllib.parse.unquote(value)
+    if not request_id:
+        raise ValueError("Topic string does not contain a request_id")
+
+    if constants.EDGEHUB_TOPIC_RULES:
+        segments = prefix.split("/")
+        device_id = segments[1]
+        module_id = segments[2] if len(segments) > 2 else None
+    else:
+        device_id = None
+        module_id = None
+
+    return (method_name, request_id, device_id, module_id)
+
+
 def extract_status_code(topic: str) -> str:
     """
     Extract the status code for a topic that is used to return a twin or methods response.
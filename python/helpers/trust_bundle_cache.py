@@ -0,0 +1,104 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Tuple
+from . import constants
+
+logger = logging.getLogger(__name__)
+
+
+def _hash_certificate(certificate: str) -> str:
+    return hashlib.sha256(certificate.encode("utf-8")).hexdigest()
+
+
+class TrustBundleCache(object):
+    """
+    Object which keeps a copy of the Edge trust bundle on disk, so a module can start using it
+    without waiting for the workload API.
+
+    The cache file is a small JSON document with the certificate, a SHA-256 hash of the
+    certificate, and the time it was retrieved.  The hash is checked when the file is loaded,
+    so a damaged file is ignored instead of being used.  Files are written to a temporary
+    file and renamed into place, so readers never see a partial file.
+    """
+
+    def __init__(
+        self,
+        cache_path: str,
+        max_age: int = constants.DEFAULT_TRUST_BUNDLE_CACHE_MAX_AGE,
+    ) -> None:
+        """
+        :param str cache_path: Path of the cache file.
+        :param int max_age: Number of seconds that a cached trust bundle can be used for.  Older
+            cached copies are ignored.
+        """
+        self.cache_path = cache_path
+        self.max_age = max_age
+
+    def load(self) -> Tuple[str, float]:
+        """
+        Load the cached trust bundle.
+
+        :returns: tuple of `(certificate, age_in_seconds)`, or `(None, None)` if there is no
+            usable cached copy.
+        """
+        try:
+            with open(self.cache_path, "r") as f:
+                contents = json.load(f)
+            certificate: str = contents["certificate"]
+            if _hash_certificate(certificate) != contents["sha256"]:
+                logger.warning(
+                    "Trust bundle cache {} is damaged.  Ignoring".format(
+                        self.cache_path
+                    )
+                )
+                return (None, None)
+            age = time.time() - contents["retrieved_time"]
+        except FileNotFoundError:
+            return (None, None)
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.warning(
+                "Unable to read trust bundle cache {}".format(self.cache_path),
+                exc_info=True,
+            )
+            return (None, None)
+
+        if age > self.max_age:
+            logger.info("Cached trust bundle is too old.  Ignoring")
+            return (None, None)
+        return (certificate, age)
+
+    def save(self, certificate: str) -> None:
+        """
+        Save a trust bundle to the cache.  Errors are logged and ignored, since the cache is
+        only an optimization.
+
+        :param str certificate: The certificate returned by the workload API.
+        """
+        contents = {
+            "certificate": certificate,
+            "sha256": _hash_certificate(certificate),
+            "retrieved_time": time.time(),
+        }
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            (fd, temp_path) = tempfile.mkstemp(dir=directory)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(contents, f)
+                os.replace(temp_path, self.cache_path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except OSError:
+            logger.warning(
+                "Unable to write trust bundle cache {}".format(self.cache_path),
+                exc_info=True,
+            )
@@ -1,9 +1,14 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License. See License.txt in the project root for
 # license information.
+import itertools
 import threading
-from typing import Dict, Callable, TypeVar, Generic
+import time
+from concurrent.futures import CancelledError, Future, TimeoutError
+from typing import Dict, Callable, TypeVar, Generic, Tuple
 import logging
+from .metrics import MetricsRegistry
+from . import constants
 
 logger = logging.getLogger(__name__)
 
@@ -18,38 +23,171 @@ class WaitableDict(Generic[KeyType, ValueType]):
     set.  This way, code that needs to wait for a specific PUBACK or SUBACK to be returned
     can easily be written using `get_next_item` with a specific `key` value.
 
-    These "wait" operations are done in a thread-safe manner using the `Condition` class
-    provided by the `threading` module.
+    Code which keeps many operations in flight at once can use `get_future` instead.  This
+    returns a `concurrent.futures.Future` for a specific key, which `add_item` completes
+    directly.  Completion callbacks can be attached using `Future.add_done_callback`, so
+    no thread needs to block for each outstanding key.  `get_next_item` is a thin
+    blocking wrapper around `get_future`.
 
-    Callers using `asyncio` instead of `threading` should consider writing an awaitable version
-    of this class using the `asyncio.Condition` class for synchronization.  Submitting a pull
-    request with this functionality is encouraged.
+    Items which nobody waits for, like PUBACKs for messages that were published without
+    waiting, are discarded after `ttl` seconds.  Expired items are counted in the
+    `waitable_items_expired` metric, labeled with the `name` of this object.  Futures never
+    expire, since someone may still be waiting on them.  A future which is cancelled is
+    removed right away, so a key which is used again later (like a reused `mid`) stores its
+    item instead of completing a future that was abandoned.
+
+    Callers using `asyncio` instead of `threading` can await the futures returned by
+    `get_future` by wrapping them with `asyncio.wrap_future`.
     """
 
-    def __init__(self) -> None:
-        self.cv = threading.Condition()
-        self.lookup: Dict[KeyType, ValueType] = {}
+    def __init__(
+        self,
+        ttl: float = constants.DEFAULT_WAITABLE_ITEM_TTL,
+        name: str = "waitable_dict",
+        metrics: MetricsRegistry = None,
+    ) -> None:
+        """
+        :param float ttl: Number of seconds that unclaimed items are kept.  `None` to keep
+            items forever.
+        :param str name: Name of this object.  Used to label metrics.
+        :param MetricsRegistry metrics: (optional) registry used to count expired items.  If
+            `None`, this object creates its own registry.
+        """
+        self.lock = threading.Lock()
+        self.futures: Dict[KeyType, "Future[ValueType]"] = {}
+        # values are stored with their arrival times.  Because dicts preserve insertion order
+        # and every item has the same TTL, the oldest items are always at the front.
+        self.lookup: Dict[KeyType, Tuple[ValueType, float]] = {}
+        self.ttl = ttl
+        self.name = name
+        self.metrics = metrics or MetricsRegistry()
+
+    def _expire(self, now: float) -> None:
+        """
+        Internal function to remove expired items.  This only looks at the items which have
+        expired (plus one), so it is cheap enough to call on every `add_item`.  Must be called
+        while holding `self.lock`.
+        """
+        if self.ttl is None:
+            return
+
+        expired = 0
+        for (_, arrival_time) in self.lookup.values():
+            if now - arrival_time <= self.ttl:
+                break
+            expired += 1
+
+        if expired:
+            for key in list(itertools.islice(self.lookup, expired)):
+                del self.lookup[key]
+            logger.warning(
+                "Discarded {} unclaimed items from {}".format(
+                    expired, self.name
+                )
+            )
+            self.metrics.counter(
+                "waitable_items_expired", {"name": self.name}
+            ).inc(expired)
+
+    def _forget_cancelled(
+        self, key: KeyType, future: "Future[ValueType]"
+    ) -> None:
+        """
+        Internal done callback which removes a future from `futures` if it was cancelled, so
+        the next item for its key is stored instead.
+        """
+        if future.cancelled():
+            with self.lock:
+                if self.futures.get(key, None) is future:
+                    del self.futures[key]
 
     def add_item(self, key: KeyType, value: ValueType) -> None:
-        with self.cv:
-            self.lookup[key] = value
-            self.cv.notify_all()
+        """
+        Add an item.  If there is a future waiting for this key, the future is completed and
+        the item is not stored.  This is O(1) no matter how many keys are being waited for.
+
+        Completion callbacks attached to the future run inside this call, so they run on the
+        thread calling `add_item`.  For Paho, this is the network thread, so those callbacks
+        should return quickly.
+
+        :param key: The key for the item, such as the `mid` of a PUBACK.
+        :param value: The value for the item.
+        """
+        now = time.monotonic()
+        with self.lock:
+            future = self.futures.pop(key, None)
+            # A future which the waiter cancelled can't be completed, so the item is stored
+            # instead.  `set_running_or_notify_cancel` also stops the waiter from cancelling
+            # it after this point.
+            if future and not future.set_running_or_notify_cancel():
+                future = None
+            if not future:
+                # pop before setting so a re-added key moves to the end of the expiry order.
+                self.lookup.pop(key, None)
+                self.lookup[key] = (value, now)
+                self._expire(now)
+
+        # Complete the future outside of the lock so callbacks can call back into this object.
+        if future:
+            future.set_result(value)
+
+    def get_future(self, key: KeyType) -> "Future[ValueType]":
+        """
+        Return a future which is completed with the value for `key` when `add_item` is called
+        for that key.  If the item has already been added, the returned future is already complete.
+        Either way, the item is removed from this object.
+
+        If more than one caller asks for a future for the same key before the item arrives, they
+        all get the same future.
+
+        :param key: The key to wait for.
+
+        :returns: A `concurrent.futures.Future` object for the value.
+        """
+        with self.lock:
+            if key in self.lookup:
+                future: "Future[ValueType]" = Future()
+                future.set_result(self.lookup.pop(key)[0])
+                return future
+
+            future = self.futures.get(key, None)
+            if future and not future.cancelled():
+                return future
+            future = Future()
+            self.futures[key] = future
+
+        # Added outside of the lock, since `_forget_cancelled` takes it.
+        future.add_done_callback(
+            lambda future: self._forget_cancelled(key, future)
+        )
+        return future
 
     def get_next_item(self, key: KeyType, timeout: float) -> ValueType:
-        def received() -> bool:
-            return key in self.lookup
+        """
+        Wait for the item with the given key to be added, and return its value.  If the item
+        has already been added, return it immediately.
+
+        :param key: The key to wait for.
+        :param float timeout: Amount of time to wait before returning.
 
-        with self.cv:
-            if not self.cv.wait_for(received, timeout=timeout):
+        :returns: The value for the key, or `None` if the item isn't added before the timeout elapses.
+        """
+        future = self.get_future(key)
+        try:
+            return future.result(timeout=timeout)
+        except CancelledError:
+            # Another caller waiting for the same key gave up.
+            return None
+        except TimeoutError:
+            with self.lock:
+                abandoned = self.futures.get(key, None) is future
+                if abandoned:
+                    # Nobody is going to complete this future now.  If other callers are sharing
+                    # it, they stop waiting too.
+                    del self.futures[key]
+            if abandoned:
+                future.cancel()
                 return None
             else:
-                try:
-                    return self.lookup.pop(key)
-                except KeyError:
-                    # possible multiple readers.  Not really a big deal.
-                    logger.error(
-                        "{} was removed from lookup list between notification and retrieval.".format(
-                            key
-                        )
-                    )
-                    return None
+                # add_item claimed the future after our timeout and is completing it right now.
+                return future.result()
@@ -11,10 +11,11 @@ from helpers import (
     SymmetricKeyAuth,
     IncomingMessageList,
     WaitableDict,
+    MethodRouter,
+    MethodRequest,
     topic_builder,
-    topic_parser,
 )
-from typing import Any
+from typing import Any, Tuple, Union
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -28,6 +29,8 @@ class SampleApp(object):
         self.connected = threading.Event()
         self.incoming_subacks: WaitableDict[int, int] = WaitableDict()
         self.incoming_messages = IncomingMessageList()
+        self.method_router = MethodRouter(self.publish_method_response)
+        self.method_router.register_method_handler("echo", self.handle_echo)
 
     def handle_on_connect(
         self, mqtt_client: mqtt.Client, userdata: Any, flags: Any, rc: int
@@ -74,6 +77,17 @@ class SampleApp(object):
         print("received message on {}".format(message.topic))
         self.incoming_messages.add_item(message)
 
+    def publish_method_response(self, topic: str, payload: bytes) -> None:
+        mi = self.mqtt_client.publish(topic=topic, payload=payload, qos=1)
+        mi.wait_for_publish()
+
+    def handle_echo(
+        self, request: MethodRequest
+    ) -> Tuple[int, Union[str, bytes]]:
+        print("method name: {}".format(request.method_name))
+        print("method request: {}".format(str(request.payload)))
+        return (200, request.payload)
+
     def main(self) -> None:
         logger.info("Azure IoT Edge Protocol Translation Module (PTM) Sample")
 
@@ -110,8 +124,10 @@ class SampleApp(object):
                 )
                 if ping:
                     print("ping: {}".format(str(ping.payload)))
-                    response_topic = topic_builder.build_method_response_publish_topic(
-                        ping.topic, "200"
+                    response_topic = (
+                        topic_builder.build_method_response_publish_topic(
+                            ping.topic, "200"
+                        )
                     )
                     mi = self.mqtt_client.publish(
                         topic=response_topic, payload=ping.payload, qos=1
@@ -119,22 +135,14 @@ class SampleApp(object):
                     mi.wait_for_publish()
                     print("ping response sent")
 
-                # Can also get all method requests with one call and use extract_method_name
-                # to build a switch
+                # Can also get all method requests with one call and hand them to a
+                # MethodRouter.  The router parses the request topic once, looks up the
+                # handler registered for that method name, and publishes the response.
                 method_request = self.incoming_messages.pop_next_method_request(
                     timeout=0
                 )
                 if method_request:
-                    print(
-                        "method request: {}".format(str(method_request.payload))
-                    )
-                    print(
-                        "method name: {}".format(
-                            topic_parser.extract_method_name(
-                                method_request.topic
-                            )
-                        )
-                    )
+                    self.method_router.handle_method_request(method_request)
 
                 # Or maybe we get a message on some unkonwn topic.  We can get that too and use
                 # topic_match.py or topic_parser.py to figure out where to make it go.
@@ -0,0 +1,143 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+import logging
+import threading
+import os
+import time
+from concurrent.futures import Future
+from paho.mqtt import client as mqtt
+from helpers import SymmetricKeyAuth, Message, topic_builder, ConnectionSwitcher
+from typing import Any, List
+
+# SAMPLE 5
+#
+# Demonstrates how to renew the SAS token without stalling telemetry.  Instead of
+# reconnecting the client, a second client connects with the new token, and traffic moves to
+# it once it is connected.
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logging.getLogger("paho").setLevel(level=logging.DEBUG)
+
+
+class SampleApp(object):
+    def __init__(self) -> None:
+        self.auth: SymmetricKeyAuth = None
+        self.switcher: ConnectionSwitcher = None
+
+    def connect(self) -> mqtt.Client:
+        """
+        Create a new client with the current credentials and wait for it to connect.  The
+        switcher calls this for the first connection and again after each renewal.
+        """
+        connected = threading.Event()
+
+        def handle_on_connect(
+            mqtt_client: mqtt.Client, userdata: Any, flags: Any, rc: int
+        ) -> None:
+            logger.info(
+                "handle_on_connect called with rc={} ({})".format(
+                    rc, mqtt.connack_string(rc)
+                )
+            )
+            if rc == mqtt.MQTT_ERR_SUCCESS:
+                connected.set()
+
+        mqtt_client = mqtt.Client(self.auth.client_id)
+        mqtt_client.enable_logger()
+        mqtt_client.username_pw_set(self.auth.username, self.auth.password)
+        mqtt_client.tls_set_context(self.auth.create_tls_context())
+
+        mqtt_client.on_connect = handle_on_connect
+        # PUBACKs and dropped connections need to go to the switcher.  When the new client
+        # connects, IoT Hub drops the old one, and the switcher publishes the old client's
+        # unacknowledged messages on the new client.
+        mqtt_client.on_publish = lambda client, userdata, mid: (
+            self.switcher.handle_puback(client, mid)
+        )
+        mqtt_client.on_disconnect = lambda client, userdata, rc: (
+            self.switcher.handle_connection_lost(client)
+        )
+
+        mqtt_client.loop_start()
+        mqtt_client.connect(self.auth.hostname, self.auth.port)
+        if not connected.wait(timeout=20):
+            self.close(mqtt_client)
+            raise Exception("Failed to connect")
+
+        # If we had subscriptions, we would subscribe again here, since subscriptions belong
+        # to the connection.
+        return mqtt_client
+
+    def publish(
+        self, mqtt_client: mqtt.Client, topic: str, payload: bytes
+    ) -> int:
+        mid: int = mqtt_client.publish(topic, payload, qos=1).mid
+        return mid
+
+    def close(self, mqtt_client: mqtt.Client) -> None:
+        # `disconnect` stops Paho from reconnecting.  If the old client reconnected, IoT Hub
+        # would drop the new one.
+        mqtt_client.disconnect()
+        mqtt_client.loop_stop()
+
+    def handle_sas_token_renewed(self) -> None:
+        logger.info("handle_sas_token_renewed")
+
+        # Telemetry keeps flowing on the old client while the new one connects.
+        self.switcher.renew()
+
+        self.auth.set_sas_token_renewal_timer(self.handle_sas_token_renewed)
+
+    def send_telemetry(self) -> None:
+        messages_to_send = 20
+        outstanding_messages: List["Future[None]"] = []
+
+        for i in range(0, messages_to_send):
+            logger.info("Sending telemetry {}".format(i))
+
+            payload = {"index": i, "text": "This is message # {}".format(i)}
+            msg = Message(payload)
+
+            telemetry_topic = topic_builder.build_telemetry_publish_topic(
+                self.auth.device_id, self.auth.module_id, msg
+            )
+
+            # publish on whichever client is current.  Don't wait for the PUBACK.
+            outstanding_messages.append(
+                self.switcher.publish(telemetry_topic, msg.get_binary_payload())
+            )
+            time.sleep(1)
+
+        # The futures complete when the messages are acknowledged, even if they had to be
+        # published again on a new client.
+        for future in outstanding_messages:
+            future.result()
+
+    def main(self) -> None:
+        logger.info("Azure IoT Edge Protocol Translation Module (PTM) Sample")
+
+        self.auth = SymmetricKeyAuth.create_from_connection_string(
+            os.environ["IOTHUB_DEVICE_CONNECTION_STRING"]
+        )
+        self.auth.set_sas_token_renewal_timer(self.handle_sas_token_renewed)
+
+        self.switcher = ConnectionSwitcher(
+            connect_function=self.connect,
+            publish_function=self.publish,
+            close_function=self.close,
+        )
+
+        logger.info("Connecting")
+        self.switcher.connect()
+
+        self.send_telemetry()
+
+        self.switcher.close()
+
+        logger.info("Exiting.")
+
+
+if __name__ == "__main__":
+    SampleApp().main()
@@ -12,6 +12,8 @@ from helpers import (
     SymmetricKeyAuth,
     Message,
     IncomingMessageList,
+    MessageDispatcher,
+    PublishWindow,
     WaitableDict,
     topic_builder,
     topic_parser,
@@ -34,6 +36,8 @@ class SampleApp(object):
         self.connected = threading.Event()
         self.incoming_subacks: WaitableDict[int, int] = WaitableDict()
         self.incoming_messages = IncomingMessageList()
+        self.dispatcher = MessageDispatcher()
+        self.publish_window: PublishWindow = None
 
     def handle_on_connect(
         self, mqtt_client: mqtt.Client, userdata: Any, flags: Any, rc: int
@@ -92,22 +96,8 @@ class SampleApp(object):
         self.incoming_subacks.get_next_item(mid, timeout=10)
         print("SUBACK received for mid {}".format(mid))
 
-    def handle_on_message(
-        self, mqtt_client: mqtt.Client, userdata: Any, message: mqtt.MQTTMessage
-    ) -> None:
-        # we're inside a Paho thread here.
-        # Save the message and return as quickly as possible
-        print("received message on {}".format(message.topic))
-        self.incoming_messages.add_item(message)
-
-    def remove_completed_messages(
-        self, messages: List[mqtt.MQTTMessageInfo]
-    ) -> List[mqtt.MQTTMessageInfo]:
-        return [x for x in messages if not x.is_published()]
-
     def send_telemetry(self) -> None:
         messages_to_send = 20
-        outstanding_messages = []
         start = time.time()
         for i in range(0, messages_to_send):
             logger.info("Sending telemetry {}".format(i))
@@ -118,29 +108,25 @@ class SampleApp(object):
             msg = Message(payload)
 
             telemetry_topic = topic_builder.build_telemetry_publish_topic(
-                self.auth.device_id, self.auth.module_id, msg
-            )
-            mi = self.mqtt_client.publish(
-                telemetry_topic, msg.get_binary_payload(), qos=1
+                self.auth.identity, None, msg
             )
-
-            outstanding_messages.append(mi)
-            outstanding_messages = self.remove_completed_messages(
-                outstanding_messages
+            # Don't wait for the PUBACK.  This only blocks if the window is full.
+            self.publish_window.publish(
+                telemetry_topic, msg.get_binary_payload()
             )
 
             print(
                 "{} sent, {} awaiting PUBACK".format(
-                    i + 1, len(outstanding_messages)
+                    i + 1, self.publish_window.in_flight_count
                 )
             )
 
-        while len(outstanding_messages):
-            print("Waiting for {} messages".format(len(outstanding_messages)))
-            outstanding_messages[0].wait_for_publish()
-            outstanding_messages = self.remove_completed_messages(
-                outstanding_messages
+        print(
+            "Waiting for {} messages".format(
+                self.publish_window.in_flight_count
             )
+        )
+        self.publish_window.wait_for_all()
         end = time.time()
 
         print("Done sending telemetry.")
@@ -213,6 +199,52 @@ class SampleApp(object):
         # TODO: raise exception on error
         print("patch_result = {}".format(patch_result))
 
+    def handle_c2d(self, c2d: mqtt.MQTTMessage) -> None:
+        print("C2d: {}".format(str(c2d.payload)))
+
+    def handle_twin_patch_desired(self, twin_patch: mqtt.MQTTMessage) -> None:
+        print("twin patch: {}".format(str(twin_patch.payload)))
+        print(
+            "twin version: {}".format(
+                topic_parser.extract_twin_version(twin_patch.topic)
+            )
+        )
+
+    def handle_ping(self, ping: mqtt.MQTTMessage) -> None:
+        print("ping: {}".format(str(ping.payload)))
+        response_topic = topic_builder.build_method_response_publish_topic(
+            ping.topic, "200"
+        )
+        mi = self.mqtt_client.publish(
+            topic=response_topic, payload=ping.payload, qos=1
+        )
+        mi.wait_for_publish()
+        print("ping response sent")
+
+    def handle_fail(self, fail: mqtt.MQTTMessage) -> None:
+        print("fail: {}".format(str(fail.payload)))
+        response_topic = topic_builder.build_method_response_publish_topic(
+            fail.topic, "400"
+        )
+        mi = self.mqtt_client.publish(
+            topic=response_topic, payload=fail.payload, qos=1
+        )
+        mi.wait_for_publish()
+        print("fail response sent")
+
+    def handle_method(self, method_request: mqtt.MQTTMessage) -> None:
+        print("method request: {}".format(str(method_request.payload)))
+        print(
+            "method name: {}".format(
+                topic_parser.extract_method_name(method_request.topic)
+            )
+        )
+
+    def handle_undefined(self, undefined: mqtt.MQTTMessage) -> None:
+        print(
+            "Undefined: {}, {}".format(undefined.topic, str(undefined.payload))
+        )
+
     def main(self) -> None:
         logger.info("Azure IoT Edge Protocol Translation Module (PTM) Sample")
 
@@ -235,7 +267,37 @@ class SampleApp(object):
         # set a handler to get called when we're connected.
         self.mqtt_client.on_connect = self.handle_on_connect
         self.mqtt_client.on_subscribe = self.handle_on_subscribe
-        self.mqtt_client.on_message = self.handle_on_message
+        self.mqtt_client.on_message = self.dispatcher.handle_on_message
+
+        # Telemetry is published through a window, so we don't wait for each PUBACK, but
+        # there are never too many messages in flight.  Paho queues messages over its own
+        # in-flight limit, so raise that limit to match the window.
+        self.publish_window = PublishWindow(
+            lambda topic, payload: self.mqtt_client.publish(
+                topic, payload, qos=1
+            ).mid
+        )
+        self.mqtt_client.max_inflight_messages_set(
+            self.publish_window.window_size
+        )
+        self.mqtt_client.on_publish = (
+            lambda client, userdata, mid: self.publish_window.handle_puback(mid)
+        )
+
+        # Messages are routed to handlers on worker threads, so the Paho network thread
+        # never runs our code.  Twin responses go into `incoming_messages`, where
+        # `get_twin` and `patch_reported_properties` wait for them.
+        self.dispatcher.register_c2d_handler(self.handle_c2d)
+        self.dispatcher.register_twin_patch_desired_handler(
+            self.handle_twin_patch_desired
+        )
+        self.dispatcher.register_method_handler("ping", self.handle_ping)
+        self.dispatcher.register_method_handler("fail", self.handle_fail)
+        self.dispatcher.register_method_handler(None, self.handle_method)
+        self.dispatcher.register_twin_response_handler(
+            self.incoming_messages.add_item
+        )
+        self.dispatcher.register_default_handler(self.handle_undefined)
 
         logger.info("Connecting")
         # Start the paho loop.
@@ -255,78 +317,12 @@ class SampleApp(object):
         self.patch_reported_properties("shazam!")
         self.get_twin()
 
-        start_time = time.time()
-        end_time = start_time + 600
-        while time.time() < end_time:
-            if self.incoming_messages.wait_for_message(end_time - time.time()):
-
-                c2d = self.incoming_messages.pop_next_c2d(timeout=0)
-                if c2d:
-                    print("C2d: {}".format(str(c2d.payload)))
-
-                twin_patch = self.incoming_messages.pop_next_twin_patch_desired(
-                    timeout=0
-                )
-                if twin_patch:
-                    print("twin patch: {}".format(str(twin_patch.payload)))
-                    print(
-                        "twin version: {}".format(
-                            topic_parser.extract_twin_version(twin_patch.topic)
-                        )
-                    )
-
-                ping = self.incoming_messages.pop_next_method_request(
-                    method_name="ping", timeout=0
-                )
-                if ping:
-                    print("ping: {}".format(str(ping.payload)))
-                    response_topic = topic_builder.build_method_response_publish_topic(
-                        ping.topic, "200"
-                    )
-                    mi = self.mqtt_client.publish(
-                        topic=response_topic, payload=ping.payload, qos=1
-                    )
-                    mi.wait_for_publish()
-                    print("ping response sent")
-
-                fail = self.incoming_messages.pop_next_method_request(
-                    method_name="fail", timeout=0
-                )
-                if fail:
-                    print("fail: {}".format(str(fail.payload)))
-                    response_topic = topic_builder.build_method_response_publish_topic(
-                        fail.topic, "400"
-                    )
-                    mi = self.mqtt_client.publish(
-                        topic=response_topic, payload=fail.payload, qos=1
-                    )
-                    mi.wait_for_publish()
-                    print("fail response sent")
-
-                method_request = self.incoming_messages.pop_next_method_request(
-                    timeout=0
-                )
-                if method_request:
-                    print(
-                        "method request: {}".format(str(method_request.payload))
-                    )
-                    print(
-                        "method name: {}".format(
-                            topic_parser.extract_method_name(
-                                method_request.topic
-                            )
-                        )
-                    )
-
-                undefined = self.incoming_messages.pop_next_message(timeout=0)
-                if undefined:
-                    print(
-                        "Undefined: {}, {}".format(
-                            undefined.topic, str(undefined.payload)
-                        )
-                    )
+        # Our handlers run on the dispatcher's worker threads.  This thread has nothing
+        # left to do except wait.
+        time.sleep(600)
 
         self.mqtt_client.disconnect()
+        self.dispatcher.shutdown()
 
         logger.info("Exiting.")
 